@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+# Benchmark harness for the RAG pipeline. It ingests the documents into a scratch vector store,
+# then measures store_documents.process_documents, collection.query, /generate_report and /chat
+# against a server and stub_llm.py it starts itself, and writes the results to a JSON file:
+#   python benchmark.py --concurrency 1,8,32 --requests 64 --output results.json
+#   python benchmark.py --compare baseline.json --output results.json
+# config reads its paths from the environment at import time, so every module that depends on it
+# is imported only after main() has pointed LAWLENS_DB_PATH at the scratch store.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STAGES = ("ingest", "query", "generate_report", "chat")
+
+# Variations used to derive synthetic applications from industrial_application.json
+SYNTHETIC_FIELDS = {
+    "industry_name": ["Chemicals", "Textiles", "Food Processing", "Plastics", "Pharmaceuticals", "Rubber", "Cement"],
+    "water_source": ["Borewell", "Municipal Water Supply", "River", "Rainwater harvesting", "Open well"],
+    "drainage": ["Underground sewage system", "Effluent treatment plant", "Open drain", "Septic tank"],
+    "air_pollution": ["Minimal emissions with scrubbers", "Boiler stack of 30 m", "Dust from crushing units",
+                      "No process emissions"],
+    "waste_management": ["Hazardous waste disposed through certified vendors", "Solid waste composted on site",
+                         "Waste oil sold to registered recyclers", "Sludge sent to common treatment facility"],
+    "nearby_homes": ["No residential areas within 2 km", "Houses within 200 m", "Residential colony at 500 m"],
+}
+
+
+def synthetic_applications(count, seed=0):
+    """Deterministic variations of the sample application, so runs are comparable."""
+    with open(os.path.join(BASE_DIR, "industrial_application.json"), "r") as file:
+        sample = json.load(file)
+    rng = random.Random(seed)
+    applications = []
+    for index in range(count):
+        application = {key: str(value) for key, value in sample.items() if key != "compliance_certifications"}
+        application.update({field: rng.choice(choices) for field, choices in SYNTHETIC_FIELDS.items()})
+        application["industry_name"] = f"Synthetic {application['industry_name']} {index} Ltd"
+        application["square_feet"] = f"{rng.randrange(2000, 200000, 500)} sq ft"
+        application["water_level_depth"] = f"{rng.randint(3, 60)} meters"
+        applications.append(application)
+    return applications
+
+
+def summarize(name, concurrency, latencies, elapsed, failures=0, **extra):
+    """Latency percentiles (ms) and throughput of one measurement."""
+    from load_test import percentile
+    latencies = sorted(latencies)
+    return {
+        "name": name,
+        "concurrency": concurrency,
+        "count": len(latencies),
+        "failures": failures,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        **extra,
+    }
+
+
+# ----------------------------
+# In-process Benchmarks
+# ----------------------------
+
+def bench_ingest(documents_dir, repeats, scratch_dir):
+    """Full ingestion (fresh manifest every run) and the no-op incremental run that follows it."""
+    from store_documents import process_documents
+
+    full, noop, chunks = [], [], 0
+    for run in range(repeats):
+        manifest_path = os.path.join(scratch_dir, f"manifest-{run}.json")
+        start = time.perf_counter()
+        stats = process_documents(documents_dir, manifest_path=manifest_path) or {}
+        full.append(time.perf_counter() - start)
+        chunks = stats.get("chunks", 0)
+
+        start = time.perf_counter()
+        process_documents(documents_dir, manifest_path=manifest_path)
+        noop.append(time.perf_counter() - start)
+
+    return [
+        summarize("process_documents", 1, full, sum(full), chunks=chunks,
+                  chunks_per_s=round(chunks * len(full) / sum(full), 2) if sum(full) else 0.0),
+        summarize("process_documents_noop", 1, noop, sum(noop)),
+    ]
+
+
+def bench_query(applications, concurrency_levels, requests_per_level, n_results):
+    """collection.query alone: query embeddings are computed up front and not timed."""
+    from registry import get_collection, get_model
+    from server import rules_query_text
+
+    collection = get_collection()
+    embeddings = [embedding.tolist() for embedding in
+                  get_model().encode([rules_query_text(application) for application in applications])]
+
+    def one_query(index):
+        start = time.perf_counter()
+        collection.query(query_embeddings=[embeddings[index % len(embeddings)]], n_results=n_results,
+                         include=["documents", "metadatas"])
+        return time.perf_counter() - start
+
+    results = []
+    for concurrency in concurrency_levels:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            latencies = list(executor.map(one_query, range(requests_per_level)))
+            elapsed = time.perf_counter() - start
+        results.append(summarize("collection.query", concurrency, latencies, elapsed, n_results=n_results))
+    return results
+
+
+# ----------------------------
+# HTTP Benchmarks (server + stub LLM)
+# ----------------------------
+
+def wait_until_ready(url, process, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process serving {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} did not become ready within {timeout}s")
+
+
+def start_services(args, scratch_dir):
+    """Start stub_llm.py and the RagBot server on the scratch store; returns (server_url, processes)."""
+    stub = subprocess.Popen(
+        [sys.executable, "stub_llm.py", "--port", str(args.llm_port), "--latency", str(args.llm_latency),
+         "--token-rate", str(args.llm_token_rate), "--reply-tokens", str(args.llm_reply_tokens)],
+        cwd=BASE_DIR,
+    )
+    processes = [stub]
+    wait_until_ready(f"http://127.0.0.1:{args.llm_port}/v1/models", stub)
+
+    env = {
+        **os.environ,
+        "LAWLENS_LLM_URL": f"http://127.0.0.1:{args.llm_port}/v1/chat/completions",
+        "LAWLENS_RESPONSE_CACHE_PATH": os.path.join(scratch_dir, "response_cache.sqlite3"),
+        "LAWLENS_JOBS_DB_PATH": os.path.join(scratch_dir, "jobs.sqlite3"),
+        "LAWLENS_JOB_WORKERS": "0",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(args.server_port),
+         "--log-level", "warning"],
+        cwd=BASE_DIR, env=env,
+    )
+    processes.append(server)
+    server_url = f"http://127.0.0.1:{args.server_port}"
+    wait_until_ready(f"{server_url}/metrics", server)
+    return server_url, processes
+
+
+def bench_http(endpoint, server_url, payloads, concurrency_levels, requests_per_level):
+    from load_test import run_load_test
+
+    # Cache-Control: no-store keeps the response cache from answering repeated applications
+    headers = {"Cache-Control": "no-store"} if endpoint == "generate_report" else None
+    results = []
+    for concurrency in concurrency_levels:
+        report = asyncio.run(run_load_test(endpoint, concurrency, requests_per_level, server_url, payloads, headers))
+        results.append({
+            "name": f"/{endpoint}",
+            "concurrency": concurrency,
+            "count": report["requests"],
+            "failures": report["failures"],
+            "p50_ms": round(report["latency_p50_s"] * 1000, 2),
+            "p95_ms": round(report["latency_p95_s"] * 1000, 2),
+            "p99_ms": round(report["latency_p99_s"] * 1000, 2),
+            "throughput_per_s": report["requests_per_sec"],
+        })
+    return results
+
+
+# ----------------------------
+# Reporting
+# ----------------------------
+
+def compare(results, baseline_path):
+    """Print p95 latency and throughput changes against a previous results file."""
+    with open(baseline_path, "r") as file:
+        baseline = {(entry["name"], entry["concurrency"]): entry for entry in json.load(file)["results"]}
+    print(f"\n📈 Compared with {baseline_path}:")
+    for entry in results:
+        previous = baseline.get((entry["name"], entry["concurrency"]))
+        if previous is None:
+            continue
+        p95_change = (entry["p95_ms"] / previous["p95_ms"] - 1) * 100 if previous["p95_ms"] else 0.0
+        throughput_change = ((entry["throughput_per_s"] / previous["throughput_per_s"] - 1) * 100
+                             if previous["throughput_per_s"] else 0.0)
+        print(f"  {entry['name']:<24} c={entry['concurrency']:<4} p95 {previous['p95_ms']:>9.2f} -> "
+              f"{entry['p95_ms']:>9.2f} ms ({p95_change:+.1f}%), throughput {throughput_change:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, retrieval and report generation.")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--applications", type=int, default=32, help="Synthetic applications to cycle through")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic applications")
+    parser.add_argument("--documents", default=os.path.join(BASE_DIR, "documents"), help="Documents to ingest")
+    parser.add_argument("--ingest-repeats", type=int, default=3, help="Full ingestion runs")
+    parser.add_argument("--n-results", type=int, default=5, help="Results per collection.query")
+    parser.add_argument("--scratch-dir", help="Scratch vector store and caches (default: a temporary directory)")
+    parser.add_argument("--server-url", help="Benchmark this running server instead of starting one")
+    parser.add_argument("--server-port", type=int, default=8100)
+    parser.add_argument("--llm-port", type=int, default=1234)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM seconds before the first token")
+    parser.add_argument("--llm-token-rate", type=float, default=50.0, help="Stub LLM tokens per second")
+    parser.add_argument("--llm-reply-tokens", type=int, default=64, help="Stub LLM reply length in tokens")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the results JSON")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+
+    scratch_dir = args.scratch_dir or tempfile.mkdtemp(prefix="lawlens-bench-")
+    os.makedirs(scratch_dir, exist_ok=True)
+    os.environ["LAWLENS_DB_PATH"] = os.path.join(scratch_dir, "db")
+    applications = synthetic_applications(args.applications, args.seed)
+
+    results, processes = [], []
+    try:
+        if "ingest" in stages:
+            results += bench_ingest(args.documents, max(1, args.ingest_repeats), scratch_dir)
+        elif "query" in stages:
+            bench_ingest(args.documents, 1, scratch_dir)  # The queries need a populated store
+        if "query" in stages:
+            results += bench_query(applications, concurrency_levels, args.requests, args.n_results)
+
+        http_stages = [stage for stage in ("generate_report", "chat") if stage in stages]
+        if http_stages:
+            server_url = args.server_url
+            if server_url is None:
+                server_url, processes = start_services(args, scratch_dir)
+            from load_test import PAYLOADS
+            payloads = {"generate_report": applications, "chat": [PAYLOADS["chat"]]}
+            for endpoint in http_stages:
+                results += bench_http(endpoint, server_url, payloads[endpoint], concurrency_levels, args.requests)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=30)
+        if args.scratch_dir is None:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"\n{'benchmark':<24} {'conc':>4} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'per s':>9}")
+    for entry in results:
+        print(f"{entry['name']:<24} {entry['concurrency']:>4} {entry['count']:>6} {entry['p50_ms']:>10.2f} "
+              f"{entry['p95_ms']:>10.2f} {entry['p99_ms']:>10.2f} {entry['throughput_per_s']:>9.2f}")
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
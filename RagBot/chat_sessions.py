@@ -0,0 +1,167 @@
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+import config
+from prompt_builder import messages_tokens
+
+# Server-side chat sessions. Each session keeps its system prompt, a sliding window of the most
+# recent messages and a running summary of everything older. A turn sends the model
+# [system + summary, *window, new message], so the prompt stays bounded however long the
+# conversation gets; once the window outgrows CHAT_WINDOW_MESSAGES or CHAT_WINDOW_TOKENS, all but
+# the last CHAT_KEEP_MESSAGES are folded into the summary.
+DEFAULT_SYSTEM_PROMPT = "You are an AI assistant helping with industrial compliance questions."
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id TEXT PRIMARY KEY,
+    system_prompt TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    summarized_messages INTEGER NOT NULL,
+    window TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+_lock = threading.Lock()
+_initialized = False
+
+
+@contextmanager
+def _connect(path=config.CHAT_SESSIONS_PATH):
+    """Open a short-lived connection (safe across threads/processes), run one transaction and close it."""
+    global _initialized
+    connection = sqlite3.connect(path, timeout=10)
+    connection.row_factory = sqlite3.Row
+    try:
+        if not _initialized:
+            with _lock:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(_SCHEMA)
+                connection.execute("CREATE INDEX IF NOT EXISTS chat_sessions_updated ON chat_sessions (updated_at)")
+                connection.commit()
+                _initialized = True
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def _row_to_session(row):
+    session = dict(row)
+    session["window"] = json.loads(session["window"])
+    return session
+
+
+def create(system_prompt=DEFAULT_SYSTEM_PROMPT, ttl=config.CHAT_SESSION_TTL_SECONDS):
+    """Start a session and return its ID; sessions idle for longer than ttl are removed."""
+    session_id, now = uuid.uuid4().hex, time.time()
+    with _connect() as connection:
+        connection.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (now - ttl,))
+        connection.execute(
+            "INSERT INTO chat_sessions (id, system_prompt, summary, summarized_messages, window, created_at, updated_at) "
+            "VALUES (?, ?, '', 0, '[]', ?, ?)",
+            (session_id, system_prompt, now, now),
+        )
+    return session_id
+
+
+def get(session_id):
+    """Return the session ({"system_prompt", "summary", "window", ...}) or None."""
+    with _connect() as connection:
+        row = connection.execute("SELECT * FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+    return _row_to_session(row) if row is not None else None
+
+
+def delete(session_id):
+    with _connect() as connection:
+        return connection.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+
+def build_messages(session, new_message=None):
+    """Messages for the next turn: system prompt (with the summary of older turns), the window and the new message."""
+    system_prompt = session["system_prompt"]
+    if session["summary"]:
+        system_prompt += f"\n\nSummary of the earlier conversation:\n{session['summary']}"
+    messages = [{"role": "system", "content": system_prompt}] + session["window"]
+    if new_message is not None:
+        messages.append({"role": "user", "content": new_message})
+    return messages
+
+
+def append(session_id, messages):
+    """Add messages (a finished user/assistant exchange) to the end of the window."""
+    with _connect() as connection:
+        row = connection.execute("SELECT window FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        window = json.loads(row["window"]) + list(messages)
+        connection.execute("UPDATE chat_sessions SET window = ?, updated_at = ? WHERE id = ?",
+                           (json.dumps(window), time.time(), session_id))
+    return window
+
+
+def needs_compaction(window, max_messages=config.CHAT_WINDOW_MESSAGES, max_tokens=config.CHAT_WINDOW_TOKENS):
+    return len(window) > config.CHAT_KEEP_MESSAGES and (
+        len(window) > max_messages or messages_tokens(window) > max_tokens)
+
+
+def messages_to_fold(window, keep=config.CHAT_KEEP_MESSAGES):
+    """The oldest messages that leave the window, always ending on an assistant reply so exchanges stay whole."""
+    cut = len(window) - keep
+    while cut > 0 and window[cut - 1]["role"] != "assistant":
+        cut -= 1
+    return window[:cut]
+
+
+def apply_summary(session_id, folded, summary, summarized_messages):
+    """
+    Replace the folded messages with the new summary, unless the session changed underneath:
+    another compaction got there first (summarized_messages, the count the summary was built on,
+    no longer matches) or the folded messages are no longer at the start of the window. Returns
+    whether the summary was stored.
+    """
+    with _connect() as connection:
+        row = connection.execute("SELECT window FROM chat_sessions WHERE id = ? AND summarized_messages = ?",
+                                 (session_id, summarized_messages)).fetchone()
+        if row is None:
+            return False
+        window = json.loads(row["window"])
+        if window[:len(folded)] != folded:
+            return False
+        # Guarded on the row as read, so a write that landed in between is never overwritten
+        return connection.execute(
+            "UPDATE chat_sessions SET summary = ?, summarized_messages = ?, window = ?, updated_at = ? "
+            "WHERE id = ? AND summarized_messages = ? AND window = ?",
+            (summary, summarized_messages + len(folded), json.dumps(window[len(folded):]), time.time(),
+             session_id, summarized_messages, row["window"]),
+        ).rowcount > 0
+
+
+def summary_messages(previous_summary, folded, max_words=config.CHAT_SUMMARY_WORDS):
+    """Prompt asking the model to fold older messages into the running summary."""
+    transcript = "\n".join(f"{message['role'].upper()}: {message['content']}" for message in folded)
+    return [
+        {"role": "system", "content": "You maintain a running summary of a conversation about industrial compliance."},
+        {"role": "user", "content": f"""
+Current summary:
+{previous_summary or "(none yet)"}
+
+New messages:
+{transcript}
+
+Rewrite the summary so it also covers the new messages. Keep facts, figures, names, regulations,
+decisions and open questions; drop pleasantries. Use at most {max_words} words and reply with the summary only.
+"""},
+    ]
+
+
+def stats():
+    with _connect() as connection:
+        row = connection.execute(
+            "SELECT COUNT(*) AS sessions, COALESCE(SUM(summarized_messages), 0) AS summarized_messages FROM chat_sessions"
+        ).fetchone()
+    return {"sessions": row["sessions"], "summarized_messages": row["summarized_messages"]}
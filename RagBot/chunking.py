@@ -0,0 +1,107 @@
+import re
+import textwrap
+
+# Target chunk size and overlap, in characters (~250 / ~40 MiniLM tokens)
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+
+# Headings that start a new passage, e.g. "Section 7A.", "RULE 12" or the
+# marginal-note style used in the Acts: "7A. General duties of the occupier.—".
+# A keyword heading is capitalised and its number ends the line or is followed by
+# ".", ":" or a dash, so cross-references that happen to start a line ("section 7
+# of this Act shall apply", "Rule 3 shall apply") do not split the passage.
+HEADING_PATTERN = re.compile(
+    r"^(?:(?P<kind>Section|SECTION|Rule|RULE)\s+(?P<number>\d+[A-Za-z]*)\s*(?:[.:—–-]|$)"
+    r"|(?i:(?P<bare>\d+[A-Z]*)\.\s+[A-Z][^\n]{0,120}?[.:]\s*[—–-]))",
+)
+
+
+def detect_heading(line, default_kind="Section"):
+    """Return a normalised heading label ("Section 7A", "Rule 3") or None."""
+    match = HEADING_PATTERN.match(line)
+    if not match:
+        return None
+    if match.group("kind"):
+        return f"{match.group('kind').capitalize()} {match.group('number').upper()}"
+    return f"{default_kind} {match.group('bare').upper()}"
+
+
+def split_sections(pages, default_kind="Section"):
+    """
+    Split page-tagged text into blocks that start at a Section/Rule heading.
+
+    Args:
+        pages (list): (page_number, text) tuples in reading order.
+        default_kind (str): Label for bare numbered headings ("Section" or "Rule").
+
+    Yields:
+        tuple: (heading, [(page_number, line), ...]) for each block.
+    """
+    heading, lines = "", []
+    for page_number, text in pages:
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            label = detect_heading(line, default_kind)
+            if label:
+                if lines:
+                    yield heading, lines
+                heading, lines = label, []
+            lines.append((page_number, line))
+    if lines:
+        yield heading, lines
+
+
+def _pack_lines(lines, chunk_size, overlap):
+    """Greedily pack lines into windows of at most chunk_size characters with a line-aligned overlap."""
+    window, length = [], 0
+    for page_number, line in lines:
+        # Over-long lines (DOCX paragraphs, TXT files) are wrapped so they can share a window
+        for piece in textwrap.wrap(line, width=chunk_size // 2) or [line]:
+            if window and length + len(piece) + 1 > chunk_size:
+                yield window
+                # Carry the tail of the previous window over, but never the whole window
+                tail, tail_length = [], 0
+                for item in reversed(window[1:]):
+                    if tail_length + len(item[1]) + 1 > overlap:
+                        break
+                    tail.insert(0, item)
+                    tail_length += len(item[1]) + 1
+                window, length = tail, tail_length
+            window.append((page_number, piece))
+            length += len(piece) + 1
+    if window:
+        yield window
+
+
+def chunk_pages(pages, source, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Turn extracted pages into overlapping, section-aware passages ready for ChromaDB.
+
+    Args:
+        pages (list): (page_number, text) tuples for one document.
+        source (str): File name the pages came from, used for IDs and metadata.
+        chunk_size (int): Maximum characters per chunk.
+        overlap (int): Characters of trailing context repeated at the start of the next chunk.
+
+    Returns:
+        list: Dicts with "id", "text" and "metadata" (source, page_start, page_end, section, chunk_index).
+    """
+    default_kind = "Rule" if "rule" in source.lower() else "Section"
+    chunks = []
+    for heading, lines in split_sections(pages, default_kind):
+        for window in _pack_lines(lines, chunk_size, overlap):
+            index = len(chunks)
+            chunks.append({
+                "id": f"{source}::chunk-{index}",
+                "text": "\n".join(line for _, line in window),
+                "metadata": {
+                    "source": source,
+                    "page_start": window[0][0],
+                    "page_end": window[-1][0],
+                    "section": heading,
+                    "chunk_index": index,
+                },
+            })
+    return chunks
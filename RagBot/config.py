@@ -0,0 +1,83 @@
+import os
+
+# Directory containing the RagBot sources, used to resolve every default path
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ChromaDB persistence directory (absolute, so entry points work from any CWD)
+DB_PATH = os.path.abspath(os.environ.get("LAWLENS_DB_PATH", os.path.join(BASE_DIR, "db")))
+
+# Collection holding the regulation chunks
+COLLECTION_NAME = os.environ.get("LAWLENS_COLLECTION", "industrial-documents")
+
+# SentenceTransformer used for documents and queries
+EMBEDDING_MODEL = os.environ.get("LAWLENS_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Source documents ingested by store_documents.py
+DOCUMENTS_DIR = os.path.abspath(os.environ.get("LAWLENS_DOCUMENTS_DIR", os.path.join(BASE_DIR, "documents")))
+
+# In-process LRU cache of query embeddings, bounded by entry count and memory
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("LAWLENS_QUERY_CACHE_ENTRIES", "1024"))
+QUERY_CACHE_MAX_BYTES = int(float(os.environ.get("LAWLENS_QUERY_CACHE_MB", "64")) * 1024 * 1024)
+
+# Persistent cache of generated compliance reports (SQLite), with TTL and size-based eviction
+RESPONSE_CACHE_PATH = os.path.abspath(os.environ.get("LAWLENS_RESPONSE_CACHE_PATH", os.path.join(BASE_DIR, "response_cache.sqlite3")))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("LAWLENS_RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+RESPONSE_CACHE_MAX_BYTES = int(float(os.environ.get("LAWLENS_RESPONSE_CACHE_MB", "256")) * 1024 * 1024)
+
+# BM25 keyword index over the stored chunks, kept next to the vector store by store_documents.py
+KEYWORD_INDEX_PATH = os.path.join(DB_PATH, "bm25_index.json")
+
+# Default retrieval mode ("vector", "keyword" or "hybrid"), chunks passed to the LLM,
+# candidates fetched per ranker before reciprocal rank fusion, and the RRF damping constant
+RETRIEVAL_MODE = os.environ.get("LAWLENS_RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_N_RESULTS = int(os.environ.get("LAWLENS_RETRIEVAL_N_RESULTS", "5"))
+RETRIEVAL_CANDIDATES = int(os.environ.get("LAWLENS_RETRIEVAL_CANDIDATES", "20"))
+RRF_K = int(os.environ.get("LAWLENS_RRF_K", "60"))
+
+# Optional cross-encoder reranking: when enabled, retrieval fetches a larger candidate pool, a small
+# local cross-encoder rescores (query, passage) pairs in CPU batches, and only the top
+# RETRIEVAL_N_RESULTS reach the prompt. Scoring stops once the latency budget is spent; candidates
+# not scored by then keep their retrieval order behind the scored ones
+RERANK_ENABLED = os.environ.get("LAWLENS_RERANK", "0") == "1"
+RERANK_MODEL = os.environ.get("LAWLENS_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.environ.get("LAWLENS_RERANK_CANDIDATES", "50"))
+RERANK_BATCH_SIZE = int(os.environ.get("LAWLENS_RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_SECONDS = float(os.environ.get("LAWLENS_RERANK_BUDGET_SECONDS", "1.0"))
+
+# Background compliance analysis jobs: SQLite queue, uploaded documents per job, worker processes
+# started by the server (0 to run them separately with job_worker.py), queue polling interval,
+# how long a running job may go without a heartbeat before it is handed to another worker, and how
+# often a worker's heartbeat refreshes the claim while a long stage runs (well below the stale limit)
+JOBS_DB_PATH = os.path.abspath(os.environ.get("LAWLENS_JOBS_DB_PATH", os.path.join(BASE_DIR, "jobs.sqlite3")))
+JOBS_DIR = os.path.abspath(os.environ.get("LAWLENS_JOBS_DIR", os.path.join(BASE_DIR, "jobs")))
+JOB_WORKERS = int(os.environ.get("LAWLENS_JOB_WORKERS", "1"))
+JOB_POLL_INTERVAL = float(os.environ.get("LAWLENS_JOB_POLL_INTERVAL", "1.0"))
+JOB_STALE_SECONDS = float(os.environ.get("LAWLENS_JOB_STALE_SECONDS", "1800"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("LAWLENS_JOB_MAX_ATTEMPTS", "2"))
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("LAWLENS_JOB_HEARTBEAT_SECONDS", "60"))
+
+# Reports of one /generate_reports/batch request generated at the same time (LAWLENS_LLM_MAX_CONCURRENCY,
+# when set, also caps the whole process)
+BATCH_CONCURRENCY = int(os.environ.get("LAWLENS_BATCH_CONCURRENCY", "4"))
+
+# Per-stage timing (histograms on /metrics, Server-Timing headers); LAWLENS_TRACE_LOG=1 also
+# prints one JSON line with every request's spans
+TRACING_ENABLED = os.environ.get("LAWLENS_TRACING", "1") != "0"
+TRACE_LOG = os.environ.get("LAWLENS_TRACE_LOG", "0") == "1"
+
+# Report prompt budget: the LLM's context window, tokens kept free for the answer, the cap on a
+# single retrieved passage, and the characters-per-token ratio used to estimate token counts
+PROMPT_CONTEXT_TOKENS = int(os.environ.get("LAWLENS_PROMPT_CONTEXT_TOKENS", "4096"))
+PROMPT_COMPLETION_TOKENS = int(os.environ.get("LAWLENS_PROMPT_COMPLETION_TOKENS", "1024"))
+PROMPT_MAX_PASSAGE_TOKENS = int(os.environ.get("LAWLENS_PROMPT_MAX_PASSAGE_TOKENS", "400"))
+PROMPT_CHARS_PER_TOKEN = float(os.environ.get("LAWLENS_PROMPT_CHARS_PER_TOKEN", "3.5"))
+
+# Server-side chat sessions (SQLite): messages kept verbatim in the sliding window, the window
+# size (messages or estimated tokens) that triggers folding older turns into the running summary,
+# the summary's length, and how long an idle session is kept
+CHAT_SESSIONS_PATH = os.path.abspath(os.environ.get("LAWLENS_CHAT_SESSIONS_PATH", os.path.join(BASE_DIR, "chat_sessions.sqlite3")))
+CHAT_KEEP_MESSAGES = int(os.environ.get("LAWLENS_CHAT_KEEP_MESSAGES", "6"))
+CHAT_WINDOW_MESSAGES = int(os.environ.get("LAWLENS_CHAT_WINDOW_MESSAGES", "12"))
+CHAT_WINDOW_TOKENS = int(os.environ.get("LAWLENS_CHAT_WINDOW_TOKENS", "2048"))
+CHAT_SUMMARY_WORDS = int(os.environ.get("LAWLENS_CHAT_SUMMARY_WORDS", "200"))
+CHAT_SESSION_TTL_SECONDS = float(os.environ.get("LAWLENS_CHAT_SESSION_TTL", str(7 * 24 * 3600)))
@@ -0,0 +1,101 @@
+import re
+import threading
+from collections import OrderedDict
+import config
+from registry import get_model
+from tracing import span
+
+
+class EmbeddingCache:
+    """Thread-safe LRU map from normalised query text to its embedding, bounded by entries and bytes."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(key, embedding):
+        return len(key) + embedding.nbytes
+
+    def get(self, key):
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key, embedding):
+        size = self._size(key, embedding)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._size(key, self._entries.pop(key))
+            self._entries[key] = embedding
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                old_key, old_embedding = self._entries.popitem(last=False)
+                self._bytes -= self._size(old_key, old_embedding)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+query_embedding_cache = EmbeddingCache(config.QUERY_CACHE_MAX_ENTRIES, config.QUERY_CACHE_MAX_BYTES)
+
+
+def normalize_query(text):
+    """
+    Case-fold and collapse whitespace so trivially different queries share a cache entry.
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so this does not change the embedding.
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def encode_query(text):
+    """Return the embedding (numpy array) of a query, skipping the encoder when it is cached."""
+    key = normalize_query(text)
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        with span("embed"):
+            embedding = get_model().encode(key)
+        query_embedding_cache.put(key, embedding)
+    return embedding
+
+
+def encode_queries(texts):
+    """
+    Return embeddings for many queries in order, encoding every cache miss in a single
+    model.encode batch instead of one forward pass per query.
+    """
+    keys = [normalize_query(text) for text in texts]
+    embeddings = [query_embedding_cache.get(key) for key in keys]
+    missing = list(dict.fromkeys(key for key, embedding in zip(keys, embeddings) if embedding is None))
+    if missing:
+        with span("embed"):
+            encoded = dict(zip(missing, get_model().encode(missing)))
+        for key, embedding in encoded.items():
+            query_embedding_cache.put(key, embedding)
+        embeddings = [encoded[key] if embedding is None else embedding for key, embedding in zip(keys, embeddings)]
+    return embeddings
@@ -1,97 +1,102 @@
+import os
+import sys
 import json
-import chromadb
+import time
+import argparse
 import requests
-from sentence_transformers import SentenceTransformer
+import config
+import llm_client
 
-# Initialize ChromaDB
-client = chromadb.PersistentClient(path="./db")
-collection = client.get_collection("industrial-documents")
+# Server used for --batch runs
+SERVER_URL = os.environ.get("LAWLENS_SERVER_URL", "http://localhost:8000")
 
-# Load sentence transformer model
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
-# Load Industrial Approval Application JSON
-with open("industrial_application.json", "r") as file:
-    application_details = json.load(file)
+# Single applications go through the server's retrieval (vector/keyword/hybrid, rerank, embedding
+# cache) and prompt builder, so the CLI and the API produce the same prompt for the same application.
+# server is imported on use, like in job_worker, so --batch runs do not load the retrieval stack.
 
-# Convert JSON to a structured text prompt for vector retrieval
-query_text = f"""
-Industry Name: {application_details['industry_name']}
-Square Feet: {application_details['square_feet']}
-Water Source: {application_details['water_source']}
-Drainage: {application_details['drainage']}
-Air Pollution: {application_details['air_pollution']}
-Waste Management: {application_details['waste_management']}
-Nearby Homes: {application_details['nearby_homes']}
-Water Level Depth: {application_details['water_level_depth']}
-"""
+# Generate Compliance Report using Mistral-7B
+def generate_compliance_report(application_details, rules):
+    """Generate the report for retrieved rules; returns (report, prompt usage)."""
+    from server import REPORT_TEMPERATURE, build_report_messages
+    messages, prompt_usage = build_report_messages(application_details, rules)
+    try:
+        response_data = llm_client.chat_completion_sync(messages, temperature=REPORT_TEMPERATURE,
+                                                        max_tokens=config.PROMPT_COMPLETION_TOKENS)
+        return llm_client.message_content(response_data, "⚠️ AI Response Error."), prompt_usage
+    except Exception as e:
+        print(f"❌ Error parsing AI response: {e}")
+        return "⚠️ AI Response Error.", prompt_usage
 
-# Convert to vector embedding
-query_embedding = model.encode(query_text).tolist()
 
-# Query ChromaDB for the most relevant compliance rules
-results = collection.query(query_embeddings=[query_embedding], n_results=5)
+def run_single(application_path, retrieval=config.RETRIEVAL_MODE):
+    """Retrieve the rules for one application JSON file and print its compliance report."""
+    from server import retrieve_relevant_rules
 
-# Extract retrieved compliance rules
-relevant_rules = results["documents"][0] if results["documents"] else []
+    # Load Industrial Approval Application JSON
+    with open(application_path, "r") as file:
+        application_details = json.load(file)
 
-print("\n🔹 **Top Relevant Compliance Rules from ChromaDB:**\n")
-for rule in relevant_rules:
-    print(f"- {rule}")
+    # Retrieve and print the most relevant compliance rules
+    relevant_rules = retrieve_relevant_rules(application_details, retrieval)
 
-# Generate Compliance Report using Mistral-7B
-def generate_compliance_report(application_details, rules):
-    messages = [
-        {"role": "system", "content": "You are an AI expert in industrial compliance. Analyze the given industrial application."},
-        {"role": "user", "content": f"""
-        Industrial Compliance Report:
-
-        - **Industry Name:** {application_details['industry_name']}
-        - **Square Footage:** {application_details['square_feet']} sq. ft.
-        - **Water Source:** {application_details['water_source']}
-        - **Drainage System:** {application_details['drainage']}
-        - **Air Pollution:** {application_details['air_pollution']}
-        - **Waste Management:** {application_details['waste_management']}
-        - **Nearby Homes:** {application_details['nearby_homes']}
-        - **Water Level Depth:** {application_details['water_level_depth']}
-
-        **Top Relevant Compliance Rules from ChromaDB:**
-        {rules}
-
-        **Task:**  
-        1. Analyze whether the industrial application follows these compliance rules.
-        2. Identify any potential violations.
-        3. Highlight environmental concerns.
-        4. Recommend corrective actions if necessary.
-        5. Provide a final approval decision (Approve/Reject/Needs Review).
-
-        **Provide a structured and concise response.**
-        """}
-    ]
-
-    payload = {
-        "model": "amethyst-13b-mistral",
-        "messages": messages,
-        "temperature": 0.7,
-        "max_tokens": -1,
-        "stream": False
-    }
-
-    headers = {"Content-Type": "application/json"}
-
-    response = requests.post(
-        "http://localhost:1234/v1/chat/completions",  # Mistral-7B API endpoint
-        headers=headers,
-        json=payload
-    )
+    # Call AI Model for Compliance Report
+    report, prompt_usage = generate_compliance_report(application_details, relevant_rules)
+
+    print(f"\n🔹 **Generated Compliance Report** ({prompt_usage['prompt_tokens']} prompt tokens, "
+          f"{prompt_usage['passages_used']} rules):\n", report)
 
-    try:
-        return response.json().get("choices", [{}])[0].get("message", {}).get("content", "⚠️ AI Response Error.")
-    except Exception as e:
-        print(f"❌ Error parsing AI response: {e}")
-        return "⚠️ AI Response Error."
 
-# Call AI Model for Compliance Report
-report = generate_compliance_report(application_details, relevant_rules)
+def run_batch(input_path, output_path=None, server_url=SERVER_URL, retrieval=config.RETRIEVAL_MODE,
+              concurrency=None):
+    """
+    Send a JSONL file of applications to the server's batch endpoint and write the JSONL results
+    (one line per application, in completion order) to output_path, or stdout, as they arrive.
+    """
+    params = {"retrieval": retrieval}
+    if concurrency:
+        params["concurrency"] = concurrency
+    counts = {"ok": 0, "error": 0}
+    start = time.perf_counter()
 
-print("\n🔹 **Generated Compliance Report:**\n", report)
+    output = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+    try:
+        with open(input_path, "rb") as applications:
+            with requests.post(f"{server_url}/generate_reports/batch", data=applications, params=params,
+                               headers={"Content-Type": "application/x-ndjson"}, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    result = json.loads(line)
+                    counts[result["status"]] = counts.get(result["status"], 0) + 1
+                    output.write(line + "\n")
+                    output.flush()
+                    print(f"{'✅' if result['status'] == 'ok' else '❌'} #{result['index']} "
+                          f"{result.get('industry_name', '')} ({result['seconds']}s)", file=sys.stderr)
+    finally:
+        if output_path:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"🏁 {total} applications in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.2f}/s): "
+          f"{counts['ok']} ok, {counts['error']} failed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate compliance reports for industrial applications.")
+    parser.add_argument("--application", default=os.path.join(config.BASE_DIR, "industrial_application.json"),
+                        help="Application JSON file to analyse (single mode)")
+    parser.add_argument("--batch", help="JSONL file with one application per line, sent to the server's batch endpoint")
+    parser.add_argument("--output", help="Write batch results (JSONL) here instead of stdout")
+    parser.add_argument("--server-url", default=SERVER_URL, help="Base URL of the RagBot server (batch mode)")
+    parser.add_argument("--retrieval", default=config.RETRIEVAL_MODE, choices=["vector", "keyword", "hybrid"],
+                        help="Rule retrieval mode")
+    parser.add_argument("--concurrency", type=int, help="Reports generated at the same time (batch mode)")
+    args = parser.parse_args()
+
+    if args.batch:
+        run_batch(args.batch, args.output, args.server_url, args.retrieval, args.concurrency)
+    else:
+        run_single(args.application, args.retrieval)
@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+
+# Bump when the chunking/embedding scheme changes so every file is re-ingested
+MANIFEST_VERSION = 2
+
+# Read files in 1 MB blocks while hashing
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def load_manifest(manifest_path):
+    """
+    Load the ingestion manifest, returning an empty one if it is missing, unreadable or outdated.
+
+    Returns:
+        dict: {"version": int, "files": {filename: {"size", "mtime", "sha256", "chunk_ids"}}}
+    """
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+        print("♻️ Ingestion manifest is from an older version, re-ingesting everything.")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable manifest {manifest_path}: {e}")
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def save_manifest(manifest, manifest_path):
+    """Atomically write the manifest next to the vector store."""
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def hash_file(file_path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def plan_ingestion(manifest, directory, filenames):
+    """
+    Compare the files on disk with the manifest.
+
+    Size and mtime are checked first; the file is only hashed when they differ,
+    so an unchanged corpus is classified without reading any file contents.
+
+    Args:
+        manifest (dict): Manifest returned by load_manifest (mtimes of touched-but-identical files are refreshed in place).
+        directory (str): Directory containing the documents.
+        filenames (list): Supported document names currently in the directory.
+
+    Returns:
+        tuple: (changed, removed, fingerprints) where changed lists new or modified files,
+               removed lists manifest entries whose file no longer exists and fingerprints
+               maps each changed file to its {"size", "mtime", "sha256"}.
+    """
+    entries = manifest["files"]
+    changed, fingerprints = [], {}
+
+    for filename in filenames:
+        stat = os.stat(os.path.join(directory, filename))
+        entry = entries.get(filename)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            continue
+
+        sha256 = hash_file(os.path.join(directory, filename))
+        if entry and entry["sha256"] == sha256:
+            entry["mtime"] = stat.st_mtime  # Touched but identical
+            continue
+
+        changed.append(filename)
+        fingerprints[filename] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256}
+
+    removed = [filename for filename in entries if filename not in filenames]
+    return changed, removed, fingerprints
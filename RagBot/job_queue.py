@@ -0,0 +1,185 @@
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+import config
+
+# Pipeline stages of a compliance analysis job, in execution order
+STAGES = ("extract", "structure", "verify", "retrieve", "generate")
+
+# Job statuses; "succeeded" and "failed" are terminal
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+# One row per job. progress holds {stage: {"status", "seconds"}}, result accumulates each
+# stage's output, and updated_at doubles as the worker heartbeat for crash recovery. attempts is
+# the claim token: every claim increments it, so a worker whose job was requeued and claimed again
+# can tell it no longer owns the job.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT NOT NULL,
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+_lock = threading.Lock()
+_initialized = False
+
+
+@contextmanager
+def _connect(path=config.JOBS_DB_PATH):
+    """Open a short-lived connection (safe across threads/processes), run one transaction and close it."""
+    global _initialized
+    connection = sqlite3.connect(path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    try:
+        if not _initialized:
+            with _lock:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(_SCHEMA)
+                connection.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+                connection.commit()
+                _initialized = True
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def _row_to_job(row):
+    job = dict(row)
+    for field in ("progress", "payload", "result"):
+        job[field] = json.loads(job[field])
+    return job
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def submit(job_id, payload):
+    """Queue a job; payload must be JSON-serialisable (file paths, options). Returns the job ID."""
+    now = time.time()
+    progress = {stage: {"status": "pending", "seconds": None} for stage in STAGES}
+    with _connect() as connection:
+        connection.execute(
+            "INSERT INTO jobs (id, status, progress, payload, result, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(progress), json.dumps(payload), json.dumps({}), now, now),
+        )
+    return job_id
+
+
+def get(job_id):
+    """Return the job as a dict, or None if it does not exist."""
+    with _connect() as connection:
+        row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row is not None else None
+
+
+def claim(worker):
+    """
+    Atomically take the oldest queued job for this worker.
+
+    Returns:
+        dict: The claimed job, or None if the queue is empty.
+    """
+    while True:
+        with _connect() as connection:
+            row = connection.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            # The status guard makes the claim a compare-and-set: a concurrent worker that got here first wins
+            claimed = connection.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, worker, time.time(), row["id"], QUEUED),
+            ).rowcount
+        if claimed:
+            return get(row["id"])
+
+
+# Writes by the worker running a job pass its claim (the job's attempts value at claim time); they
+# only apply while the job is still running under that claim and return whether they did.
+_OWNED = "id = ? AND status = ? AND attempts = ?"
+
+
+def _update_progress(job_id, attempt, stage, status, seconds=None, output=None):
+    with _connect() as connection:
+        row = connection.execute(f"SELECT progress, result FROM jobs WHERE {_OWNED}",
+                                 (job_id, RUNNING, attempt)).fetchone()
+        if row is None:
+            return False
+        progress, result = json.loads(row["progress"]), json.loads(row["result"])
+        progress[stage] = {"status": status, "seconds": None if seconds is None else round(seconds, 3)}
+        if output is not None:
+            result[stage] = output
+        connection.execute(
+            f"UPDATE jobs SET stage = ?, progress = ?, result = ?, updated_at = ? WHERE {_OWNED}",
+            (stage, json.dumps(progress), json.dumps(result), time.time(), job_id, RUNNING, attempt),
+        )
+    return True
+
+
+def start_stage(job_id, attempt, stage):
+    return _update_progress(job_id, attempt, stage, RUNNING)
+
+
+def finish_stage(job_id, attempt, stage, seconds, output=None, status="done"):
+    """Mark a stage done (or "skipped") and store its output under result[stage]."""
+    return _update_progress(job_id, attempt, stage, status, seconds, output)
+
+
+def heartbeat(job_id, attempt):
+    """Refresh the claim while a long stage runs, so requeue_stale does not hand the job to another worker."""
+    with _connect() as connection:
+        return connection.execute(f"UPDATE jobs SET updated_at = ? WHERE {_OWNED}",
+                                  (time.time(), job_id, RUNNING, attempt)).rowcount > 0
+
+
+def complete(job_id, attempt):
+    with _connect() as connection:
+        return connection.execute(f"UPDATE jobs SET status = ?, updated_at = ? WHERE {_OWNED}",
+                                  (SUCCEEDED, time.time(), job_id, RUNNING, attempt)).rowcount > 0
+
+
+def fail(job_id, attempt, error):
+    with _connect() as connection:
+        return connection.execute(f"UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE {_OWNED}",
+                                  (FAILED, error, time.time(), job_id, RUNNING, attempt)).rowcount > 0
+
+
+def requeue_stale(stale_seconds=config.JOB_STALE_SECONDS, max_attempts=config.JOB_MAX_ATTEMPTS):
+    """
+    Recover jobs whose worker died: running jobs without a heartbeat for stale_seconds are queued
+    again, or failed once they have been attempted max_attempts times.
+
+    Returns:
+        int: Number of jobs requeued.
+    """
+    cutoff = time.time() - stale_seconds
+    with _connect() as connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, error = ? WHERE status = ? AND updated_at < ? AND attempts >= ?",
+            (FAILED, "Worker stopped responding", RUNNING, cutoff, max_attempts),
+        )
+        return connection.execute(
+            "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND updated_at < ?",
+            (QUEUED, RUNNING, cutoff),
+        ).rowcount
+
+
+def stats():
+    """Number of jobs per status."""
+    with _connect() as connection:
+        rows = connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+    return {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0, **{status: count for status, count in rows}}
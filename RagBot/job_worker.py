@@ -0,0 +1,224 @@
+import os
+import sys
+import time
+import shutil
+import asyncio
+import threading
+import argparse
+import traceback
+import multiprocessing
+import config
+import job_queue
+
+# Ensure the repository root is in sys.path for the document analysis package
+sys.path.append(os.path.abspath(os.path.join(config.BASE_DIR, "..")))
+
+# Check requeue_stale at most this often (seconds) while polling
+REQUEUE_INTERVAL = 60
+
+
+class JobFailed(Exception):
+    """A stage produced an unusable result; the message is stored as the job's error."""
+
+
+class JobLost(Exception):
+    """The job was requeued and claimed by another worker while this one was running it."""
+
+
+def application_details(structured):
+    """Map the structured fields extracted from the application to the report generator's fields."""
+    return {
+        "industry_name": structured.get("name") or "",
+        "square_feet": str(structured.get("square_feet") or ""),
+        "number_of_employees": structured.get("number_of_employees") or 0,
+        "power_consumption": structured.get("power_consumption") or {},
+        "water_source": str(structured.get("water_source") or ""),
+        "waste_disposal": structured.get("waste_disposal") or {},
+        "drainage": structured.get("drainage") or "",
+        "air_pollution": structured.get("air_pollution") or "",
+        "waste_management": structured.get("waste_management") or "",
+        "nearby_homes": structured.get("nearby_homes") or "",
+        "water_level_depth": structured.get("water_level_depth") or "",
+    }
+
+
+# ----------------------------
+# Pipeline Stages
+# ----------------------------
+# Heavy modules (OCR, the embedding model, the FastAPI app) are imported inside the stages so
+# that starting a worker stays cheap and a worker only loads what its jobs actually use.
+
+def extract_stage(payload, outputs):
+    path = payload["application"]
+    if path.lower().endswith(".pdf"):
+        from extraction.pdf import extract_text_from_pdf
+        text = extract_text_from_pdf(path)
+    else:
+        from ui.document_analysis.analysis import extract_text_from_image
+        text = extract_text_from_image(path)
+    if not text:
+        raise JobFailed("No text could be extracted from the application document")
+    return {"text": text}
+
+
+def structure_stage(payload, outputs):
+    from ui.document_analysis.analysis import analyze_text_with_lm_studio
+    structured = analyze_text_with_lm_studio(outputs["extract"]["text"])
+    if not structured or "error" in structured:
+        raise JobFailed((structured or {}).get("error", "Structuring returned no fields"))
+    return structured
+
+
+def verify_stage(payload, outputs):
+    if not payload.get("proofs"):
+        return None
+    from ui.document_analysis.verification import verify_documents
+    return verify_documents(payload["proofs"], claimed=outputs["structure"])
+
+
+def retrieve_stage(payload, outputs):
+    from server import retrieve_relevant_rules
+    details = application_details(outputs["structure"])
+    return {"rules": retrieve_relevant_rules(details, payload.get("retrieval_mode", config.RETRIEVAL_MODE))}
+
+
+def generate_stage(payload, outputs):
+    from server import generate_compliance_report_inner
+    import llm_client
+
+    async def generate():
+        try:
+            return await generate_compliance_report_inner(application_details(outputs["structure"]),
+                                                          outputs["retrieve"]["rules"])
+        finally:
+            await llm_client.stop()  # The pooled client is bound to this job's event loop
+
+    report, prompt_usage = asyncio.run(generate())
+    return {"compliance_report": report, "prompt": prompt_usage}
+
+
+STAGE_FUNCTIONS = {
+    "extract": extract_stage,
+    "structure": structure_stage,
+    "verify": verify_stage,
+    "retrieve": retrieve_stage,
+    "generate": generate_stage,
+}
+
+
+def keep_alive(job_id, attempt, stop, interval=config.JOB_HEARTBEAT_SECONDS):
+    """Heartbeat the job's claim until stop is set or the claim is lost."""
+    while not stop.wait(interval):
+        if not job_queue.heartbeat(job_id, attempt):
+            print(f"⚠️ Job {job_id} is no longer claimed by this worker")
+            return
+
+
+def run_job(job):
+    """
+    Run every stage of a claimed job, recording per-stage progress and outputs in the queue.
+    A heartbeat thread keeps the claim fresh during long stages. Every write is conditional on
+    this worker still owning the claim, and the job's documents are only removed once the job
+    has finished under it.
+    """
+    job_id, attempt, payload, outputs = job["id"], job["attempts"], job["payload"], {}
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=keep_alive, args=(job_id, attempt, stop), daemon=True)
+    heartbeat.start()
+    owned = False
+    try:
+        for stage in job_queue.STAGES:
+            if not job_queue.start_stage(job_id, attempt, stage):
+                raise JobLost(stage)
+            start = time.perf_counter()
+            outputs[stage] = STAGE_FUNCTIONS[stage](payload, outputs)
+            seconds = time.perf_counter() - start
+            if not job_queue.finish_stage(job_id, attempt, stage, seconds, outputs[stage],
+                                          status="skipped" if outputs[stage] is None else "done"):
+                raise JobLost(stage)
+            print(f"⏱️ Job {job_id}: {stage} finished in {seconds:.2f}s")
+        owned = job_queue.complete(job_id, attempt)
+        print(f"✅ Job {job_id} succeeded" if owned else f"⚠️ Job {job_id} finished after losing its claim")
+    except JobLost as e:
+        print(f"⚠️ Job {job_id} was taken over during {e}; dropping this worker's results")
+    except JobFailed as e:
+        owned = job_queue.fail(job_id, attempt, str(e))
+        print(f"❌ Job {job_id} failed: {e}")
+    except Exception as e:
+        traceback.print_exc()
+        owned = job_queue.fail(job_id, attempt, f"{type(e).__name__}: {e}")
+        print(f"❌ Job {job_id} failed: {e}")
+    finally:
+        stop.set()
+        heartbeat.join()
+        # Uploaded documents are only needed while the job runs; extraction results stay cached by
+        # content. A requeued job keeps them for the worker that claimed it again, unless requeue_stale
+        # failed it for good under this claim.
+        if not owned:
+            current = job_queue.get(job_id)
+            owned = current is not None and current["attempts"] == attempt and current["status"] == job_queue.FAILED
+        if owned:
+            shutil.rmtree(os.path.join(config.JOBS_DIR, job_id), ignore_errors=True)
+
+
+def run_worker(poll_interval=config.JOB_POLL_INTERVAL):
+    """Claim and run jobs until interrupted."""
+    worker = f"{os.uname().nodename}:{os.getpid()}"
+    print(f"👷 Job worker {worker} started")
+    last_requeue = 0.0
+    try:
+        while True:
+            if time.monotonic() - last_requeue > REQUEUE_INTERVAL:
+                requeued = job_queue.requeue_stale()
+                if requeued:
+                    print(f"♻️ Requeued {requeued} stale job(s)")
+                last_requeue = time.monotonic()
+
+            job = job_queue.claim(worker)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            run_job(job)
+    except KeyboardInterrupt:
+        print(f"👋 Job worker {worker} stopped")
+
+
+def start_workers(count=config.JOB_WORKERS, poll_interval=config.JOB_POLL_INTERVAL):
+    """
+    Start worker processes and return them. They are spawned, so no model or client state is
+    inherited, and not daemonic, because extraction may start its own OCR process pool.
+    """
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=run_worker, args=(poll_interval,), name=f"lawlens-job-worker-{i}")
+        for i in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def stop_workers(workers, timeout=10):
+    """Terminate workers; a job interrupted mid-stage is requeued by requeue_stale later."""
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.join(timeout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run compliance analysis job workers.")
+    parser.add_argument("--workers", type=int, default=max(1, config.JOB_WORKERS), help="Worker processes to run")
+    parser.add_argument("--poll-interval", type=float, default=config.JOB_POLL_INTERVAL,
+                        help="Seconds to wait before polling an empty queue again")
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        run_worker(args.poll_interval)
+    else:
+        processes = start_workers(args.workers, args.poll_interval)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            stop_workers(processes)
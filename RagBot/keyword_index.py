@@ -0,0 +1,108 @@
+import os
+import re
+import math
+import json
+import heapq
+from collections import Counter, defaultdict
+
+# Bump when tokenisation changes so stale indexes are rebuilt by store_documents.py
+INDEX_VERSION = 1
+
+# Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Keeps alphanumeric terms together so "7A", "II" and "1986" survive as tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were
+which with shall any such other under n
+""".split())
+
+
+def tokenize(text):
+    """Lowercase terms of the text without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class KeywordIndex:
+    """
+    BM25 index over the same chunks stored in ChromaDB.
+
+    Only per-chunk term frequencies are persisted; postings lists are rebuilt in memory
+    on first search, so queries touch just the chunks that contain a query term.
+    """
+
+    def __init__(self, docs=None):
+        self.docs = docs or {}  # chunk id -> {"source": str, "terms": {term: tf}, "length": int}
+        self._postings = None
+
+    @classmethod
+    def load(cls, path):
+        """Load an index from disk, returning an empty one if it is missing or outdated."""
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == INDEX_VERSION:
+                return cls(data["docs"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable keyword index {path}: {e}")
+        return cls()
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": INDEX_VERSION, "docs": self.docs}, file)
+        os.replace(tmp_path, path)
+
+    def add(self, ids, texts, sources):
+        for chunk_id, text, source in zip(ids, texts, sources):
+            terms = tokenize(text)
+            self.docs[chunk_id] = {"source": source, "terms": dict(Counter(terms)), "length": len(terms)}
+        self._postings = None
+
+    def remove_source(self, source):
+        """Drop every chunk that came from the given file."""
+        for chunk_id in [chunk_id for chunk_id, doc in self.docs.items() if doc["source"] == source]:
+            del self.docs[chunk_id]
+        self._postings = None
+
+    def _build_postings(self):
+        # Each posting carries the chunk's length-normalised k1 so search does no per-hit lookups
+        total_length = sum(doc["length"] for doc in self.docs.values())
+        average_length = (total_length / len(self.docs)) if self.docs else 1.0
+        postings = defaultdict(list)
+        for chunk_id, doc in self.docs.items():
+            norm_k1 = BM25_K1 * (1 - BM25_B + BM25_B * doc["length"] / (average_length or 1.0))
+            for term, frequency in doc["terms"].items():
+                postings[term].append((chunk_id, frequency, norm_k1))
+        self._postings = dict(postings)
+
+    def search(self, query, n_results=5):
+        """
+        Rank chunks against the query with BM25.
+
+        Returns:
+            list: (chunk_id, score) tuples, best first, at most n_results long.
+        """
+        if self._postings is None:
+            self._build_postings()
+        if not self.docs:
+            return []
+
+        scores = defaultdict(float)
+        doc_count = len(self.docs)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            weight = idf * (BM25_K1 + 1)
+            for chunk_id, frequency, norm_k1 in postings:
+                scores[chunk_id] += weight * frequency / (frequency + norm_k1)
+
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,586 @@
+import os
+import sys
+import copy
+import json
+import time
+import random
+import hashlib
+import asyncio
+import threading
+import collections
+import httpx
+
+# Shared client for every LLM call in the project (RagBot server and scripts, the UI's document
+# analysis, the bill extractor). It keeps one keep-alive connection pool per face (async for the
+# server, sync for Streamlit and scripts), applies connect/read timeouts, retries connection
+# errors and 5xx/429 replies with bounded exponential backoff, and caps generations in flight with
+# one limiter both faces share, so a single local model is not swamped. Identical requests already
+# in flight (Streamlit reruns, double-clicked buttons) are coalesced into one upstream generation
+# whose result, or stream, all callers share. This module only depends on httpx so the UI can import it as `RagBot.llm_client`.
+
+# The server and job worker import this module as "llm_client", the UI and processing code as
+# "RagBot.llm_client". Registering it under both names means a process that does both loads it
+# once, with one connection pool per face, one in-flight map and one concurrency limit.
+for _name in ("llm_client", "RagBot.llm_client"):
+    sys.modules.setdefault(_name, sys.modules[__name__])
+
+# Backend speaking to the model: "openai" (LM Studio, llama.cpp, vLLM: /v1/chat/completions)
+# or "ollama" (native /api/chat). Responses are normalised to the OpenAI shape either way.
+LLM_BACKEND = os.environ.get("LAWLENS_LLM_BACKEND", "openai")
+
+# OpenAI-compatible chat completions endpoint (LM Studio by default) and Ollama's chat endpoint
+LLM_API_URL = os.environ.get("LAWLENS_LLM_URL", "http://localhost:1234/v1/chat/completions")
+OLLAMA_API_URL = os.environ.get("LAWLENS_OLLAMA_URL", "http://localhost:11434/api/chat")
+LLM_MODEL = os.environ.get("LAWLENS_LLM_MODEL", "amethyst-13b-mistral")
+
+# Timeouts in seconds; generations are long, so only connecting is expected to be fast
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LAWLENS_LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LAWLENS_LLM_READ_TIMEOUT", "600"))
+
+# Upper bound on generations in flight against the backend (per process, both faces together),
+# and on pooled connections per face. The generation cap is opt-in (0 = no cap): set it to what a
+# single local GPU can actually run in parallel. Callers beyond the pool size wait for a connection.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LAWLENS_LLM_MAX_CONCURRENCY", "0"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LAWLENS_LLM_MAX_CONNECTIONS", "100"))
+
+# Retries after the first attempt, and the backoff before retry n: min(cap, base * 2**n) plus jitter
+LLM_RETRIES = int(os.environ.get("LAWLENS_LLM_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.environ.get("LAWLENS_LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_CAP = 8.0
+
+# Failures worth another attempt: the request never reached the model or the server was briefly
+# unavailable. Read timeouts are not retried; the model was busy generating and would be again.
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.ReadError,
+                    httpx.WriteError, httpx.RemoteProtocolError)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Share one upstream generation between concurrent requests with the same payload
+LLM_COALESCE = os.environ.get("LAWLENS_LLM_COALESCE", "1") != "0"
+
+_client = None
+_sync_client = None
+_sync_lock = threading.Lock()
+
+
+class _Limiter:
+    """
+    Cap on generations in flight shared by the async and sync faces: `async with` on the event
+    loop, `with` in threads. Slots are handed to waiters in arrival order, whichever face they use.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._active = 0
+        self._lock = threading.Lock()
+        self._waiters = collections.deque()  # threading.Event (sync) or (loop, future) (async)
+
+    def _take(self):
+        if (self.limit <= 0 or self._active < self.limit) and not self._waiters:
+            self._active += 1
+            return True
+        return False
+
+    def __enter__(self):
+        with self._lock:
+            if self._take():
+                return self
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()  # release() handed its slot over
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._take():
+                return self
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            if waiter[1].done() and not waiter[1].cancelled():
+                self.release()  # The slot arrived together with the cancellation; pass it on
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self._hand_over, future)
+                    return
+            self._active -= 1
+
+    def _hand_over(self, future):
+        if future.cancelled():
+            self.release()  # Cancelled after being picked; the next waiter gets the slot
+        else:
+            future.set_result(None)
+
+
+_limiter = _Limiter(LLM_MAX_CONCURRENCY)
+
+_inflight = {}  # Request key -> {"task", "waiters"} (async completions) or _SharedStream (async streams)
+_sync_inflight = {}  # Request key -> {"done", "result", "error"}
+_sync_inflight_lock = threading.Lock()
+
+_stats = {"requests": 0, "retries": 0, "failures": 0, "coalesced": 0}
+_stats_lock = threading.Lock()
+
+
+# ----------------------------
+# Backends
+# ----------------------------
+class OpenAIBackend:
+    """OpenAI-compatible /v1/chat/completions (LM Studio, llama.cpp server, vLLM)."""
+
+    url = LLM_API_URL
+
+    def build_payload(self, messages, temperature, max_tokens, model, stream, response_format=None):
+        payload = build_payload(messages, temperature, max_tokens, model, stream)
+        if response_format is not None:
+            payload["response_format"] = response_format
+        return payload
+
+    def parse_response(self, data):
+        return data
+
+    def parse_stream_line(self, line):
+        """(content delta or None, done) for one line of the server-sent event stream."""
+        if not line.startswith("data:"):
+            return None, False
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return None, True
+        return json.loads(data).get("choices", [{}])[0].get("delta", {}).get("content"), False
+
+
+class OllamaBackend:
+    """Ollama's native /api/chat, which streams newline-delimited JSON."""
+
+    url = OLLAMA_API_URL
+
+    def build_payload(self, messages, temperature, max_tokens, model, stream, response_format=None):
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": stream,
+            "options": {"temperature": temperature},
+        }
+        if max_tokens is not None and max_tokens >= 0:
+            payload["options"]["num_predict"] = max_tokens  # -1 ("backend decides") keeps Ollama's default
+        if response_format is not None:
+            # Ollama takes the JSON schema itself as "format"
+            payload["format"] = (response_format.get("json_schema", {}).get("schema")
+                                 if response_format.get("type") == "json_schema" else "json")
+        return payload
+
+    def parse_response(self, data):
+        return {
+            "model": data.get("model"),
+            "choices": [{"index": 0, "message": data.get("message", {}),
+                         "finish_reason": data.get("done_reason", "stop")}],
+            "usage": {"prompt_tokens": data.get("prompt_eval_count", 0),
+                      "completion_tokens": data.get("eval_count", 0)},
+        }
+
+    def parse_stream_line(self, line):
+        if not line.strip():
+            return None, False
+        data = json.loads(line)
+        return data.get("message", {}).get("content"), bool(data.get("done"))
+
+
+# "lmstudio" is the OpenAI-compatible backend under the name users know it by
+BACKENDS = {"openai": OpenAIBackend(), "lmstudio": OpenAIBackend(), "ollama": OllamaBackend()}
+
+
+def get_backend(name=None):
+    try:
+        return BACKENDS[name or LLM_BACKEND]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend {name or LLM_BACKEND!r}, expected one of {sorted(BACKENDS)}")
+
+
+def _timeout(timeout):
+    """A per-call timeout (seconds to read) or the default connect/read timeouts."""
+    return httpx.Timeout(timeout if timeout is not None else LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _should_retry(error, attempt):
+    """Whether a failed attempt is retried; counts the retry or the final failure."""
+    retryable = isinstance(error, RETRYABLE_ERRORS) or (
+        isinstance(error, httpx.HTTPStatusError) and error.response.status_code in RETRYABLE_STATUS)
+    if retryable and attempt < LLM_RETRIES:
+        _count("retries")
+        print(f"⚠️ LLM request failed ({error!r}), retrying ({attempt + 1}/{LLM_RETRIES})")
+        return True
+    _count("failures")
+    return False
+
+
+def _backoff(attempt):
+    delay = min(LLM_BACKOFF_CAP, LLM_BACKOFF_BASE * 2 ** attempt)
+    return delay + random.uniform(0, delay / 2)
+
+
+def request_key(backend, payload):
+    """Hash identifying identical requests: same backend, model, messages and sampling settings."""
+    material = json.dumps({"url": backend.url, "payload": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# ----------------------------
+# Async Face (FastAPI server)
+# ----------------------------
+async def start():
+    """Create the shared keep-alive client. Call once from the application's startup hook."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=_timeout(None),
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        )
+
+
+async def stop():
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def chat_completion(messages, temperature=0.7, max_tokens=-1, model=LLM_MODEL, backend=None,
+                          response_format=None, timeout=None):
+    """
+    Send a non-streaming chat completion request over the pooled client.
+
+    Args:
+        messages (list): OpenAI-style {"role", "content"} dicts.
+        temperature (float): Sampling temperature.
+        max_tokens (int): Completion limit (-1 lets the backend decide).
+        model (str): Model name loaded in the backend.
+        backend (str): "openai"/"lmstudio" or "ollama"; defaults to LAWLENS_LLM_BACKEND.
+        response_format (dict): OpenAI-style response_format, e.g. a JSON schema to constrain the reply.
+        timeout (float): Seconds to wait for the reply instead of LAWLENS_LLM_READ_TIMEOUT.
+
+    Returns:
+        dict: The decoded JSON response, in the OpenAI chat completion shape.
+
+    Raises:
+        httpx.HTTPError: On connection failures, timeouts or non-2xx responses once retries are exhausted.
+    """
+    await start()
+    chosen = get_backend(backend)
+    payload = chosen.build_payload(messages, temperature, max_tokens, model, False, response_format)
+    if not LLM_COALESCE:
+        return await _post(chosen, payload, timeout)
+
+    key = request_key(chosen, payload)
+    entry = _inflight.get(key)
+    if entry is None:
+        entry = _inflight[key] = {"task": asyncio.create_task(_post(chosen, payload, timeout)), "waiters": 0}
+        entry["task"].add_done_callback(lambda _: _inflight.pop(key, None) if _inflight.get(key) is entry else None)
+    else:
+        _count("coalesced")
+    entry["waiters"] += 1
+    try:
+        # Shielded so one caller going away (client disconnect) does not cancel the others' generation
+        return copy.deepcopy(await asyncio.shield(entry["task"]))
+    finally:
+        entry["waiters"] -= 1
+        if entry["waiters"] == 0 and not entry["task"].done():
+            entry["task"].cancel()
+            if _inflight.get(key) is entry:
+                del _inflight[key]
+
+
+async def _post(chosen, payload, timeout):
+    """One upstream chat completion, retried per RETRYABLE_ERRORS/RETRYABLE_STATUS."""
+    _count("requests")
+    attempt = 0
+    while True:
+        try:
+            async with _limiter:
+                response = await _client.post(chosen.url, json=payload, timeout=_timeout(timeout))
+            response.raise_for_status()
+            return chosen.parse_response(response.json())
+        except httpx.HTTPError as e:
+            if not _should_retry(e, attempt):
+                raise
+        await asyncio.sleep(_backoff(attempt))
+        attempt += 1
+
+
+async def stream_chat_completion(messages, temperature=0.7, max_tokens=-1, model=LLM_MODEL, backend=None,
+                                 timeout=None):
+    """
+    Stream a chat completion, yielding the content deltas as the backend produces them.
+    Failures before the first delta are retried; once text has been yielded they are raised.
+
+    Args:
+        messages (list): OpenAI-style {"role", "content"} dicts.
+        temperature (float): Sampling temperature.
+        max_tokens (int): Completion limit (-1 lets the backend decide).
+        model (str): Model name loaded in the backend.
+        backend (str): "openai"/"lmstudio" or "ollama"; defaults to LAWLENS_LLM_BACKEND.
+        timeout (float): Seconds to wait between chunks instead of LAWLENS_LLM_READ_TIMEOUT.
+
+    Yields:
+        str: Successive pieces of the assistant message.
+
+    Raises:
+        httpx.HTTPError: On connection failures, timeouts or non-2xx responses.
+    """
+    await start()
+    chosen = get_backend(backend)
+    payload = chosen.build_payload(messages, temperature, max_tokens, model, True)
+    if not LLM_COALESCE:
+        async for delta in _stream(chosen, payload, timeout):
+            yield delta
+        return
+
+    key = request_key(chosen, payload)
+    shared = _inflight.get(key)
+    if shared is None:
+        shared = _inflight[key] = _SharedStream()
+        shared.task = asyncio.create_task(shared.pump(_stream(chosen, payload, timeout)))
+        shared.task.add_done_callback(lambda _: _inflight.pop(key, None) if _inflight.get(key) is shared else None)
+    else:
+        _count("coalesced")
+    shared.subscribers += 1
+    try:
+        async for delta in shared.subscribe():
+            yield delta
+    finally:
+        shared.subscribers -= 1
+        if shared.subscribers == 0 and not shared.task.done():
+            shared.task.cancel()
+            if _inflight.get(key) is shared:
+                del _inflight[key]
+
+
+async def _stream(chosen, payload, timeout):
+    """One upstream streamed completion; failures before the first delta are retried."""
+    _count("requests")
+    attempt = 0
+    while True:
+        started = False
+        try:
+            async with _limiter:
+                async with _client.stream("POST", chosen.url, json=payload, timeout=_timeout(timeout)) as response:
+                    if response.is_error:
+                        await response.aread()
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        delta, done = chosen.parse_stream_line(line)
+                        if delta:
+                            started = True
+                            yield delta
+                        if done:
+                            break
+            return
+        except httpx.HTTPError as e:
+            if started or not _should_retry(e, attempt):
+                raise
+        await asyncio.sleep(_backoff(attempt))
+        attempt += 1
+
+
+class _SharedStream:
+    """
+    One upstream stream fanned out to every subscriber. Deltas are kept until the stream ends, so
+    a request joining midway first replays what was already generated, then follows live.
+    """
+
+    def __init__(self):
+        self.deltas = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Condition()
+
+    async def pump(self, deltas):
+        try:
+            async for delta in deltas:
+                async with self._changed:
+                    self.deltas.append(delta)
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.deltas) or self.done)
+            while index < len(self.deltas):
+                yield self.deltas[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+# ----------------------------
+# Sync Face (Streamlit, scripts, worker threads)
+# ----------------------------
+def _get_sync_client():
+    global _sync_client
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(
+                    timeout=_timeout(None),
+                    limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                        max_keepalive_connections=LLM_MAX_CONNECTIONS),
+                )
+    return _sync_client
+
+
+def close_sync():
+    """Close the shared sync client (it is recreated on the next call)."""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+def chat_completion_sync(messages, temperature=0.7, max_tokens=-1, model=LLM_MODEL, backend=None,
+                         response_format=None, timeout=None):
+    """Blocking chat_completion for code without an event loop; same arguments, result and errors."""
+    chosen = get_backend(backend)
+    payload = chosen.build_payload(messages, temperature, max_tokens, model, False, response_format)
+    if not LLM_COALESCE:
+        return _post_sync(chosen, payload, timeout)
+
+    key = request_key(chosen, payload)
+    with _sync_inflight_lock:
+        entry = _sync_inflight.get(key)
+        leader = entry is None
+        if leader:
+            entry = _sync_inflight[key] = {"done": threading.Event(), "result": None, "error": None}
+    if not leader:
+        _count("coalesced")
+        entry["done"].wait()
+        if entry["error"] is not None:
+            raise entry["error"]
+        return copy.deepcopy(entry["result"])
+
+    try:
+        entry["result"] = _post_sync(chosen, payload, timeout)
+        return entry["result"]
+    except BaseException as e:
+        entry["error"] = e
+        raise
+    finally:
+        with _sync_inflight_lock:
+            del _sync_inflight[key]
+        entry["done"].set()
+
+
+def _post_sync(chosen, payload, timeout):
+    client = _get_sync_client()
+    _count("requests")
+    attempt = 0
+    while True:
+        try:
+            with _limiter:
+                response = client.post(chosen.url, json=payload, timeout=_timeout(timeout))
+            response.raise_for_status()
+            return chosen.parse_response(response.json())
+        except httpx.HTTPError as e:
+            if not _should_retry(e, attempt):
+                raise
+        time.sleep(_backoff(attempt))
+        attempt += 1
+
+
+def stream_chat_completion_sync(messages, temperature=0.7, max_tokens=-1, model=LLM_MODEL, backend=None,
+                                timeout=None):
+    """Blocking stream_chat_completion; yields content deltas, retrying only before the first one."""
+    client = _get_sync_client()
+    chosen = get_backend(backend)
+    payload = chosen.build_payload(messages, temperature, max_tokens, model, True)
+    _count("requests")
+    attempt = 0
+    while True:
+        started = False
+        try:
+            with _limiter:
+                with client.stream("POST", chosen.url, json=payload, timeout=_timeout(timeout)) as response:
+                    if response.is_error:
+                        response.read()
+                        response.raise_for_status()
+                    for line in response.iter_lines():
+                        delta, done = chosen.parse_stream_line(line)
+                        if delta:
+                            started = True
+                            yield delta
+                        if done:
+                            break
+            return
+        except httpx.HTTPError as e:
+            if started or not _should_retry(e, attempt):
+                raise
+        time.sleep(_backoff(attempt))
+        attempt += 1
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def build_payload(messages, temperature, max_tokens, model, stream):
+    """Build the OpenAI-compatible request body."""
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": stream
+    }
+
+
+def message_content(response_data, default=""):
+    """Return the assistant message text of a chat completion response."""
+    return response_data.get("choices", [{}])[0].get("message", {}).get("content", default)
+
+
+def stats():
+    """
+    Upstream requests sent, retries, requests that failed after their retries, and calls that
+    joined an identical in-flight request instead of sending their own, since the process started.
+    """
+    with _stats_lock:
+        values = dict(_stats)
+    values["in_flight"] = len(_inflight) + len(_sync_inflight)
+    return values
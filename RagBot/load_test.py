@@ -0,0 +1,81 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import httpx
+import config
+
+# Load generator for the RagBot server. Run it against server.py backed by stub_llm.py:
+#   python stub_llm.py --latency 2 &
+#   python server.py &
+#   python load_test.py --endpoint chat --concurrency 64 --requests 256
+SERVER_URL = "http://localhost:8000"
+
+with open(os.path.join(config.BASE_DIR, "industrial_application.json"), "r") as file:
+    SAMPLE_APPLICATION = json.load(file)
+
+PAYLOADS = {
+    "chat": {"messages": [
+        {"role": "system", "content": "You are an AI assistant helping with industrial compliance questions."},
+        {"role": "user", "content": "Which permissions do I need to start a factory in Kerala?"},
+    ]},
+    "generate_report": {key: str(value) for key, value in SAMPLE_APPLICATION.items()},
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+async def run_load_test(endpoint, concurrency, total_requests, server_url=SERVER_URL, payloads=None, headers=None):
+    """
+    Fire total_requests POSTs at the endpoint with at most `concurrency` in flight and report throughput.
+    Requests cycle through `payloads` when given, otherwise they all send the endpoint's sample payload.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    payloads = payloads or [PAYLOADS[endpoint]]
+    latencies, failures = [], 0
+
+    async with httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one_request(index):
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(f"{server_url}/{endpoint}", json=payloads[index % len(payloads)],
+                                             headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    failures += 1
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(one_request(index) for index in range(total_requests)))
+        elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_sec": round(total_requests / elapsed, 2),
+        "latency_p50_s": round(statistics.median(latencies), 3),
+        "latency_p95_s": round(percentile(latencies, 0.95), 3),
+        "latency_p99_s": round(percentile(latencies, 0.99), 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure requests/sec of the RagBot server endpoints.")
+    parser.add_argument("--endpoint", choices=sorted(PAYLOADS), default="chat")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--server-url", default=SERVER_URL)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run_load_test(args.endpoint, args.concurrency, args.requests, args.server_url)), indent=2))
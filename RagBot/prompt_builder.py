@@ -0,0 +1,166 @@
+import re
+import math
+import config
+
+# Token-budgeted assembly of retrieved passages into the report prompt. Passages arrive best
+# first from retrieval; near-duplicates (overlapping chunks, the same clause in two documents)
+# are dropped, each passage is capped at PROMPT_MAX_PASSAGE_TOKENS, and passages are added in
+# relevance order until the context budget is spent, so prefill cost no longer depends on what
+# retrieval returned.
+#
+# The LLM's tokenizer is not available in-process, so tokens are estimated from characters.
+# Llama/Mistral tokenizers average ~4 characters per token on English prose and fewer on
+# statute text full of numbers and punctuation; 3.5 errs towards overestimating.
+CHARS_PER_TOKEN = config.PROMPT_CHARS_PER_TOKEN
+
+# Passages whose word 5-gram sets overlap at least this much (Jaccard) count as duplicates
+DEDUP_SIMILARITY = 0.8
+SHINGLE_SIZE = 5
+
+# A passage is only truncated to fit the remaining budget if at least this many tokens remain
+MIN_PASSAGE_TOKENS = 48
+
+# Only the first max_passage_tokens of a passage can reach the prompt, so whitespace is collapsed
+# and shingles are taken on a prefix of this many times that length (whole-document hits run to
+# hundreds of kilobytes), leaving room for whitespace runs in extracted PDF text
+PREFIX_FACTOR = 4
+
+_WHITESPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def messages_tokens(messages):
+    """Estimated prompt tokens of chat messages, including a few tokens of per-message framing."""
+    return sum(estimate_tokens(message["content"]) + 4 for message in messages)
+
+
+def _as_hit(passage):
+    """Accept retrieval hits ({"id", "document", "metadata"}) or plain document strings."""
+    if isinstance(passage, dict):
+        return passage
+    return {"id": None, "document": str(passage), "metadata": {}}
+
+
+def _shingles(text):
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[index:index + SHINGLE_SIZE]) for index in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _is_duplicate(shingles, kept_shingles):
+    for other in kept_shingles:
+        overlap = len(shingles & other)
+        # Contained in a kept passage, or mostly the same text
+        if overlap == len(shingles) or overlap / len(shingles | other) >= DEDUP_SIMILARITY:
+            return True
+    return False
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to about max_tokens, preferring a sentence end, then a word boundary."""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - 1]
+    sentence_end = max(cut.rfind(". "), cut.rfind("; "))
+    if sentence_end > max_chars // 2:
+        return cut[:sentence_end + 1] + " …"
+    return cut.rsplit(" ", 1)[0] + " …"
+
+
+def citation(metadata):
+    """Compact source label such as "factories_act.pdf, Section 7A, p. 12-13"."""
+    parts = [metadata.get("source") or "unknown source"]
+    if metadata.get("section"):
+        parts.append(metadata["section"])
+    page_start, page_end = metadata.get("page_start"), metadata.get("page_end")
+    if page_start:
+        parts.append(f"p. {page_start}" if page_end in (None, page_start) else f"p. {page_start}-{page_end}")
+    return ", ".join(str(part) for part in parts)
+
+
+def pack_passages(passages, budget_tokens, max_passage_tokens=config.PROMPT_MAX_PASSAGE_TOKENS):
+    """
+    Select, deduplicate, truncate and format passages within a token budget.
+
+    Args:
+        passages (list): Retrieval hits or document strings, best first.
+        budget_tokens (int): Tokens available for the formatted passages.
+        max_passage_tokens (int): Cap on a single passage's text.
+
+    Returns:
+        tuple: (formatted passages block, stats dict with tokens used and passages kept/dropped/truncated).
+    """
+    blocks, kept_shingles, citations = [], [], []
+    stats = {"passages_in": len(passages), "passages_used": 0, "dropped_duplicate": 0, "dropped_budget": 0,
+             "truncated": 0, "passage_tokens": 0}
+    remaining = budget_tokens
+
+    for passage in passages:
+        hit = _as_hit(passage)
+        document = hit.get("document") or ""
+        prefix = document[:PREFIX_FACTOR * int(max_passage_tokens * CHARS_PER_TOKEN)]
+        text = _WHITESPACE.sub(" ", prefix).strip()
+        if not text:
+            continue
+        truncated = len(prefix) < len(document) or estimate_tokens(text) > max_passage_tokens
+        text = truncate_to_tokens(text, max_passage_tokens)
+        shingles = _shingles(text)  # Of the capped text, so duplicates are judged on what would be sent
+        if _is_duplicate(shingles, kept_shingles):
+            stats["dropped_duplicate"] += 1
+            continue
+
+        header = f"[{len(blocks) + 1}] {citation(hit.get('metadata') or {})}"
+        available = min(max_passage_tokens, remaining - estimate_tokens(header) - 1)
+        if available < MIN_PASSAGE_TOKENS and estimate_tokens(text) > available:
+            stats["dropped_budget"] += 1
+            continue  # A later, shorter passage may still fit
+        if estimate_tokens(text) > available:
+            text = truncate_to_tokens(text, available)
+            truncated = True
+        stats["truncated"] += truncated
+
+        block = f"{header}\n{text}"
+        blocks.append(block)
+        kept_shingles.append(shingles)
+        citations.append({"ref": len(blocks), "id": hit.get("id"), "citation": citation(hit.get("metadata") or {})})
+        remaining -= estimate_tokens(block) + 1
+
+    stats["passages_used"] = len(blocks)
+    stats["passage_tokens"] = budget_tokens - remaining
+    stats["citations"] = citations
+    return "\n\n".join(blocks), stats
+
+
+def build_budgeted_messages(build_messages, passages, context_tokens=config.PROMPT_CONTEXT_TOKENS,
+                            completion_tokens=config.PROMPT_COMPLETION_TOKENS):
+    """
+    Fill a prompt template with as many passages as fit next to it in the context window.
+
+    Args:
+        build_messages (callable): Takes the formatted passages block and returns chat messages.
+        passages (list): Retrieval hits or document strings, best first.
+        context_tokens (int): The model's context window.
+        completion_tokens (int): Tokens kept free for the answer.
+
+    Returns:
+        tuple: (messages, usage) where usage reports the budget, estimated prompt tokens and passage stats.
+    """
+    template_tokens = messages_tokens(build_messages(""))
+    budget = max(0, context_tokens - completion_tokens - template_tokens)
+    passages_block, stats = pack_passages(passages, budget)
+    messages = build_messages(passages_block or "No relevant rules were retrieved.")
+    usage = {
+        "context_tokens": context_tokens,
+        "completion_tokens_reserved": completion_tokens,
+        "template_tokens": template_tokens,
+        "passage_budget_tokens": budget,
+        "prompt_tokens": messages_tokens(messages),
+        **stats,
+    }
+    return messages, usage
@@ -0,0 +1,102 @@
+import os
+import threading
+import config
+
+# Heavy libraries (torch via sentence_transformers, chromadb) are imported on first use,
+# so importing an entry point stays cheap and each process loads them at most once.
+_lock = threading.RLock()
+_model = None
+_reranker = None
+_reranker_error = None
+_client = None
+_collection = None
+_keyword_index = None
+_keyword_index_mtime = None
+
+
+def get_model():
+    """Return the shared SentenceTransformer, loading it on first call."""
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(config.EMBEDDING_MODEL)
+    return _model
+
+
+def get_reranker():
+    """
+    Return the shared CrossEncoder used for reranking, loading it on CPU on first call. A failed
+    load is remembered and re-raised, so requests do not each retry a slow model download.
+    """
+    global _reranker, _reranker_error
+    if _reranker is None:
+        with _lock:
+            if _reranker_error is not None:
+                raise _reranker_error
+            if _reranker is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    _reranker = CrossEncoder(config.RERANK_MODEL, device="cpu")
+                except Exception as e:
+                    _reranker_error = e
+                    raise
+    return _reranker
+
+
+def get_client():
+    """Return the shared ChromaDB client persisted at config.DB_PATH."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import chromadb
+                _client = chromadb.PersistentClient(path=config.DB_PATH)
+    return _client
+
+
+def get_collection():
+    """Return the regulation collection, creating it if it does not exist yet."""
+    global _collection
+    if _collection is None:
+        with _lock:
+            if _collection is None:
+                _collection = get_client().get_or_create_collection(config.COLLECTION_NAME)
+                print(f"Collection '{config.COLLECTION_NAME}' is available at {config.DB_PATH}.")
+    return _collection
+
+
+def get_keyword_index():
+    """
+    Return the BM25 index, reloading it when store_documents.py has rewritten the file.
+    An empty index is returned if none has been built yet.
+    """
+    global _keyword_index, _keyword_index_mtime
+    try:
+        mtime = os.stat(config.KEYWORD_INDEX_PATH).st_mtime
+    except FileNotFoundError:
+        mtime = None
+    if _keyword_index is None or mtime != _keyword_index_mtime:
+        with _lock:
+            if _keyword_index is None or mtime != _keyword_index_mtime:
+                from keyword_index import KeywordIndex
+                _keyword_index = KeywordIndex.load(config.KEYWORD_INDEX_PATH)
+                _keyword_index_mtime = mtime
+    return _keyword_index
+
+
+def warm_up():
+    """
+    Load the models, collection and keyword index and run one encode (and one rerank, if enabled)
+    so the first request pays no start-up cost.
+    """
+    get_collection()
+    get_keyword_index()
+    get_model().encode("warm-up")
+    if config.RERANK_ENABLED:
+        try:
+            get_reranker().predict([("warm-up", "warm-up")])
+        except Exception as e:
+            # Reranking is optional: retrieval keeps its own order (see reranker.rerank_batch)
+            print(f"⚠️ Reranker '{config.RERANK_MODEL}' could not be loaded: {e}")
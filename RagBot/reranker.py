@@ -0,0 +1,81 @@
+import threading
+import time
+import config
+from registry import get_reranker
+from tracing import span
+
+_stats = {"requests": 0, "scored": 0, "unscored": 0, "truncated": 0, "failures": 0}
+_stats_lock = threading.Lock()
+
+
+def rerank_batch(query_texts, hit_lists, n_results, batch_size=config.RERANK_BATCH_SIZE,
+                 budget_seconds=config.RERANK_BUDGET_SECONDS):
+    """
+    Rescore every query's candidates with the cross-encoder and keep the n_results best.
+
+    Pairs are scored rank-major (every query's first candidates, then their second, ...) in
+    batches of batch_size, so when the latency budget runs out each query has had its strongest
+    retrieval candidates rescored. Scored candidates are ordered by score; the rest follow in their
+    retrieval order. The budget starts once the model is loaded, so a cold process does not spend
+    it on loading; calls that run out of budget are logged and counted as "truncated". If the
+    model fails to load or predict, the error is logged, counted under "failures" and the
+    retrieval order is kept, so an optional stage never fails retrieval.
+
+    Args:
+        query_texts (list): The queries, in order.
+        hit_lists (list): One list of candidate hit dicts per query, best first.
+        n_results (int): Hits to keep per query.
+        batch_size (int): (query, passage) pairs per predict call.
+        budget_seconds (float): Scoring stops starting new batches after this long.
+
+    Returns:
+        list: One list of at most n_results hit dicts per query; scored hits carry "rerank_score".
+    """
+    pairs = [(query_index, rank)
+             for rank in range(max((len(hits) for hits in hit_lists), default=0))
+             for query_index, hits in enumerate(hit_lists) if rank < len(hits)]
+    scores, failed = {}, False
+    with span("rerank"):
+        try:
+            model = get_reranker()
+            start = time.perf_counter()
+            for offset in range(0, len(pairs), max(1, batch_size)):
+                if time.perf_counter() - start >= budget_seconds:
+                    break
+                batch = pairs[offset:offset + batch_size]
+                predicted = model.predict([(query_texts[query_index], hit_lists[query_index][rank]["document"])
+                                           for query_index, rank in batch])
+                scores.update(zip(batch, (float(score) for score in predicted)))
+        except Exception as e:
+            print(f"⚠️ Reranking failed, keeping the retrieval order: {type(e).__name__}: {e}")
+            scores, failed = {}, True
+
+    truncated = not failed and len(scores) < len(pairs)
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["scored"] += len(scores)
+        _stats["unscored"] += len(pairs) - len(scores)
+        _stats["truncated"] += truncated
+        _stats["failures"] += failed
+    if truncated:
+        print(f"⚠️ Rerank budget of {budget_seconds}s spent after scoring {len(scores)} of {len(pairs)} "
+              f"candidates; the rest keep their retrieval order")
+
+    reranked = []
+    for query_index, hits in enumerate(hit_lists):
+        scored = sorted((rank for rank in range(len(hits)) if (query_index, rank) in scores),
+                        key=lambda rank: scores[(query_index, rank)], reverse=True)
+        # Hit dicts can be shared between queries (hybrid search), so scores go on copies
+        ranking = [dict(hits[rank], rerank_score=scores[(query_index, rank)]) for rank in scored]
+        ranking += [hit for rank, hit in enumerate(hits) if (query_index, rank) not in scores]
+        reranked.append(ranking[:n_results])
+    return reranked
+
+
+def stats():
+    """
+    Rerank calls, pairs scored and left unscored, calls cut short by the latency budget and calls
+    that fell back to the retrieval order because the model failed, since the process started.
+    """
+    with _stats_lock:
+        return {"enabled": config.RERANK_ENABLED, "model": config.RERANK_MODEL, **_stats}
@@ -0,0 +1,101 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+import config
+
+# One row per generated response; last_access drives LRU eviction once the cache exceeds its size budget
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+
+_lock = threading.Lock()
+_initialized = False
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+
+@contextmanager
+def _connect(path=config.RESPONSE_CACHE_PATH):
+    """Open a short-lived connection (safe across threads/processes), run one transaction and close it."""
+    global _initialized
+    connection = sqlite3.connect(path, timeout=10)
+    try:
+        if not _initialized:
+            with _lock:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(_SCHEMA)
+                connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+                connection.commit()
+                _initialized = True
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def cache_key(messages, model, temperature):
+    """Hash of everything that determines the generation: the full prompt, model name and temperature."""
+    material = json.dumps({"messages": messages, "model": model, "temperature": temperature}, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def get(key, ttl=config.RESPONSE_CACHE_TTL_SECONDS):
+    """Return the cached response for key, or None if it is missing or older than ttl seconds."""
+    now = time.time()
+    with _connect() as connection:
+        row = connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > ttl:
+            _stats["misses"] += 1
+            return None
+        connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+    _stats["hits"] += 1
+    return row[0]
+
+
+def put(key, response, ttl=config.RESPONSE_CACHE_TTL_SECONDS, max_bytes=config.RESPONSE_CACHE_MAX_BYTES):
+    """Store a response, then drop expired rows and least-recently-used rows beyond max_bytes."""
+    now = time.time()
+    size = len(response.encode("utf-8"))
+    with _connect() as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, response, size, now, now),
+        )
+        evicted = connection.execute("DELETE FROM responses WHERE created_at < ?", (now - ttl,)).rowcount
+
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > max_bytes:
+            for row_key, row_size in connection.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access ASC").fetchall():
+                if total <= max_bytes:
+                    break
+                connection.execute("DELETE FROM responses WHERE key = ?", (row_key,))
+                total -= row_size
+                evicted += 1
+    _stats["writes"] += 1
+    _stats["evictions"] += evicted
+
+
+def stats():
+    """Hit/miss/write/eviction counters since start-up."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {**_stats, "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0}
+
+
+def parse_cache_control(header):
+    """
+    Map a request's Cache-Control header to (read, write) flags:
+    "no-cache" forces a fresh generation that still refreshes the cache, "no-store" bypasses it entirely.
+    """
+    directives = {directive.strip().lower() for directive in (header or "").split(",")}
+    if "no-store" in directives:
+        return False, False
+    return "no-cache" not in directives, True
@@ -0,0 +1,150 @@
+import config
+from registry import get_collection, get_keyword_index
+from embedding_cache import encode_queries
+from reranker import rerank_batch
+from tracing import span
+
+RETRIEVAL_MODES = ("vector", "keyword", "hybrid")
+
+_missing_index_logged = False
+
+
+def _hits_from_query(results, index=0):
+    """Flatten the index-th query of a collection.query result into hit dicts."""
+    ids = results.get("ids", [[]])[index]
+    documents = results.get("documents", [[]])[index]
+    metadatas = (results.get("metadatas") or [[]])[index] or [{}] * len(ids)
+    return [
+        {"id": chunk_id, "document": document, "metadata": metadata or {}}
+        for chunk_id, document, metadata in zip(ids, documents, metadatas)
+    ]
+
+
+def _fetch_chunks(ids):
+    """Look up stored documents and metadata for chunk IDs, preserving the requested order."""
+    if not ids:
+        return []
+    ids = list(dict.fromkeys(ids))
+    with span("chroma_get"):
+        results = get_collection().get(ids=ids, include=["documents", "metadatas"])
+    found = {
+        chunk_id: {"id": chunk_id, "document": document, "metadata": metadata or {}}
+        for chunk_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+    }
+    return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+
+def vector_search_batch(query_texts, n_results):
+    """Embed every query in one encode batch and answer them all with one collection.query."""
+    if not query_texts:
+        return []
+    query_embeddings = [embedding.tolist() for embedding in encode_queries(query_texts)]
+    with span("chroma_query"):
+        results = get_collection().query(query_embeddings=query_embeddings, n_results=n_results,
+                                         include=["documents", "metadatas"])
+    return [_hits_from_query(results, index) for index in range(len(query_texts))]
+
+
+def _keyword_index():
+    """The BM25 index, or None (logged once per process) when store_documents.py has not built one yet."""
+    global _missing_index_logged
+    index = get_keyword_index()
+    if not index.docs:
+        if not _missing_index_logged:
+            _missing_index_logged = True
+            print(f"⚠️ No BM25 keyword index at {config.KEYWORD_INDEX_PATH}; using vector search. "
+                  f"Run store_documents.py to build it.")
+        return None
+    return index
+
+
+def keyword_search_batch(query_texts, n_results):
+    """
+    BM25-rank every query, then fetch the stored chunks of all of them in one lookup. Falls back
+    to vector search when no keyword index has been built, like hybrid search does.
+    """
+    index = _keyword_index()
+    if index is None:
+        return vector_search_batch(query_texts, n_results)
+    with span("bm25"):
+        rankings = [[chunk_id for chunk_id, _ in index.search(query_text, n_results)] for query_text in query_texts]
+    found = {hit["id"]: hit for hit in _fetch_chunks([chunk_id for ranking in rankings for chunk_id in ranking])}
+    return [[found[chunk_id] for chunk_id in ranking if chunk_id in found] for ranking in rankings]
+
+
+def reciprocal_rank_fusion(rankings, k=config.RRF_K):
+    """
+    Fuse several ranked lists of chunk IDs: score(d) = sum over lists of 1 / (k + rank of d).
+
+    Returns:
+        list: Chunk IDs ordered by fused score, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def hybrid_search_batch(query_texts, n_results, candidates=config.RETRIEVAL_CANDIDATES):
+    """Vector and BM25 candidates for every query, fused with RRF; chunks found only by BM25 are fetched together."""
+    pool_size = max(candidates, n_results)
+    index = _keyword_index()
+    vector_hits = vector_search_batch(query_texts, pool_size)
+    if index is None:
+        return [hits[:n_results] for hits in vector_hits]
+    with span("bm25"):
+        keyword_rankings = [[chunk_id for chunk_id, _ in index.search(query_text, pool_size)]
+                            for query_text in query_texts]
+
+    fused_rankings, known = [], {}
+    for hits, keyword_ranking in zip(vector_hits, keyword_rankings):
+        known.update({hit["id"]: hit for hit in hits})
+        if keyword_ranking:
+            fused_rankings.append(reciprocal_rank_fusion([[hit["id"] for hit in hits], keyword_ranking])[:n_results])
+        else:
+            fused_rankings.append([hit["id"] for hit in hits][:n_results])  # No query term is indexed
+
+    missing = [chunk_id for ranking in fused_rankings for chunk_id in ranking if chunk_id not in known]
+    known.update({hit["id"]: hit for hit in _fetch_chunks(missing)})
+    return [[known[chunk_id] for chunk_id in ranking if chunk_id in known] for ranking in fused_rankings]
+
+
+def search_batch(query_texts, mode=config.RETRIEVAL_MODE, n_results=config.RETRIEVAL_N_RESULTS,
+                 rerank=config.RERANK_ENABLED):
+    """
+    Retrieve the most relevant chunks for many queries at once: one encode batch, one
+    multi-query collection.query and one chunk lookup, however many queries there are.
+    With rerank, a pool of config.RERANK_CANDIDATES per query is retrieved instead and
+    rescored by the cross-encoder, which keeps the n_results best.
+
+    Returns:
+        list: One list of hit dicts per query, in the order of query_texts.
+    """
+    pool_size = max(config.RERANK_CANDIDATES, n_results) if rerank else n_results
+    if mode == "keyword":
+        hit_lists = keyword_search_batch(query_texts, pool_size)
+    elif mode == "hybrid":
+        hit_lists = hybrid_search_batch(query_texts, pool_size, candidates=max(config.RETRIEVAL_CANDIDATES, pool_size))
+    elif mode == "vector":
+        hit_lists = vector_search_batch(query_texts, pool_size)
+    else:
+        raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+    return rerank_batch(query_texts, hit_lists, n_results) if rerank else hit_lists
+
+
+def search(query_text, mode=config.RETRIEVAL_MODE, n_results=config.RETRIEVAL_N_RESULTS,
+           rerank=config.RERANK_ENABLED):
+    """
+    Retrieve the chunks most relevant to the query.
+
+    Args:
+        query_text (str): Text to search for.
+        mode (str): "vector" (Chroma embeddings), "keyword" (BM25) or "hybrid" (both, fused with RRF).
+        n_results (int): Number of chunks to return.
+        rerank (bool): Rescore a larger candidate pool with the cross-encoder before keeping n_results.
+
+    Returns:
+        list: Hit dicts with "id", "document" and "metadata", best first.
+    """
+    return search_batch([query_text], mode, n_results, rerank)[0]
@@ -1,28 +1,57 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List
+import os
+import time
+import shutil
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Header, UploadFile, File, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError
+from typing import List, Literal, Optional
 import json
-import chromadb
-import requests
-from sentence_transformers import SentenceTransformer
-
-app = FastAPI()
+import httpx
+import config
+import llm_client
+import response_cache
+import job_queue
+import job_worker
+import tracing
+import prompt_builder
+import chat_sessions
+import reranker
+from tracing import span
+from retrieval import search as search_chunks, search_batch
+from registry import warm_up
+from embedding_cache import query_embedding_cache
 
 # ----------------------------
 # ChromaDB and Model Setup
 # ----------------------------
 
-# Initialize ChromaDB client and retrieve (or create) the collection
-client = chromadb.PersistentClient(path="./db")
-try:
-    collection = client.get_collection("industrial-documents")
-except Exception:
-    # If collection doesn't exist, create it
-    collection = client.create_collection("industrial-documents")
-print("Collection 'industrial-documents' is available.")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the SentenceTransformer model and ChromaDB collection once per worker,
+    # before the first request, without blocking the event loop.
+    await run_in_threadpool(warm_up)
+    await llm_client.start()
+    # Background job workers run in their own processes so OCR and generation never block requests
+    workers = job_worker.start_workers(config.JOB_WORKERS)
+    yield
+    job_worker.stop_workers(workers)
+    await llm_client.stop()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(tracing.TracingMiddleware)
+
+# Retrieval strategy selectable per request with ?retrieval=
+RetrievalMode = Literal["vector", "keyword", "hybrid"]
+
+# Sampling temperature of report generation (part of the response cache key)
+REPORT_TEMPERATURE = 0.7
 
-# Load the SentenceTransformer model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Sampling temperature of chat replies, and of the (more literal) summaries of older chat turns
+CHAT_TEMPERATURE = 0.7
+SUMMARY_TEMPERATURE = 0.2
 
 # ----------------------------
 # Pydantic Model for Report Request
@@ -47,15 +76,27 @@ class Message(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[Message]
 
+class ChatSessionRequest(BaseModel):
+    system_prompt: Optional[str] = None
+
+class ChatTurn(BaseModel):
+    message: str
+
 # ----------------------------
 # Compliance Report Generation Functions
 # ----------------------------
-def generate_compliance_report_inner(application_details: dict, rules: list) -> str:
+def build_report_messages(application_details: dict, rules: list) -> tuple:
     """
-    Generate a compliance report using the Mistral-7B model based on the provided industrial
-    application details and retrieved compliance rules.
+    Build the chat messages asking the model for a compliance report on the provided industrial
+    application details and retrieved compliance rules (hits or plain texts, best first).
+    The rules are deduplicated, truncated and numbered for citation within the prompt token
+    budget; returns (messages, prompt usage).
     """
-    messages = [
+    return prompt_builder.build_budgeted_messages(
+        lambda passages: report_messages(application_details, passages), rules)
+
+def report_messages(application_details: dict, passages: str) -> list:
+    return [
         {
             "role": "system",
             "content": "You are an AI expert in industrial compliance. Analyze the given industrial application."
@@ -75,7 +116,7 @@ Industrial Compliance Report:
 - **Water Level Depth:** {application_details.get('water_level_depth', 'N/A')}
 
 **Top Relevant Compliance Rules from ChromaDB:**
-{rules}
+{passages}
 
 **Task:**  
 1. Analyze whether the industrial application follows these compliance rules.
@@ -84,34 +125,55 @@ Industrial Compliance Report:
 4. Recommend corrective actions if necessary.
 5. Provide a final approval decision (Approve/Reject/Needs Review).
 
+Cite the rules you rely on by their [number].
 **Provide a structured and concise response.**
 """
         }
     ]
-    payload = {
-        "model": "amethyst-13b-mistral",
-        "messages": messages,
-        "temperature": 0.7,
-        "max_tokens": -1,
-        "stream": False
-    }
-    headers = {"Content-Type": "application/json"}
-    response = requests.post(
-        "http://localhost:1234/v1/chat/completions",  # Mistral-7B API endpoint
-        headers=headers,
-        json=payload
-    )
+
+def report_cache_key(messages: list) -> str:
+    return response_cache.cache_key(messages, llm_client.LLM_MODEL, REPORT_TEMPERATURE)
+
+async def traced_chat_completion(messages: list, temperature: float, max_tokens: int = -1) -> dict:
+    """llm_client.chat_completion, recording its duration and token usage for /metrics and Server-Timing."""
+    with span("llm_total"):
+        response_data = await llm_client.chat_completion(messages, temperature=temperature, max_tokens=max_tokens)
+    tracing.record_usage(response_data)
+    return response_data
+
+async def generate_compliance_report_inner(application_details: dict, rules: list,
+                                           read_cache: bool = True, write_cache: bool = True) -> tuple:
+    """
+    Generate a compliance report using the Mistral-7B model based on the provided industrial
+    application details and retrieved compliance rules. Identical prompts (same fields and same
+    retrieved rules) are answered from the persistent response cache.
+    Returns (report, prompt usage).
+    """
+    with span("prompt_build"):
+        messages, prompt_usage = build_report_messages(application_details, rules)
+        key = report_cache_key(messages)
+    if read_cache:
+        with span("cache_lookup"):
+            cached_report = await run_in_threadpool(response_cache.get, key)
+        if cached_report is not None:
+            return cached_report, prompt_usage
+
+    # Mistral-7B API endpoint; the completion is capped at what the prompt budget reserved for it
+    response_data = await traced_chat_completion(messages, temperature=REPORT_TEMPERATURE,
+                                                 max_tokens=config.PROMPT_COMPLETION_TOKENS)
     try:
-        return response.json().get("choices", [{}])[0].get("message", {}).get("content", "⚠️ AI Response Error.")
+        report = llm_client.message_content(response_data, None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error parsing AI response: {e}")
+    if report is None:
+        return "⚠️ AI Response Error.", prompt_usage
+    if write_cache:
+        await run_in_threadpool(response_cache.put, key, report)
+    return report, prompt_usage
 
-def generate_industrial_compliance_report(industry_details: dict) -> str:
-    """
-    Given industrial application details, perform retrieval to find relevant compliance rules
-    from ChromaDB and generate a compliance report using the Mistral-7B model.
-    """
-    query_text = f"""
+def rules_query_text(industry_details: dict) -> str:
+    """Retrieval query describing the industrial application."""
+    return f"""
 Industry Name: {industry_details.get('industry_name', 'N/A')}
 Square Feet: {industry_details.get('square_feet', 'N/A')}
 Water Source: {industry_details.get('water_source', 'N/A')}
@@ -121,55 +183,459 @@ Waste Management: {industry_details.get('waste_management', 'N/A')}
 Nearby Homes: {industry_details.get('nearby_homes', 'N/A')}
 Water Level Depth: {industry_details.get('water_level_depth', 'N/A')}
 """
-    query_embedding = model.encode(query_text).tolist()
-    results = collection.query(query_embeddings=[query_embedding], n_results=5)
-    relevant_rules = results.get("documents", [[]])[0]
-    print("\n🔹 **Top Relevant Compliance Rules from ChromaDB:**\n")
-    for rule in relevant_rules:
-        print(f"- {rule}")
-    report = generate_compliance_report_inner(industry_details, relevant_rules)
-    return report
+
+def retrieve_relevant_rules(industry_details: dict, retrieval_mode: str = config.RETRIEVAL_MODE) -> list:
+    """
+    Retrieve the most relevant compliance rules for the industrial application details using
+    embeddings ("vector"), BM25 ("keyword") or both fused ("hybrid"). Blocking (CPU-bound
+    encode), so async callers run it in a thread. Returns hits ({"id", "document", "metadata"}),
+    best first, so the prompt can cite their source.
+    """
+    with span("retrieve"):
+        hits = search_chunks(rules_query_text(industry_details), mode=retrieval_mode)
+    print(f"\n🔹 **Top Relevant Compliance Rules from ChromaDB ({retrieval_mode}):**\n")
+    for hit in hits:
+        print(f"- {prompt_builder.citation(hit['metadata'])}: {hit['document'][:200]}")
+    return hits
+
+def retrieve_relevant_rules_batch(industry_details_list: list, retrieval_mode: str = config.RETRIEVAL_MODE) -> list:
+    """
+    Retrieve the relevant compliance rules of many applications with one embedding batch and one
+    multi-query ChromaDB lookup. Returns one list of hits per application, in order.
+    """
+    query_texts = [rules_query_text(industry_details) for industry_details in industry_details_list]
+    with span("retrieve"):
+        return search_batch(query_texts, mode=retrieval_mode)
+
+async def generate_industrial_compliance_report(industry_details: dict,
+                                                read_cache: bool = True, write_cache: bool = True,
+                                                retrieval_mode: str = config.RETRIEVAL_MODE) -> tuple:
+    """
+    Given industrial application details, perform retrieval to find relevant compliance rules
+    from ChromaDB and generate a compliance report using the Mistral-7B model.
+    Returns (report, prompt usage).
+    """
+    relevant_rules = await run_in_threadpool(retrieve_relevant_rules, industry_details, retrieval_mode)
+    return await generate_compliance_report_inner(industry_details, relevant_rules, read_cache, write_cache)
+
+# ----------------------------
+# Server-Sent Events Helpers
+# ----------------------------
+def sse_event(data, event: str = None) -> str:
+    """Format one Server-Sent Event whose data is JSON-encoded (keeps newlines inside a single event)."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def stream_as_sse(deltas):
+    """
+    Relay LLM content deltas as SSE: one {"delta": ...} event per piece, an "error" event if the
+    backend fails mid-stream, and a final "data: [DONE]" like the OpenAI API.
+    """
+    try:
+        async for delta in deltas:
+            yield sse_event({"delta": delta})
+    except Exception as e:
+        yield sse_event({"detail": f"Error calling LLM: {e}"}, event="error")
+    yield "data: [DONE]\n\n"
+
+async def cached_deltas(deltas, key: str, write_cache: bool):
+    """Pass deltas through and store the full text in the response cache once the stream completes."""
+    pieces = []
+    async for delta in deltas:
+        pieces.append(delta)
+        yield delta
+    if write_cache and pieces:
+        await run_in_threadpool(response_cache.put, key, "".join(pieces))
+
+async def single_delta(text: str):
+    yield text
+
+def sse_response(deltas, headers: dict = None) -> StreamingResponse:
+    # Disable proxy buffering so tokens reach the browser as soon as they are produced
+    return StreamingResponse(
+        stream_as_sse(deltas),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})}
+    )
 
 # ----------------------------
 # FastAPI Endpoints
 # ----------------------------
 
 @app.post("/generate_report")
-def generate_report(app_details: IndustrialApplication):
+async def generate_report(app_details: IndustrialApplication, cache_control: Optional[str] = Header(None),
+                          retrieval: RetrievalMode = config.RETRIEVAL_MODE):
     """
     Expects an industrial application JSON in the request body and returns a compliance report.
+    Send "Cache-Control: no-cache" to force a fresh generation, or "no-store" to bypass the cache.
+    The ?retrieval= query parameter selects vector, keyword (BM25) or hybrid rule retrieval.
     """
+    read_cache, write_cache = response_cache.parse_cache_control(cache_control)
     try:
         industry_details = app_details.dict()
-        report = generate_industrial_compliance_report(industry_details)
-        return {"compliance_report": report}
+        report, prompt_usage = await generate_industrial_compliance_report(industry_details, read_cache, write_cache,
+                                                                           retrieval_mode=retrieval)
+        return {"compliance_report": report, "prompt": prompt_usage}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/generate_report/stream")
+async def generate_report_stream(app_details: IndustrialApplication, cache_control: Optional[str] = Header(None),
+                                 retrieval: RetrievalMode = config.RETRIEVAL_MODE):
+    """
+    Same as /generate_report, but streams the report as Server-Sent Events while it is generated.
+    A cached report is sent as a single event.
+    """
+    read_cache, write_cache = response_cache.parse_cache_control(cache_control)
+    industry_details = app_details.dict()
+    try:
+        relevant_rules = await run_in_threadpool(retrieve_relevant_rules, industry_details, retrieval)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    with span("prompt_build"):
+        messages, prompt_usage = build_report_messages(industry_details, relevant_rules)
+        key = report_cache_key(messages)
+    headers = {"X-Prompt-Tokens": str(prompt_usage["prompt_tokens"]),
+               "X-Prompt-Passages": str(prompt_usage["passages_used"])}
+    if read_cache:
+        with span("cache_lookup"):
+            cached_report = await run_in_threadpool(response_cache.get, key)
+        if cached_report is not None:
+            return sse_response(single_delta(cached_report), headers)
+    deltas = tracing.traced_stream(llm_client.stream_chat_completion(messages, temperature=REPORT_TEMPERATURE,
+                                                                     max_tokens=config.PROMPT_COMPLETION_TOKENS))
+    return sse_response(cached_deltas(deltas, key, write_cache), headers)
+
+
+def parse_batch_lines(body: bytes) -> list:
+    """
+    Parse a JSONL body into (index, application dict or None, error or None) tuples, one per
+    non-blank line, so one malformed application does not fail the whole batch.
+    """
+    items = []
+    for index, line in enumerate(line for line in body.decode("utf-8").splitlines() if line.strip()):
+        try:
+            items.append((index, IndustrialApplication(**json.loads(line)).dict(), None))
+        except (ValueError, TypeError, ValidationError) as e:
+            items.append((index, None, f"Invalid application: {e}"))
+    return items
+
+async def generate_batch_results(items: list, retrieval_mode: str, read_cache: bool, write_cache: bool,
+                                 concurrency: int):
+    """
+    Retrieve rules for every valid application in one batch, then generate the reports with at most
+    `concurrency` in flight, yielding one JSONL result line per application as soon as it finishes.
+    """
+    valid = [(index, details) for index, details, error in items if error is None]
+    for index, details, error in items:
+        if error is not None:
+            yield json.dumps({"index": index, "status": "error", "error": error, "seconds": 0.0}) + "\n"
+    if not valid:
+        return
+
+    start = time.perf_counter()
+    try:
+        rules_per_item = await run_in_threadpool(retrieve_relevant_rules_batch, [details for _, details in valid],
+                                                 retrieval_mode)
+    except Exception as e:
+        for index, details in valid:
+            yield json.dumps({"index": index, "industry_name": details["industry_name"], "status": "error",
+                              "error": f"Retrieval failed: {e}", "seconds": 0.0}) + "\n"
+        return
+    retrieval_seconds = (time.perf_counter() - start) / len(valid)  # Shared batch cost, split evenly
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate_one(index, details, rules):
+        async with semaphore:
+            item_start = time.perf_counter()
+            try:
+                report, prompt_usage = await generate_compliance_report_inner(details, rules, read_cache, write_cache)
+                result = {"status": "ok", "compliance_report": report, "prompt_tokens": prompt_usage["prompt_tokens"]}
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+            result.update({
+                "index": index,
+                "industry_name": details["industry_name"],
+                "seconds": round(retrieval_seconds + time.perf_counter() - item_start, 3),
+            })
+            return result
+
+    tasks = [asyncio.create_task(generate_one(index, details, rules))
+             for (index, details), rules in zip(valid, rules_per_item)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield json.dumps(await task) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()  # Client went away: stop generating the rest
+
+@app.post("/generate_reports/batch")
+async def generate_reports_batch(request: Request, cache_control: Optional[str] = Header(None),
+                                 retrieval: RetrievalMode = config.RETRIEVAL_MODE, concurrency: int = config.BATCH_CONCURRENCY):
+    """
+    Expects a JSONL body with one industrial application per line and streams back one JSONL line per
+    application as its report completes (not in input order): {"index", "industry_name", "status",
+    "compliance_report" or "error", "seconds"}. "index" is the application's position in the input.
+    Rules for all applications are retrieved in one batch; reports are generated `concurrency` at a time.
+    """
+    read_cache, write_cache = response_cache.parse_cache_control(cache_control)
+    try:
+        items = parse_batch_lines(await request.body())
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body must be UTF-8 JSONL: {e}")
+    return StreamingResponse(
+        generate_batch_results(items, retrieval, read_cache, write_cache, max(1, concurrency)),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
 
 
 @app.post("/chat")
-def chat_endpoint(chat_req: ChatRequest):
+async def chat_endpoint(chat_req: ChatRequest):
     """
     Expects a JSON request with a list of chat messages (conversation history)
     and returns the AI's reply. The conversation history is used as context.
     """
-    payload = {
-        "model": "amethyst-13b-mistral",
-        "messages": [msg.dict() for msg in chat_req.messages],
-        "temperature": 0.7,
-        "max_tokens": -1,
-        "stream": False
+    messages = [msg.dict() for msg in chat_req.messages]
+    try:
+        response_data = await traced_chat_completion(messages, temperature=CHAT_TEMPERATURE)
+        chat_reply = llm_client.message_content(response_data, "No reply received.")
+        return {"message": chat_reply}
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calling chat API: {e}")
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(chat_req: ChatRequest):
+    """
+    Same as /chat, but streams the AI's reply as Server-Sent Events.
+    """
+    messages = [msg.dict() for msg in chat_req.messages]
+    return sse_response(tracing.traced_stream(llm_client.stream_chat_completion(messages, temperature=CHAT_TEMPERATURE)))
+
+
+# ----------------------------
+# Chat Sessions
+# ----------------------------
+_compacting = set()  # Sessions this worker is currently summarizing
+_background_tasks = set()  # Strong references so pending compactions are not garbage-collected
+
+async def compact_chat_session(session_id: str):
+    """Fold the oldest messages of a session's window into its running summary."""
+    if session_id in _compacting:
+        return
+    _compacting.add(session_id)
+    try:
+        session = await run_in_threadpool(chat_sessions.get, session_id)
+        if session is None or not chat_sessions.needs_compaction(session["window"]):
+            return
+        folded = chat_sessions.messages_to_fold(session["window"])
+        if not folded:
+            return
+        with span("chat_summarize"):
+            response_data = await llm_client.chat_completion(
+                chat_sessions.summary_messages(session["summary"], folded), temperature=SUMMARY_TEMPERATURE)
+        tracing.record_usage(response_data)
+        summary = llm_client.message_content(response_data).strip()
+        if summary:
+            await run_in_threadpool(chat_sessions.apply_summary, session_id, folded, summary,
+                                    session["summarized_messages"])
+    except Exception as e:
+        # The window just stays longer until the next turn retries
+        print(f"⚠️ Could not summarize chat session {session_id}: {e}")
+    finally:
+        _compacting.discard(session_id)
+
+def schedule_compaction(session_id: str, window: list):
+    """Summarize in the background after the reply has been sent, so no turn waits for it."""
+    if window is None or not chat_sessions.needs_compaction(window):
+        return
+    task = asyncio.create_task(compact_chat_session(session_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def load_chat_session(session_id: str) -> dict:
+    session = await run_in_threadpool(chat_sessions.get, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found.")
+    return session
+
+async def session_deltas(deltas, session_id: str, user_message: str):
+    """Pass deltas through and, once the reply is complete, store the exchange in the session."""
+    pieces = []
+    async for delta in deltas:
+        pieces.append(delta)
+        yield delta
+    exchange = [{"role": "user", "content": user_message}, {"role": "assistant", "content": "".join(pieces)}]
+    window = await run_in_threadpool(chat_sessions.append, session_id, exchange)
+    schedule_compaction(session_id, window)
+
+
+@app.post("/chat/sessions", status_code=201)
+async def create_chat_session(session_req: Optional[ChatSessionRequest] = None):
+    """
+    Starts a server-side conversation and returns its session_id. Turns then only send the new
+    message; the server keeps the recent messages and a summary of older ones.
+    """
+    system_prompt = (session_req.system_prompt if session_req else None) or chat_sessions.DEFAULT_SYSTEM_PROMPT
+    session_id = await run_in_threadpool(chat_sessions.create, system_prompt)
+    return {"session_id": session_id}
+
+
+@app.get("/chat/sessions/{session_id}")
+async def get_chat_session(session_id: str):
+    """Returns the session's summary, the messages still in its window and the estimated prompt size."""
+    session = await load_chat_session(session_id)
+    return {
+        "session_id": session_id,
+        "summary": session["summary"],
+        "summarized_messages": session["summarized_messages"],
+        "messages": session["window"],
+        "prompt_tokens": prompt_builder.messages_tokens(chat_sessions.build_messages(session)),
     }
-    headers = {"Content-Type": "application/json"}
+
+
+@app.delete("/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    if not await run_in_threadpool(chat_sessions.delete, session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found.")
+    return {"deleted": session_id}
+
+
+@app.post("/chat/sessions/{session_id}/messages")
+async def chat_session_message(session_id: str, turn: ChatTurn):
+    """
+    Expects {"message": ...} and returns the AI's reply, using the session's summary and recent
+    messages as context.
+    """
+    session = await load_chat_session(session_id)
+    messages = chat_sessions.build_messages(session, turn.message)
     try:
-        response = requests.post("http://localhost:1234/v1/chat/completions", headers=headers, json=payload)
-        if response.status_code == 200:
-            chat_reply = response.json().get("choices", [{}])[0].get("message", {}).get("content", "No reply received.")
-            return {"message": chat_reply}
-        else:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+        response_data = await traced_chat_completion(messages, temperature=CHAT_TEMPERATURE)
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calling chat API: {e}")
+    chat_reply = llm_client.message_content(response_data, "No reply received.")
+    exchange = [{"role": "user", "content": turn.message}, {"role": "assistant", "content": chat_reply}]
+    window = await run_in_threadpool(chat_sessions.append, session_id, exchange)
+    schedule_compaction(session_id, window)
+    return {"message": chat_reply, "prompt_tokens": prompt_builder.messages_tokens(messages)}
+
+
+@app.post("/chat/sessions/{session_id}/messages/stream")
+async def chat_session_message_stream(session_id: str, turn: ChatTurn):
+    """
+    Same as /chat/sessions/{session_id}/messages, but streams the reply as Server-Sent Events.
+    The exchange is only stored once the reply has streamed completely.
+    """
+    session = await load_chat_session(session_id)
+    messages = chat_sessions.build_messages(session, turn.message)
+    deltas = tracing.traced_stream(llm_client.stream_chat_completion(messages, temperature=CHAT_TEMPERATURE))
+    return sse_response(session_deltas(deltas, session_id, turn.message),
+                        headers={"X-Prompt-Tokens": str(prompt_builder.messages_tokens(messages))})
+
+
+def save_job_upload(job_id: str, name: str, upload: UploadFile) -> str:
+    """Copy an uploaded document into the job's directory and return its path."""
+    job_dir = os.path.join(config.JOBS_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    path = os.path.join(job_dir, name + os.path.splitext(upload.filename or "")[1].lower())
+    with open(path, "wb") as file:
+        shutil.copyfileobj(upload.file, file)
+    return path
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(application: UploadFile = File(...), area: Optional[UploadFile] = File(None),
+                     employees: Optional[UploadFile] = File(None), energy: Optional[UploadFile] = File(None),
+                     water: Optional[UploadFile] = File(None), retrieval: RetrievalMode = config.RETRIEVAL_MODE):
+    """
+    Queues a full compliance analysis (extract, structure, verify, retrieve, generate) of an
+    application document plus optional proof documents, and returns its job ID immediately.
+    Poll GET /jobs/{job_id} or subscribe to GET /jobs/{job_id}/events for progress.
+    """
+    job_id = job_queue.new_job_id()
+    proofs = {"area": area, "employees": employees, "energy": energy, "water": water}
+    try:
+        payload = {
+            "application": await run_in_threadpool(save_job_upload, job_id, "application", application),
+            "proofs": {
+                name: await run_in_threadpool(save_job_upload, job_id, name, upload)
+                for name, upload in proofs.items() if upload is not None
+            },
+            "retrieval_mode": retrieval,
+        }
+        await run_in_threadpool(job_queue.submit, job_id, payload)
+    except Exception as e:
+        shutil.rmtree(os.path.join(config.JOBS_DIR, job_id), ignore_errors=True)
+        raise HTTPException(status_code=500, detail=f"Error queuing job: {e}")
+    return {"job_id": job_id, "status": job_queue.QUEUED, "status_url": f"/jobs/{job_id}"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Returns a job's status, current stage, per-stage progress and timings, and the outputs of
+    the stages finished so far (result.generate.compliance_report once it succeeded).
+    """
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    job.pop("payload")  # Server-side file paths
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Streams the job's progress as Server-Sent Events: one "progress" event per change, ending
+    with "data: [DONE]" once the job succeeded or failed.
+    """
+    if await run_in_threadpool(job_queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+
+    async def events():
+        last_update = None
+        while True:
+            job = await run_in_threadpool(job_queue.get, job_id)
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                job.pop("payload")
+                yield sse_event(job, event="progress")
+            if job["status"] in (job_queue.SUCCEEDED, job_queue.FAILED):
+                break
+            await asyncio.sleep(config.JOB_POLL_INTERVAL)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/metrics")
+def metrics(format: Literal["prometheus", "json"] = "prometheus"):
+    """
+    Returns Prometheus metrics: per-stage latency histograms (embed, chroma_query, bm25, rerank,
+    retrieve, prompt_build, cache_lookup, llm_ttft, llm_total), request latency per route, LLM
+    token counts, and the cache, job, chat session, LLM client (requests, retries, failures,
+    coalesced) and reranker (requests, scored, unscored, truncated, failures) counters. ?format=json returns
+    just the counters as JSON.
+    """
+    stats = {
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "jobs": job_queue.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "llm_client": llm_client.stats(),
+        "reranker": reranker.stats(),
+    }
+    if format == "json":
+        return stats
+    return PlainTextResponse(tracing.render_prometheus(stats), media_type="text/plain; version=0.0.4")
 
 # ----------------------------
 # Auto-run Server When File is Executed
@@ -1,105 +1,241 @@
 import os
-import chromadb
-import fitz  # PyMuPDF for PDFs
+import sys
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import docx
-from sentence_transformers import SentenceTransformer
+import config
+from registry import get_collection, get_model
+from chunking import chunk_pages
+from ingest_manifest import load_manifest, save_manifest, plan_ingestion
+from keyword_index import KeywordIndex
 
-# Initialize ChromaDB
-client = chromadb.PersistentClient(path="./db")
-collection = client.get_or_create_collection("industrial-documents")
+# Ensure the repository root is in sys.path for the shared extraction engine
+sys.path.append(os.path.abspath(os.path.join(config.BASE_DIR, "..")))
 
-# Load sentence transformer model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+from extraction.pdf import extract_pages as extract_pages_from_pdf
 
 # Get the absolute path of the documents directory
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOCUMENTS_DIR = os.path.join(BASE_DIR, "documents")
+DOCUMENTS_DIR = config.DOCUMENTS_DIR
+
+# Records size, mtime, hash and chunk IDs of every ingested file
+MANIFEST_PATH = os.path.join(config.DB_PATH, "ingest_manifest.json")
 
 # Supported document types
 SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
 
+# Number of chunks passed to model.encode and collection.add at once
+EMBED_BATCH_SIZE = 64
 
-# Extract text from PDF
-def extract_text_from_pdf(pdf_path):
-    text = ""
-    try:
-        doc = fitz.open(pdf_path)
-        for page in doc:
-            text += page.get_text() + "\n"
-    except Exception as e:
-        print(f"❌ Error reading PDF {pdf_path}: {e}")
-    return text.strip()
+# Maximum number of chunks waiting between extraction and embedding
+QUEUE_MAX_CHUNKS = 1024
 
+# Marks the end of the chunk stream
+_END_OF_STREAM = None
 
-# Extract text from DOCX
-def extract_text_from_docx(docx_path):
-    text = ""
+# Worker processes used for PDF page extraction
+EXTRACT_WORKERS = os.cpu_count() or 1
+
+
+# Extract text from DOCX (no page information, treated as a single page)
+def extract_pages_from_docx(docx_path):
     try:
         doc = docx.Document(docx_path)
-        for para in doc.paragraphs:
-            text += para.text + "\n"
+        return [(1, "\n".join(para.text for para in doc.paragraphs))]
     except Exception as e:
         print(f"❌ Error reading DOCX {docx_path}: {e}")
-    return text.strip()
+        return []
 
 
-# Extract text from TXT
-def extract_text_from_txt(txt_path):
+# Extract text from TXT (treated as a single page)
+def extract_pages_from_txt(txt_path):
     try:
         with open(txt_path, "r", encoding="utf-8") as file:
-            return file.read().strip()
+            return [(1, file.read())]
     except Exception as e:
         print(f"❌ Error reading TXT {txt_path}: {e}")
-        return ""
+        return []
 
 
-# Process all files in the documents directory
-def process_documents(directory):
-    if not os.path.exists(directory):
-        print(f"❌ Error: Directory '{directory}' does not exist.")
-        return
+# Remove every stored chunk of a file, including the legacy whole-document entry
+def delete_file_chunks(filename, keyword_index, chunk_ids=()):
+    collection = get_collection()
+    collection.delete(ids=list(chunk_ids) + [filename])
+    collection.delete(where={"source": filename})
+    keyword_index.remove_source(filename)
 
-    files = [f for f in os.listdir(directory) if f.endswith(SUPPORTED_EXTENSIONS)]
 
-    if not files:
-        print("⚠️ No valid documents found in the directory.")
-        return
+# Build the BM25 index from whatever is already stored in ChromaDB (databases ingested before it existed)
+def rebuild_keyword_index(keyword_index):
+    stored = get_collection().get(include=["documents", "metadatas"])
+    sources = [(metadata or {}).get("source", chunk_id) for chunk_id, metadata in zip(stored["ids"], stored["metadatas"])]
+    keyword_index.add(stored["ids"], stored["documents"], sources)
+    print(f"🔤 Rebuilt keyword index from {len(stored['ids'])} stored chunks.")
 
-    processed_count = 0
 
-    for filename in files:
-        file_path = os.path.join(directory, filename)
+# Extract and chunk one file, returning its chunks (empty if there is no text)
+def load_chunks(file_path, filename, executor=None):
+    if filename.endswith(".pdf"):
+        pages = extract_pages_from_pdf(file_path, executor=executor)
+    elif filename.endswith(".docx"):
+        pages = extract_pages_from_docx(file_path)
+    elif filename.endswith(".txt"):
+        pages = extract_pages_from_txt(file_path)
+    else:
+        return []
+    return chunk_pages(pages, filename)
 
-        print(f"📂 Processing: {filename}")
 
-        if filename.endswith(".pdf"):
-            text = extract_text_from_pdf(file_path)
-        elif filename.endswith(".docx"):
-            text = extract_text_from_docx(file_path)
-        elif filename.endswith(".txt"):
-            text = extract_text_from_txt(file_path)
-        else:
-            continue
-
-        if not text:
-            print(f"⚠️ Skipping {filename}: No valid text found.")
-            continue
-
-        # Generate embeddings
-        embedding = model.encode(text).tolist()
-
-        # Store in ChromaDB (Avoid duplicate IDs)
-        existing_docs = collection.get(ids=[filename])
-        if existing_docs['ids']:
-            print(f"⚠️ Skipping {filename}: Already exists in ChromaDB.")
-        else:
-            collection.add(documents=[text], embeddings=[embedding], ids=[filename])
-            print(f"✅ {filename} added to ChromaDB.")
+# Producer: stream chunks of every file into the bounded queue
+def produce_chunks(directory, files, chunk_queue, stats, extract_workers=EXTRACT_WORKERS):
+    executor = ProcessPoolExecutor(max_workers=extract_workers) if extract_workers > 1 else None
+    try:
+        for filename in files:
+            file_path = os.path.join(directory, filename)
+            print(f"📂 Processing: {filename}")
+
+            chunks = load_chunks(file_path, filename, executor)
+            stats["chunk_ids"][filename] = [chunk["id"] for chunk in chunks]
+            if not chunks:
+                print(f"⚠️ Skipping {filename}: No valid text found.")
+                continue
+
+            for chunk in chunks:
+                chunk_queue.put(chunk)  # Blocks while the embedder is behind
+            stats["files"] += 1
+            stats["bytes"] += os.path.getsize(file_path)
+            print(f"🧩 {filename} split into {len(chunks)} chunks.")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        chunk_queue.put(_END_OF_STREAM)
+
+
+# Embed a batch of chunks and write it to ChromaDB with a single add call
+def store_batch(batch, keyword_index, pool=None):
+    texts = [chunk["text"] for chunk in batch]
+    model = get_model()
+    if pool is not None:
+        embeddings = model.encode_multi_process(texts, pool, batch_size=len(texts))
+    else:
+        embeddings = model.encode(texts, batch_size=len(texts))
+
+    get_collection().add(
+        ids=[chunk["id"] for chunk in batch],
+        documents=texts,
+        embeddings=embeddings.tolist(),
+        metadatas=[chunk["metadata"] for chunk in batch],
+    )
+    keyword_index.add([chunk["id"] for chunk in batch], texts, [chunk["metadata"]["source"] for chunk in batch])
 
-        processed_count += 1
 
-    print(f"\n✅ {processed_count}/{len(files)} documents stored successfully in ChromaDB!")
+# Process all files in the documents directory
+def process_documents(directory, batch_size=EMBED_BATCH_SIZE, multi_process=False, queue_size=QUEUE_MAX_CHUNKS,
+                      manifest_path=MANIFEST_PATH, extract_workers=EXTRACT_WORKERS):
+    if not os.path.exists(directory):
+        print(f"❌ Error: Directory '{directory}' does not exist.")
+        return
 
+    files = [f for f in os.listdir(directory) if f.endswith(SUPPORTED_EXTENSIONS)]
 
-# Run the document processing
-process_documents(DOCUMENTS_DIR)
+    start_time = time.perf_counter()
+
+    # Only new or modified files are re-extracted; removed files lose their chunks
+    manifest = load_manifest(manifest_path)
+    pending, removed, fingerprints = plan_ingestion(manifest, directory, files)
+    index_missing = not os.path.exists(config.KEYWORD_INDEX_PATH)
+
+    if not pending and not removed and not index_missing:
+        save_manifest(manifest, manifest_path)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        print(f"✅ {len(files)} documents up to date, nothing to ingest ({elapsed_ms:.1f} ms).")
+        return {"files": 0, "bytes": 0, "chunks": 0, "chunk_ids": {}}
+
+    # The BM25 index covers the same chunks as ChromaDB and is updated alongside it
+    keyword_index = KeywordIndex.load(config.KEYWORD_INDEX_PATH)
+    if index_missing:
+        rebuild_keyword_index(keyword_index)
+
+    for filename in removed:
+        print(f"🗑️ Removing chunks of deleted file: {filename}")
+        delete_file_chunks(filename, keyword_index, manifest["files"].pop(filename)["chunk_ids"])
+
+    if not pending:
+        save_manifest(manifest, manifest_path)
+        keyword_index.save(config.KEYWORD_INDEX_PATH)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        print(f"✅ {len(files)} documents up to date, nothing to ingest ({elapsed_ms:.1f} ms).")
+        return {"files": 0, "bytes": 0, "chunks": 0, "chunk_ids": {}}
+
+    for filename in pending:
+        previous = manifest["files"].pop(filename, None)
+        print(f"♻️ {filename} is {'modified' if previous else 'new'}, re-ingesting.")
+        delete_file_chunks(filename, keyword_index, previous["chunk_ids"] if previous else ())
+
+    stats = {"files": 0, "bytes": 0, "chunks": 0, "chunk_ids": {}}
+
+    # Extraction runs on a background thread while this thread embeds and writes
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    producer = threading.Thread(target=produce_chunks, args=(directory, pending, chunk_queue, stats, extract_workers),
+                                daemon=True)
+    producer.start()
+
+    pool = get_model().start_multi_process_pool() if multi_process else None
+    try:
+        batch = []
+        while True:
+            chunk = chunk_queue.get()
+            if chunk is _END_OF_STREAM:
+                break
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                store_batch(batch, keyword_index, pool)
+                stats["chunks"] += len(batch)
+                batch = []
+        if batch:
+            store_batch(batch, keyword_index, pool)
+            stats["chunks"] += len(batch)
+    finally:
+        if pool is not None:
+            get_model().stop_multi_process_pool(pool)
+        # Unblock the producer if embedding failed midway
+        while producer.is_alive():
+            try:
+                chunk_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
+
+    # Record files only once all their chunks are stored, so an interrupted run is retried
+    for filename, chunk_ids in stats["chunk_ids"].items():
+        manifest["files"][filename] = {**fingerprints[filename], "chunk_ids": chunk_ids}
+    save_manifest(manifest, manifest_path)
+    keyword_index.save(config.KEYWORD_INDEX_PATH)
+
+    elapsed = time.perf_counter() - start_time
+    stored_count = len(files) - len(pending) + len(stats["chunk_ids"])
+    print(f"\n✅ {stored_count}/{len(files)} documents stored successfully in ChromaDB!")
+    print(
+        f"📊 Ingested {stats['chunks']} chunks from {stats['files']} files in {elapsed:.2f}s "
+        f"({stats['chunks'] / max(elapsed, 1e-9):.1f} chunks/sec, "
+        f"{stats['bytes'] / 1e6 / max(elapsed, 1e-9):.2f} MB/sec)"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunk, embed and store documents in ChromaDB.")
+    parser.add_argument("--directory", default=DOCUMENTS_DIR, help="Directory containing the source documents")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks per encode/add batch")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_MAX_CHUNKS, help="Maximum chunks buffered before embedding")
+    parser.add_argument("--multi-process", action="store_true", help="Encode with one worker process per CPU core")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="Path of the incremental ingestion manifest")
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_WORKERS,
+                        help="Processes used for PDF page extraction (1 disables the pool)")
+    args = parser.parse_args()
+
+    # Run the document processing
+    process_documents(args.directory, args.batch_size, args.multi_process, args.queue_size, args.manifest,
+                      args.extract_workers)
@@ -0,0 +1,77 @@
+import json
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import uvicorn
+
+# Stand-in for the LM Studio OpenAI-compatible API, used for load testing and benchmarking the
+# RagBot server without a GPU. Replies are deterministic: REPLY, or REPLY's words repeated up to
+# REPLY_TOKENS words. Every completion waits LATENCY seconds (time to first token) and then
+# TOKEN_INTERVAL per token, streamed or not, so timings depend only on these settings.
+LATENCY = 2.0
+TOKEN_INTERVAL = 0.02
+REPLY = "This is a stub compliance response. Final decision: Needs Review."
+REPLY_TOKENS = None
+
+app = FastAPI()
+
+
+def reply_tokens():
+    words = REPLY.split(" ")
+    if REPLY_TOKENS is None:
+        return words
+    return [words[index % len(words)] for index in range(REPLY_TOKENS)]
+
+
+@app.get("/v1/models")
+async def models():
+    """Lists the stub model; also used as a readiness check."""
+    return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if body.get("stream"):
+        return StreamingResponse(stream_reply(body), media_type="text/event-stream")
+    tokens = reply_tokens()
+    await asyncio.sleep(LATENCY + TOKEN_INTERVAL * len(tokens))
+    prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+    return {
+        "id": "stub-completion",
+        "object": "chat.completion",
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(tokens)}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)},
+    }
+
+
+async def stream_reply(body):
+    await asyncio.sleep(LATENCY)
+    for index, word in enumerate(reply_tokens()):
+        delta = word if index == 0 else " " + word
+        chunk = {
+            "id": "stub-completion",
+            "object": "chat.completion.chunk",
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(TOKEN_INTERVAL)
+    yield "data: [DONE]\n\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub OpenAI-compatible LLM endpoint.")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="Seconds before the first token of every completion")
+    parser.add_argument("--token-interval", type=float, default=TOKEN_INTERVAL, help="Seconds per generated token")
+    parser.add_argument("--token-rate", type=float, help="Generated tokens per second (overrides --token-interval)")
+    parser.add_argument("--reply-tokens", type=int, help="Length of every reply in tokens (default: the fixed reply)")
+    args = parser.parse_args()
+
+    LATENCY = args.latency
+    TOKEN_INTERVAL = 1.0 / args.token_rate if args.token_rate else args.token_interval
+    REPLY_TOKENS = args.reply_tokens
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,228 @@
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+import config
+
+# Lightweight request tracing. Code marks pipeline stages with `with span("embed"):` (or record()
+# for durations measured elsewhere); each stage feeds a latency histogram and, inside a request,
+# that request's Trace, which TracingMiddleware returns as a Server-Timing header. With tracing
+# disabled span() hands back one shared no-op context manager, so instrumented code pays a
+# function call and nothing else.
+ENABLED = config.TRACING_ENABLED
+
+# Histogram bucket upper bounds in seconds, from a fast cache lookup to a long generation
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Component stats that only ever grow, exposed as counters; everything else is a gauge
+MONOTONIC_STATS = ("hits", "misses", "writes", "evictions", "requests", "retries", "failures", "coalesced",
+                   "scored", "unscored", "truncated")
+
+_current_trace = contextvars.ContextVar("lawlens_trace", default=None)
+_NOOP_SPAN = nullcontext()
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one label."""
+
+    def __init__(self, name, documentation, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {label_value: list(values) for label_value, values in self._series.items()}
+        for label_value, values in sorted(series.items()):
+            label = f'{self.label}="{label_value}"'
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_count{{{label}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{label}}} {values[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter with one label."""
+
+    def __init__(self, name, documentation, label):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        lines += [f'{self.name}{{{self.label}="{label_value}"}} {value}' for label_value, value in sorted(values.items())]
+        return lines
+
+
+STAGE_SECONDS = Histogram("lawlens_stage_seconds", "Time spent in each pipeline stage.", "stage")
+REQUEST_SECONDS = Histogram("lawlens_request_seconds", "Time from request to the end of the response body.", "route")
+LLM_TOKENS = Counter("lawlens_llm_tokens_total", "Tokens processed by the LLM backend.", "kind")
+
+
+class Trace:
+    """Stages recorded while serving one request."""
+
+    __slots__ = ("spans", "tokens")
+
+    def __init__(self):
+        self.spans = []  # (stage, seconds) in completion order
+        self.tokens = {}
+
+    def server_timing(self):
+        """Server-Timing header value; repeated stages (e.g. several embeds) are summed."""
+        totals = {}
+        for name, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+    def to_dict(self):
+        return {"spans": [[name, round(seconds, 6)] for name, seconds in self.spans], "tokens": dict(self.tokens)}
+
+
+def span(name):
+    """Context manager timing a stage (sync or async code)."""
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _timed_span(name)
+
+
+@contextmanager
+def _timed_span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def record(name, seconds):
+    """Record a stage duration measured by the caller."""
+    if not ENABLED:
+        return
+    STAGE_SECONDS.observe(name, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append((name, seconds))
+
+
+def count_tokens(kind, count):
+    """Add prompt or completion tokens to the counters and the current trace."""
+    if not ENABLED or not count:
+        return
+    LLM_TOKENS.inc(kind, count)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.tokens[kind] = trace.tokens.get(kind, 0) + count
+
+
+def record_usage(response_data):
+    """Count the tokens reported in an OpenAI-compatible completion's "usage" block."""
+    usage = (response_data or {}).get("usage") or {}
+    count_tokens("prompt", usage.get("prompt_tokens"))
+    count_tokens("completion", usage.get("completion_tokens"))
+
+
+async def traced_stream(deltas):
+    """Pass streamed LLM deltas through, recording time to first token, total time and deltas received."""
+    if not ENABLED:
+        async for delta in deltas:
+            yield delta
+        return
+    start = time.perf_counter()
+    received = 0
+    try:
+        async for delta in deltas:
+            if received == 0:
+                record("llm_ttft", time.perf_counter() - start)
+            received += 1
+            yield delta
+    finally:
+        record("llm_total", time.perf_counter() - start)
+        count_tokens("completion", received)  # One streamed delta per generated token
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware giving each HTTP request its own Trace. Stages finished before the response
+    starts are sent as a Server-Timing header; for streamed responses the LLM stages complete
+    later and only reach the histograms (and the trace log when LAWLENS_TRACE_LOG=1).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timing = trace.server_timing()
+                total = f"total;dur={(time.perf_counter() - start) * 1000:.1f}"
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", (f"{timing}, {total}" if timing else total).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            seconds = time.perf_counter() - start
+            # Label by route template (/jobs/{job_id}), not the raw path, to keep cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(route, seconds)
+            if config.TRACE_LOG:
+                print(json.dumps({"route": route, "method": scope.get("method"), "seconds": round(seconds, 6),
+                                  **trace.to_dict()}))
+
+
+def render_prometheus(stats):
+    """
+    Prometheus text exposition of the histograms and counters, plus the flat numeric stats
+    of each component (e.g. {"response_cache": {"hits": 3}} becomes lawlens_response_cache_hits_total).
+    """
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render() + LLM_TOKENS.render()
+    for component, values in stats.items():
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in MONOTONIC_STATS:
+                name, kind = f"lawlens_{component}_{key}_total", "counter"
+            else:
+                name, kind = f"lawlens_{component}_{key}", "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import hashlib
+import functools
+
+# On-disk cache of extraction results, keyed by the SHA-256 of the input file plus the
+# extractor's name, version and settings. Entries are JSON files; least recently used
+# ones are deleted once the directory grows past CACHE_MAX_BYTES.
+CACHE_DIR = os.path.abspath(os.environ.get(
+    "LAWLENS_EXTRACTION_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".extraction_cache"),
+))
+CACHE_MAX_BYTES = int(float(os.environ.get("LAWLENS_EXTRACTION_CACHE_MB", "512")) * 1024 * 1024)
+
+# Read files in 1 MB blocks while hashing
+HASH_BLOCK_SIZE = 1 << 20
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _describe(value):
+    """Stable, JSON-friendly description of an argument (callables by their qualified name)."""
+    if callable(value):
+        return f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', repr(value))}"
+    return repr(value)
+
+
+def cache_key(digest, extractor, version, settings=None, args=(), kwargs=None):
+    material = json.dumps({
+        "file": digest,
+        "extractor": extractor,
+        "version": version,
+        "settings": settings or {},
+        "args": [_describe(arg) for arg in args],
+        "kwargs": {name: _describe(value) for name, value in sorted((kwargs or {}).items())},
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def load(key, cache_dir=CACHE_DIR):
+    """Return the cached entry for key ({"result": ..., "meta": ...}) or None."""
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            entry = json.load(file)
+    except (OSError, ValueError):
+        return None
+    os.utime(path)  # Mark as recently used
+    return entry
+
+
+def store(key, result, meta, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Atomically write an entry, then evict least recently used entries beyond max_bytes."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"result": result, "meta": meta}, file)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".json"):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+        _stats["evictions"] += 1
+
+
+def cache_stats():
+    """Hit/miss/eviction counters of this process."""
+    return dict(_stats)
+
+
+def cached_extraction(extractor, version, settings=None):
+    """
+    Decorator caching an extractor whose first argument is a file path.
+
+    Bump `version` whenever the extractor's output would change, and pass the settings that
+    influence it (DPI, OCR mode, ...) so changing them does not serve stale results.
+    Empty results and {"error": ...} dicts are never cached.
+
+    Args:
+        extractor (str): Name of the extractor, part of the cache key.
+        version (int): Extractor version, part of the cache key.
+        settings (dict): Extractor configuration, part of the cache key.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(path, *args, **kwargs):
+            if not os.path.isfile(path):
+                return func(path, *args, **kwargs)
+
+            digest = file_digest(path)
+            key = cache_key(digest, extractor, version, settings, args, kwargs)
+            entry = load(key)
+            if entry is not None:
+                _stats["hits"] += 1
+                print(f"⚡ {extractor}: cached result for {digest[:12]}")
+                return entry["result"]
+
+            _stats["misses"] += 1
+            start = time.perf_counter()
+            result = func(path, *args, **kwargs)
+            if result and not (isinstance(result, dict) and "error" in result):
+                meta = {
+                    "extractor": extractor,
+                    "version": version,
+                    "settings": settings or {},
+                    "sha256": digest,
+                    "seconds": round(time.perf_counter() - start, 3),
+                    "created_at": time.time(),
+                }
+                store(key, result, meta)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,181 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import fitz  # PyMuPDF: one fast backend for text layers and page rendering
+from extraction.cache import cached_extraction
+
+# Shared PDF text extraction for RagBot ingestion and job workers, the UI's document analysis and
+# the bill extractor. It sits outside both trees so ingestion does not depend on the UI; it needs
+# PyMuPDF, plus pytesseract and Pillow for scanned pages (extraction/requirements.txt).
+
+# A page with fewer characters than this in its text layer is treated as scanned and OCR'd
+MIN_NATIVE_TEXT_CHARS = 16
+
+# Resolution used when rendering a scanned page for OCR (matches pdf2image's default)
+OCR_DPI = 200
+
+# Pages handled by one worker task when an executor is supplied
+PAGES_PER_TASK = 16
+
+# Tesseract worker processes for scanned pages, and rendered pages allowed in flight per worker
+OCR_WORKERS = int(os.environ.get("LAWLENS_OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+OCR_PAGES_IN_FLIGHT_PER_WORKER = 2
+
+
+def tesseract_ocr(image):
+    """
+    Default OCR step: run Tesseract on a rendered page.
+
+    Args:
+        image (PIL.Image.Image): The rendered page.
+
+    Returns:
+        str: The recognised text.
+    """
+    import pytesseract  # Only needed when a page actually lacks a text layer
+    return pytesseract.image_to_string(image)
+
+
+def render_page(page, dpi=OCR_DPI):
+    """Render a PyMuPDF page to a PIL image."""
+    from PIL import Image
+    pixmap = page.get_pixmap(dpi=dpi)
+    return Image.open(io.BytesIO(pixmap.tobytes("png")))
+
+
+def _limit_ocr_threads():
+    # One Tesseract thread per worker process; parallelism comes from the pool
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_png(png_bytes, ocr):
+    """Worker task: decode one rendered page and OCR it."""
+    from PIL import Image
+    return ocr(Image.open(io.BytesIO(png_bytes)))
+
+
+def ocr_pages(pdf_path, page_numbers, ocr=tesseract_ocr, max_workers=OCR_WORKERS, dpi=OCR_DPI):
+    """
+    OCR the given pages, rendering them one at a time and feeding a bounded pool of workers.
+
+    At most max_workers * OCR_PAGES_IN_FLIGHT_PER_WORKER rendered pages exist at once, so peak
+    memory stays at a few page bitmaps however long the scan is.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        page_numbers (list): 1-based page numbers to OCR.
+        ocr (callable): OCR step (PIL image -> str); must be picklable for the pool.
+        max_workers (int): Worker processes; 1 OCRs in-process.
+        dpi (int): Rendering resolution.
+
+    Returns:
+        dict: page_number -> recognised text.
+    """
+    texts = {}
+    with fitz.open(pdf_path) as doc:
+        if max_workers <= 1 or len(page_numbers) <= 1:
+            for number in page_numbers:
+                texts[number] = ocr(render_page(doc[number - 1], dpi))
+            return texts
+
+        max_in_flight = max_workers * OCR_PAGES_IN_FLIGHT_PER_WORKER
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_limit_ocr_threads) as pool:
+            pending = {}
+            for number in page_numbers:
+                if len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        texts[pending.pop(future)] = future.result()
+                png_bytes = doc[number - 1].get_pixmap(dpi=dpi).tobytes("png")
+                pending[pool.submit(_ocr_png, png_bytes, ocr)] = number
+            for future in wait(pending).done:
+                texts[pending[future]] = future.result()
+    return texts
+
+
+def extract_page_range(pdf_path, start, stop, ocr=tesseract_ocr):
+    """
+    Extract pages [start, stop) of a PDF, reading the native text layer first and
+    falling back to OCR only for pages that have none.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        start (int): First page index (0-based, inclusive).
+        stop (int): Last page index (exclusive).
+        ocr (callable): Takes a PIL image and returns its text; None disables OCR.
+
+    Returns:
+        list: (page_number, text, method) tuples where method is "native", "ocr" or "empty".
+    """
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for number in range(start, stop):
+            page = doc[number]
+            text = page.get_text()
+            if len(text.strip()) >= MIN_NATIVE_TEXT_CHARS:
+                pages.append((number + 1, text, "native"))
+            elif ocr is not None:
+                pages.append((number + 1, ocr(render_page(page)), "ocr"))
+            else:
+                pages.append((number + 1, text, "empty"))
+    return pages
+
+
+def extract_pages(pdf_path, ocr=tesseract_ocr, executor=None):
+    """
+    Extract every page of a PDF with the per-page native-text-then-OCR strategy.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        ocr (callable): Pluggable OCR step (PIL image -> str); None disables OCR.
+        executor (concurrent.futures.Executor): Optional pool; page ranges of PAGES_PER_TASK
+            pages are extracted in parallel, each worker opening the document itself.
+            Without one, scanned pages are OCR'd by ocr_pages' own bounded pool.
+
+    Returns:
+        list: (page_number, text) tuples in page order.
+    """
+    try:
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+
+        if executor is None or page_count <= PAGES_PER_TASK:
+            # Read every text layer first, then OCR only the pages that lack one in parallel
+            records = extract_page_range(pdf_path, 0, page_count, ocr=None)
+            missing = [page_number for page_number, _, method in records if method == "empty"]
+            if missing and ocr is not None:
+                ocr_texts = ocr_pages(pdf_path, missing, ocr)
+                records = [
+                    (page_number, ocr_texts[page_number], "ocr") if page_number in ocr_texts else (page_number, text, method)
+                    for page_number, text, method in records
+                ]
+        else:
+            futures = [
+                executor.submit(extract_page_range, pdf_path, start, min(start + PAGES_PER_TASK, page_count), ocr)
+                for start in range(0, page_count, PAGES_PER_TASK)
+            ]
+            # Ranges are submitted in order, so concatenating the results keeps page order
+            records = [record for future in futures for record in future.result()]
+    except Exception as e:
+        print(f"❌ Error reading PDF {pdf_path}: {e}")
+        return []
+
+    ocr_count = sum(1 for _, _, method in records if method == "ocr")
+    if ocr_count:
+        print(f"🔍 OCR used for {ocr_count}/{len(records)} pages without a text layer.")
+    return [(page_number, text) for page_number, text, _ in records]
+
+
+@cached_extraction("pdf_text", version=1, settings={"min_native_chars": MIN_NATIVE_TEXT_CHARS, "ocr_dpi": OCR_DPI})
+def extract_text_from_pdf(pdf_path, ocr=tesseract_ocr):
+    """
+    Extracts text from a PDF file, using OCR only for pages without a text layer.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        ocr (callable): Pluggable OCR step (PIL image -> str); None disables OCR.
+
+    Returns:
+        str: The extracted text.
+    """
+    return "\n".join(text for _, text in extract_pages(pdf_path, ocr)).strip()
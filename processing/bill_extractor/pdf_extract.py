@@ -1,40 +1,38 @@
-import fitz  # PyMuPDF for PDF processing
-import pytesseract  # OCR for scanned PDFs
-from PIL import Image
-import ollama
+import os
+import sys
 import json
-import io
 import re
 from SoulSync.processing.bill_extractor.prompts import simple_json_extract
 
-def extract_text_from_pdf(pdf_path):
-    """Extracts text from a PDF using PyMuPDF and OCR for scanned documents."""
-    doc = fitz.open(pdf_path)
-    extracted_text = ""
+# Ensure the repository root is in sys.path for the shared extraction engine
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-    for page in doc:
-        text = page.get_text("text")
-        if text.strip():
-            extracted_text += text + "\n"
-        else:
-            # Perform OCR if no text is found (for scanned images)
-            pix = page.get_pixmap()
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            ocr_text = pytesseract.image_to_string(img)
-            extracted_text += ocr_text + "\n"
-    
-    return extracted_text.strip()
+# Native text layer first, OCR only for scanned pages
+from extraction.pdf import extract_text_from_pdf
+# Shared LLM client (pooled connections, timeouts, retries), here talking to Ollama
+from RagBot import llm_client
+
+# Extraction is deterministic: sample greedily and bound the reply (Ollama's num_predict)
+EXTRACTION_TEMPERATURE = 0.0
+EXTRACTION_MAX_TOKENS = 1024
 
 def analyze_text_with_ollama(text):
     """Uses Ollama AI to analyze extracted text and convert it into structured JSON."""
     prompt = simple_json_extract.format(text=text)
 
-    response = ollama.chat(
-        model="llama3.2:latest",  # Use 'llama3' or 'mixtral' based on your setup
-        messages=[{"role": "user", "content": prompt}]
-    )
+    try:
+        response = llm_client.chat_completion_sync(
+            [{"role": "user", "content": prompt}],
+            temperature=EXTRACTION_TEMPERATURE,
+            max_tokens=EXTRACTION_MAX_TOKENS,
+            model="llama3.2:latest",  # Use 'llama3' or 'mixtral' based on your setup
+            backend="ollama",
+        )
+    except Exception as e:
+        print(f"⚠️ Ollama request failed: {e}")
+        return {"error": "Failed to connect to Ollama"}
 
-    structured_json = response.get("message", {}).get("content", "").strip()
+    structured_json = llm_client.message_content(response).strip()
 
     # 🔍 Debugging: Print raw response to check if it's empty
     print("🔍 Raw Ollama Response:", structured_json)
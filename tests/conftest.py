@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The UI packages are imported from the repository root (ui.document_analysis...), the RagBot
+# modules by their flat names (import config), the same way their entry points run them.
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for path in (ROOT, os.path.join(ROOT, "RagBot")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
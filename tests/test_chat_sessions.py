@@ -0,0 +1,103 @@
+import types
+import functools
+
+import pytest
+
+import chat_sessions
+
+
+@pytest.fixture(autouse=True)
+def sessions(tmp_path, monkeypatch):
+    """A fresh session database per test and a clock that only moves when told to."""
+    clock = [1_000.0]
+    monkeypatch.setattr(chat_sessions, "_connect", functools.partial(chat_sessions._connect,
+                                                                     str(tmp_path / "chat_sessions.sqlite3")))
+    monkeypatch.setattr(chat_sessions, "_initialized", False)
+    monkeypatch.setattr(chat_sessions, "time", types.SimpleNamespace(time=lambda: clock[0]))
+    return clock
+
+
+def exchange(index):
+    return [{"role": "user", "content": f"Question {index}"}, {"role": "assistant", "content": f"Answer {index}"}]
+
+
+def session_with(exchanges):
+    session_id = chat_sessions.create()
+    for index in range(exchanges):
+        chat_sessions.append(session_id, exchange(index))
+    return session_id
+
+
+def test_messages_carry_the_summary_and_window():
+    session_id = session_with(1)
+    session = chat_sessions.get(session_id)
+    session["summary"] = "The applicant runs a textile unit."
+    messages = chat_sessions.build_messages(session, "Which consents are needed?")
+    assert messages[0]["role"] == "system" and messages[0]["content"].endswith("The applicant runs a textile unit.")
+    assert messages[1:] == exchange(0) + [{"role": "user", "content": "Which consents are needed?"}]
+
+
+def test_messages_to_fold_keep_exchanges_whole():
+    window = [message for index in range(4) for message in exchange(index)]
+    assert chat_sessions.messages_to_fold(window, keep=3) == window[:4]  # Not the user message of exchange 2
+    assert chat_sessions.messages_to_fold(window[:2], keep=6) == []
+
+
+def test_needs_compaction(monkeypatch):
+    monkeypatch.setattr(chat_sessions.config, "CHAT_KEEP_MESSAGES", 2)
+    window = [message for index in range(3) for message in exchange(index)]
+    assert chat_sessions.needs_compaction(window, max_messages=4, max_tokens=10_000)
+    assert not chat_sessions.needs_compaction(window, max_messages=10, max_tokens=10_000)
+    assert chat_sessions.needs_compaction(window, max_messages=10, max_tokens=5)
+
+
+def test_apply_summary_folds_the_oldest_messages():
+    session_id = session_with(4)
+    session = chat_sessions.get(session_id)
+    folded = chat_sessions.messages_to_fold(session["window"], keep=4)
+
+    assert chat_sessions.apply_summary(session_id, folded, "Summary of exchanges 0 and 1.", session["summarized_messages"])
+    session = chat_sessions.get(session_id)
+    assert (session["summary"], session["summarized_messages"]) == ("Summary of exchanges 0 and 1.", 4)
+    assert session["window"] == exchange(2) + exchange(3)
+    assert chat_sessions.stats() == {"sessions": 1, "summarized_messages": 4}
+
+
+def test_summary_from_a_losing_compaction_is_discarded():
+    session_id = chat_sessions.create()
+    for _ in range(4):
+        chat_sessions.append(session_id, exchange(0))  # Repeated turns: the window's prefix looks the same after folding
+    session = chat_sessions.get(session_id)
+    folded = chat_sessions.messages_to_fold(session["window"], keep=4)
+    assert chat_sessions.apply_summary(session_id, folded, "First summary.", session["summarized_messages"])
+
+    # A second compaction that read the same session loses, although its folded messages match the new prefix
+    assert not chat_sessions.apply_summary(session_id, folded, "Second summary.", session["summarized_messages"])
+    assert chat_sessions.get(session_id)["summary"] == "First summary."
+
+
+def test_summary_is_discarded_when_the_window_no_longer_starts_with_the_folded_messages():
+    session_id = session_with(4)
+    session = chat_sessions.get(session_id)
+    assert not chat_sessions.apply_summary(session_id, exchange(1), "Wrong prefix.", session["summarized_messages"])
+    assert chat_sessions.get(session_id)["window"] == session["window"]
+
+
+def test_messages_appended_during_a_compaction_are_kept():
+    session_id = session_with(4)
+    session = chat_sessions.get(session_id)
+    folded = chat_sessions.messages_to_fold(session["window"], keep=4)
+    chat_sessions.append(session_id, exchange(4))  # A turn finished while the summary was generated
+
+    assert chat_sessions.apply_summary(session_id, folded, "Summary.", session["summarized_messages"])
+    assert chat_sessions.get(session_id)["window"] == exchange(2) + exchange(3) + exchange(4)
+
+
+def test_idle_sessions_expire_and_unknown_sessions(sessions):
+    old = chat_sessions.create(ttl=60)
+    sessions[0] += 61
+    chat_sessions.create(ttl=60)
+    assert chat_sessions.get(old) is None
+    assert chat_sessions.append("missing", exchange(0)) is None
+    assert not chat_sessions.apply_summary("missing", [], "Summary.", 0)
+    assert not chat_sessions.delete("missing")
@@ -0,0 +1,59 @@
+import pytest
+
+import chunking
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Section 7A. General duties of the occupier", "Section 7A"),
+    ("SECTION 7A", "Section 7A"),
+    ("RULE 12", "Rule 12"),
+    ("Rule 3—Application", "Rule 3"),
+    ("Section 41 - Powers of the Board", "Section 41"),
+    ("7A. General duties of the occupier.—(1) Every occupier shall", "Section 7A"),
+])
+def test_detect_heading(line, expected):
+    assert chunking.detect_heading(line) == expected
+
+
+@pytest.mark.parametrize("line", [
+    "section 7 of this Act shall apply",
+    "rule 3 shall apply",
+    "Rule 3 shall apply to every factory",
+    "Section 7(1) applies to the occupier",
+    "Section 25 of the Water Act.",
+])
+def test_cross_references_are_not_headings(line):
+    assert chunking.detect_heading(line) is None
+
+
+def test_bare_headings_use_the_default_kind():
+    assert chunking.detect_heading("12. Fencing of machinery.—(1) In every factory", "Rule") == "Rule 12"
+
+
+def test_split_sections_keeps_cross_references_in_their_section():
+    pages = [(1, "Preamble text\nSection 7. Duties of the occupier\nThe occupier shall comply and\n"
+                 "section 9 of this Act shall apply to him."),
+             (2, "SECTION 8\nInspectors may enter.")]
+    sections = list(chunking.split_sections(pages))
+    assert [heading for heading, _ in sections] == ["", "Section 7", "Section 8"]
+    assert sections[1][1][-1] == (1, "section 9 of this Act shall apply to him.")
+    assert sections[2][1] == [(2, "SECTION 8"), (2, "Inspectors may enter.")]
+
+
+def test_chunk_pages_windows_overlap_and_carry_metadata():
+    lines = [f"Line {index} of the occupier's duties under this section." for index in range(40)]
+    pages = [(1, "Section 7. Duties\n" + "\n".join(lines[:20])), (2, "\n".join(lines[20:]))]
+    chunks = chunking.chunk_pages(pages, "factories_act.pdf", chunk_size=300, overlap=120)
+
+    assert len(chunks) > 1
+    assert all(len(chunk["text"]) <= 300 for chunk in chunks)
+    assert [chunk["id"] for chunk in chunks] == [f"factories_act.pdf::chunk-{index}" for index in range(len(chunks))]
+    assert all(chunk["metadata"]["section"] == "Section 7" for chunk in chunks)
+    assert chunks[0]["metadata"]["page_start"] == 1 and chunks[-1]["metadata"]["page_end"] == 2
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["text"].splitlines()[0] in previous["text"].splitlines()  # Line-aligned overlap
+
+
+def test_over_long_lines_are_wrapped():
+    chunks = chunking.chunk_pages([(1, "word " * 500)], "notes.txt", chunk_size=200, overlap=0)
+    assert len(chunks) > 1 and all(len(chunk["text"]) <= 200 for chunk in chunks)
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+def vector(value, size=4):
+    return np.full(size, value, dtype="float32")
+
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = EmbeddingCache(max_entries=2, max_bytes=1 << 20)
+    cache.put("factory licence", vector(1))
+    cache.put("water consent", vector(2))
+    assert cache.get("factory licence") is not None  # Now the most recently used
+    cache.put("air consent", vector(3))
+
+    assert cache.get("water consent") is None
+    assert cache.get("factory licence") is not None and cache.get("air consent") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_and_oversized_entries():
+    entry_bytes = len("q0") + vector(0).nbytes
+    cache = EmbeddingCache(max_entries=100, max_bytes=2 * entry_bytes)
+    for index in range(3):
+        cache.put(f"q{index}", vector(index))
+    assert cache.stats()["entries"] == 2 and cache.stats()["bytes"] == 2 * entry_bytes
+
+    cache.put("huge", vector(0, size=1024))  # Larger than the whole budget: not cached, nothing evicted
+    assert cache.get("huge") is None and cache.stats()["entries"] == 2
+
+
+def test_replacing_a_key_keeps_the_byte_count():
+    cache = EmbeddingCache(max_entries=10, max_bytes=1 << 20)
+    cache.put("q", vector(1))
+    cache.put("q", vector(2))
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == len("q") + vector(0).nbytes
+    assert cache.get("q")[0] == 2
+
+
+def test_stats_hit_rate():
+    cache = EmbeddingCache(max_entries=10, max_bytes=1 << 20)
+    cache.put("q", vector(1))
+    cache.get("q")
+    cache.get("other")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(texts)
+        if isinstance(texts, str):
+            return vector(len(texts))
+        return np.stack([vector(len(text)) for text in texts])
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = CountingModel()
+    monkeypatch.setattr(embedding_cache, "get_model", lambda: model)
+    monkeypatch.setattr(embedding_cache, "query_embedding_cache", EmbeddingCache(100, 1 << 20))
+    return model
+
+
+def test_queries_differing_in_case_and_spacing_share_an_entry(model):
+    first = embedding_cache.encode_query("Factory  licence\n")
+    second = embedding_cache.encode_query("factory licence")
+    assert model.calls == ["factory licence"]
+    assert np.array_equal(first, second)
+
+
+def test_encode_queries_batches_only_the_distinct_misses(model):
+    embedding_cache.encode_query("water consent")
+    embeddings = embedding_cache.encode_queries(["Air consent", "water consent", "air  consent", "noise limits"])
+
+    assert model.calls[1:] == [["air consent", "noise limits"]]
+    assert [embedding[0] for embedding in embeddings] == [11, 13, 11, 12]
+    assert embedding_cache.encode_queries(["noise limits"]) and len(model.calls) == 2
@@ -0,0 +1,79 @@
+import os
+import json
+
+import ingest_manifest
+
+
+def write(directory, name, text, mtime=None):
+    path = directory / name
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def ingest(manifest, directory, filenames):
+    """Plan, then record the changed files the way store_documents.py does after embedding them."""
+    changed, removed, fingerprints = ingest_manifest.plan_ingestion(manifest, str(directory), filenames)
+    for filename in changed:
+        manifest["files"][filename] = {**fingerprints[filename], "chunk_ids": [f"{filename}::chunk-0"]}
+    for filename in removed:
+        del manifest["files"][filename]
+    return changed, removed
+
+
+def test_new_files_are_changed_and_unchanged_files_are_skipped(tmp_path):
+    write(tmp_path, "factories_act.txt", "Section 7. Duties", mtime=1_000)
+    write(tmp_path, "water_act.txt", "Section 25. Consent", mtime=1_000)
+    manifest = ingest_manifest.load_manifest(str(tmp_path / "missing.json"))
+
+    assert ingest(manifest, tmp_path, ["factories_act.txt", "water_act.txt"]) == (
+        ["factories_act.txt", "water_act.txt"], [])
+    assert ingest(manifest, tmp_path, ["factories_act.txt", "water_act.txt"]) == ([], [])
+
+
+def test_unchanged_files_are_not_hashed(tmp_path, monkeypatch):
+    write(tmp_path, "act.txt", "Section 7. Duties", mtime=1_000)
+    manifest = ingest_manifest.load_manifest(str(tmp_path / "missing.json"))
+    ingest(manifest, tmp_path, ["act.txt"])
+
+    monkeypatch.setattr(ingest_manifest, "hash_file", lambda path: (_ for _ in ()).throw(AssertionError(path)))
+    assert ingest(manifest, tmp_path, ["act.txt"]) == ([], [])
+
+
+def test_touched_but_identical_files_only_refresh_the_mtime(tmp_path):
+    write(tmp_path, "act.txt", "Section 7. Duties", mtime=1_000)
+    manifest = ingest_manifest.load_manifest(str(tmp_path / "missing.json"))
+    ingest(manifest, tmp_path, ["act.txt"])
+
+    os.utime(tmp_path / "act.txt", (2_000, 2_000))
+    assert ingest(manifest, tmp_path, ["act.txt"]) == ([], [])
+    assert manifest["files"]["act.txt"]["mtime"] == 2_000
+
+
+def test_edited_and_removed_files(tmp_path):
+    write(tmp_path, "act.txt", "Section 7. Duties", mtime=1_000)
+    write(tmp_path, "old_rules.txt", "Rule 3. Application", mtime=1_000)
+    manifest = ingest_manifest.load_manifest(str(tmp_path / "missing.json"))
+    ingest(manifest, tmp_path, ["act.txt", "old_rules.txt"])
+
+    write(tmp_path, "act.txt", "Section 7. Duties of the occupier", mtime=1_000)
+    os.remove(tmp_path / "old_rules.txt")
+    assert ingest(manifest, tmp_path, ["act.txt"]) == (["act.txt"], ["old_rules.txt"])
+
+
+def test_manifest_round_trip_and_version_reset(tmp_path):
+    path = str(tmp_path / "db" / "ingest_manifest.json")
+    manifest = {"version": ingest_manifest.MANIFEST_VERSION,
+                "files": {"act.txt": {"size": 1, "mtime": 1.0, "sha256": "x", "chunk_ids": ["act.txt::chunk-0"]}}}
+    ingest_manifest.save_manifest(manifest, path)
+    assert ingest_manifest.load_manifest(path) == manifest
+    assert not os.path.exists(path + ".tmp")
+
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({**manifest, "version": ingest_manifest.MANIFEST_VERSION - 1}, file)
+    assert ingest_manifest.load_manifest(path)["files"] == {}
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("{not json")
+    assert ingest_manifest.load_manifest(path)["files"] == {}
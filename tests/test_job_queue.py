@@ -0,0 +1,171 @@
+import os
+import types
+import functools
+import threading
+
+import pytest
+
+import job_queue
+import job_worker
+
+
+@pytest.fixture(autouse=True)
+def queue(tmp_path, monkeypatch):
+    """A fresh queue database per test and a clock that only moves when told to."""
+    clock = [1_000.0]
+    monkeypatch.setattr(job_queue, "_connect", functools.partial(job_queue._connect, str(tmp_path / "jobs.sqlite3")))
+    monkeypatch.setattr(job_queue, "_initialized", False)
+    monkeypatch.setattr(job_queue, "time", types.SimpleNamespace(time=lambda: clock[0]))
+    return clock
+
+
+def submit(job_id, clock):
+    clock[0] += 1
+    return job_queue.submit(job_id, {"application": f"{job_id}.pdf"})
+
+
+def test_claim_takes_the_oldest_queued_job(queue):
+    submit("first", queue)
+    submit("second", queue)
+    job = job_queue.claim("worker-a")
+    assert (job["id"], job["status"], job["worker"], job["attempts"]) == ("first", job_queue.RUNNING, "worker-a", 1)
+    assert job["payload"] == {"application": "first.pdf"}
+    assert job_queue.claim("worker-b")["id"] == "second"
+    assert job_queue.claim("worker-c") is None
+
+
+def test_concurrent_claims_hand_each_job_to_one_worker(queue):
+    for index in range(10):
+        submit(f"job-{index}", queue)
+    claimed, lock = [], threading.Lock()
+
+    def work(worker):
+        while (job := job_queue.claim(worker)) is not None:
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=work, args=(f"worker-{index}",)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(f"job-{index}" for index in range(10))
+
+
+def test_stage_progress_and_completion(queue):
+    submit("job", queue)
+    job = job_queue.claim("worker")
+    assert job_queue.start_stage("job", job["attempts"], "extract")
+    assert job_queue.finish_stage("job", job["attempts"], "extract", 1.23456, {"text": "Form 1"})
+    assert job_queue.finish_stage("job", job["attempts"], "verify", 0.0, None, status="skipped")
+    assert job_queue.complete("job", job["attempts"])
+
+    done = job_queue.get("job")
+    assert done["status"] == job_queue.SUCCEEDED
+    assert done["progress"]["extract"] == {"status": "done", "seconds": 1.235}
+    assert done["progress"]["verify"]["status"] == "skipped"
+    assert done["result"] == {"extract": {"text": "Form 1"}}
+    assert job_queue.stats()[job_queue.SUCCEEDED] == 1
+
+
+def test_heartbeat_keeps_a_long_stage_from_being_requeued(queue):
+    submit("job", queue)
+    job = job_queue.claim("worker")
+    queue[0] += 50
+    assert job_queue.heartbeat("job", job["attempts"])
+    queue[0] += 50
+    assert job_queue.requeue_stale(stale_seconds=60) == 0
+    queue[0] += 61
+    assert job_queue.requeue_stale(stale_seconds=60) == 1
+    assert job_queue.get("job")["status"] == job_queue.QUEUED
+
+
+def test_requeued_job_rejects_writes_from_its_previous_worker(queue):
+    submit("job", queue)
+    stale = job_queue.claim("worker-a")
+    queue[0] += 61
+    job_queue.requeue_stale(stale_seconds=60)
+    current = job_queue.claim("worker-b")
+    assert current["attempts"] == stale["attempts"] + 1
+
+    attempt = stale["attempts"]
+    assert not job_queue.heartbeat("job", attempt)
+    assert not job_queue.start_stage("job", attempt, "extract")
+    assert not job_queue.finish_stage("job", attempt, "extract", 1.0, {"text": "stale"})
+    assert not job_queue.complete("job", attempt)
+    assert not job_queue.fail("job", attempt, "stale worker")
+
+    job = job_queue.get("job")
+    assert (job["status"], job["worker"], job["result"]) == (job_queue.RUNNING, "worker-b", {})
+    assert job_queue.complete("job", current["attempts"])
+
+
+def test_jobs_out_of_attempts_are_failed_instead_of_requeued(queue):
+    submit("job", queue)
+    job_queue.claim("worker-a")
+    queue[0] += 61
+    assert job_queue.requeue_stale(stale_seconds=60, max_attempts=2) == 1
+    job_queue.claim("worker-b")
+    queue[0] += 61
+    assert job_queue.requeue_stale(stale_seconds=60, max_attempts=2) == 0
+    job = job_queue.get("job")
+    assert (job["status"], job["error"]) == (job_queue.FAILED, "Worker stopped responding")
+
+
+# ----------------------------
+# Worker
+# ----------------------------
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_worker.config, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(job_worker, "keep_alive", lambda job_id, attempt, stop: stop.wait())
+    stages = {stage: (lambda payload, outputs, stage=stage: {"stage": stage}) for stage in job_queue.STAGES}
+    monkeypatch.setattr(job_worker, "STAGE_FUNCTIONS", stages)
+    return stages
+
+
+def job_dir(job_id):
+    path = os.path.join(job_worker.config.JOBS_DIR, job_id)
+    os.makedirs(path)
+    return path
+
+
+def test_worker_runs_every_stage_and_removes_the_documents(queue, worker):
+    submit("job", queue)
+    path = job_dir("job")
+    job_worker.run_job(job_queue.claim("worker"))
+    job = job_queue.get("job")
+    assert job["status"] == job_queue.SUCCEEDED
+    assert job["result"] == {stage: {"stage": stage} for stage in job_queue.STAGES}
+    assert not os.path.exists(path)
+
+
+def test_worker_that_loses_its_claim_keeps_the_documents(queue, worker):
+    submit("job", queue)
+    path = job_dir("job")
+
+    def taken_over(payload, outputs):
+        queue[0] += 61
+        job_queue.requeue_stale(stale_seconds=60)
+        job_queue.claim("worker-b")
+        return {"text": "late"}
+
+    worker["extract"] = taken_over
+    job_worker.run_job(job_queue.claim("worker-a"))
+    job = job_queue.get("job")
+    assert (job["status"], job["worker"], job["result"]) == (job_queue.RUNNING, "worker-b", {})
+    assert os.path.exists(path)  # Still needed by worker-b
+
+
+def test_failed_stage_fails_the_job(queue, worker):
+    submit("job", queue)
+    path = job_dir("job")
+
+    def no_text(payload, outputs):
+        raise job_worker.JobFailed("No text could be extracted from the application document")
+
+    worker["extract"] = no_text
+    job_worker.run_job(job_queue.claim("worker"))
+    job = job_queue.get("job")
+    assert (job["status"], job["error"]) == (job_queue.FAILED, "No text could be extracted from the application document")
+    assert not os.path.exists(path)
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+import llm_client
+
+MESSAGES = [{"role": "user", "content": "Which permissions does a factory in Kerala need?"}]
+
+
+def completion(content):
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+@pytest.fixture(autouse=True)
+def coalescing(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_COALESCE", True)
+    monkeypatch.setattr(llm_client, "_inflight", {})
+    monkeypatch.setattr(llm_client, "_sync_inflight", {})
+    monkeypatch.setattr(llm_client, "_stats", {"requests": 0, "retries": 0, "failures": 0, "coalesced": 0})
+
+
+async def with_mock_backend(handler, calls):
+    """Point the async face at a MockTransport, run calls() and close the client again."""
+    llm_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        return await calls()
+    finally:
+        await llm_client.stop()
+
+
+def test_identical_concurrent_calls_share_one_backend_request():
+    requests = []
+
+    async def handler(request):
+        requests.append(json.loads(request.content))
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=completion("shared reply"))
+
+    async def calls():
+        return await asyncio.gather(*(llm_client.chat_completion(MESSAGES, temperature=0.2) for _ in range(2)))
+
+    first, second = asyncio.run(with_mock_backend(handler, calls))
+    assert len(requests) == 1
+    assert llm_client.message_content(first) == llm_client.message_content(second) == "shared reply"
+    assert first is not second  # Each caller gets its own copy
+    assert llm_client.stats()["coalesced"] == 1
+
+
+def test_different_requests_are_not_coalesced():
+    requests = []
+
+    async def handler(request):
+        requests.append(json.loads(request.content))
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=completion("reply"))
+
+    async def calls():
+        return await asyncio.gather(llm_client.chat_completion(MESSAGES, temperature=0.2),
+                                    llm_client.chat_completion(MESSAGES, temperature=0.7))
+
+    asyncio.run(with_mock_backend(handler, calls))
+    assert sorted(request["temperature"] for request in requests) == [0.2, 0.7]
+    assert llm_client.stats()["coalesced"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_shared_generation():
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, json=completion("finished"))
+
+    async def calls():
+        leaving = asyncio.ensure_future(llm_client.chat_completion(MESSAGES))
+        staying = asyncio.ensure_future(llm_client.chat_completion(MESSAGES))
+        await asyncio.sleep(0.02)
+        leaving.cancel()
+        return await staying
+
+    result = asyncio.run(with_mock_backend(handler, calls))
+    assert llm_client.message_content(result) == "finished"
+    assert len(requests) == 1
+
+
+def test_identical_concurrent_sync_calls_share_one_backend_request(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        time.sleep(0.1)
+        return httpx.Response(200, json=completion("shared reply"))
+
+    monkeypatch.setattr(llm_client, "_sync_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(llm_client.chat_completion_sync(MESSAGES)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert len(requests) == 1
+    assert [llm_client.message_content(result) for result in results] == ["shared reply", "shared reply"]
+
+
+def test_ollama_payload_leaves_num_predict_to_ollama_when_unbounded():
+    backend = llm_client.get_backend("ollama")
+    assert "num_predict" not in backend.build_payload(MESSAGES, 0.0, -1, "llama3.2:latest", False)["options"]
+    assert backend.build_payload(MESSAGES, 0.0, 1024, "llama3.2:latest", False)["options"] == {
+        "temperature": 0.0, "num_predict": 1024}
+
+
+def test_both_import_paths_load_one_module():
+    from RagBot import llm_client as package_llm_client
+    assert package_llm_client is llm_client
+
+
+def test_limit_is_shared_by_sync_and_async_callers(monkeypatch):
+    monkeypatch.setattr(llm_client, "_limiter", llm_client._Limiter(1))
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def enter():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+
+    def leave():
+        with lock:
+            active[0] -= 1
+
+    def sync_caller():
+        with llm_client._limiter:
+            enter()
+            time.sleep(0.05)
+            leave()
+
+    async def async_caller():
+        async with llm_client._limiter:
+            enter()
+            await asyncio.sleep(0.05)
+            leave()
+
+    async def run():
+        threads = [threading.Thread(target=sync_caller) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        await asyncio.gather(async_caller(), async_caller())
+        await asyncio.to_thread(lambda: [thread.join() for thread in threads])
+
+    asyncio.run(run())
+    assert peak[0] == 1
+    assert llm_client._limiter._active == 0
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    limiter = llm_client._Limiter(1)
+
+    async def run():
+        async with limiter:
+            waiter = asyncio.ensure_future(limiter.__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        async with limiter:  # The cancelled waiter must not hold the only slot
+            pass
+
+    asyncio.run(asyncio.wait_for(run(), timeout=1))
+    assert limiter._active == 0 and not limiter._waiters
@@ -0,0 +1,65 @@
+import prompt_builder
+
+AIR = ("No person shall operate any industrial plant in an air pollution control area without the previous "
+       "consent of the State Board, and the occupier shall comply with the emission standards laid down.")
+WATER = ("No person shall knowingly cause or permit any poisonous, noxious or polluting matter to enter any "
+         "stream or well, and trade effluent shall be treated before it is discharged into a sewer.")
+
+
+def hit(chunk_id, document, **metadata):
+    return {"id": chunk_id, "document": document, "metadata": {"source": "act.pdf", **metadata}}
+
+
+def test_near_duplicates_are_dropped():
+    passages = [hit("a", AIR), hit("b", AIR.replace("State Board", "State  Board") + " Amended."), hit("w", WATER)]
+    block, stats = prompt_builder.pack_passages(passages, budget_tokens=2000)
+    assert stats["passages_used"] == 2 and stats["dropped_duplicate"] == 1
+    assert [citation["id"] for citation in stats["citations"]] == ["a", "w"]
+    assert block.startswith("[1] act.pdf") and "[2] act.pdf" in block
+
+
+def test_passages_are_capped_and_budget_is_respected():
+    long_text = " ".join(f"Clause {index} requires the occupier to keep records." for index in range(400))
+    passages = [hit("long", long_text), hit("air", AIR), hit("water", WATER)]
+    block, stats = prompt_builder.pack_passages(passages, budget_tokens=200, max_passage_tokens=120)
+    assert stats["truncated"] >= 1
+    assert stats["passage_tokens"] <= 200
+    assert prompt_builder.estimate_tokens(block) <= 200
+    assert "…" in block
+
+
+def test_whole_document_hits_are_only_read_up_to_the_passage_cap(monkeypatch):
+    seen = []
+    shingles = prompt_builder._shingles
+    monkeypatch.setattr(prompt_builder, "_shingles", lambda text: seen.append(len(text)) or shingles(text))
+    document = (AIR + "\n\n") * 5000  # About a megabyte, like an unchunked Act
+    _, stats = prompt_builder.pack_passages([hit("act", document)], budget_tokens=2000, max_passage_tokens=100)
+    assert stats["passages_used"] == 1 and stats["truncated"] == 1
+    assert seen and max(seen) <= 100 * prompt_builder.CHARS_PER_TOKEN + 2
+
+
+def test_duplicates_beyond_the_cap_are_judged_on_the_capped_text():
+    shared_start = AIR * 4
+    passages = [hit("a", shared_start + WATER * 4), hit("b", shared_start + " Different tail " * 50)]
+    _, stats = prompt_builder.pack_passages(passages, budget_tokens=2000, max_passage_tokens=60)
+    assert stats["dropped_duplicate"] == 1  # Identical once capped, so only one is sent
+
+
+def test_plain_strings_and_citations():
+    _, stats = prompt_builder.pack_passages(["Plain rule text about fire exits."], budget_tokens=100)
+    assert stats["citations"] == [{"ref": 1, "id": None, "citation": "unknown source"}]
+    assert prompt_builder.citation({"source": "act.pdf", "section": "Section 7A", "page_start": 12,
+                                    "page_end": 13}) == "act.pdf, Section 7A, p. 12-13"
+
+
+def test_build_budgeted_messages_leaves_room_for_the_completion():
+    def build_messages(block):
+        return [{"role": "system", "content": "Assess compliance."}, {"role": "user", "content": block}]
+
+    passages = [hit(str(index), f"{index} " + AIR) for index in range(50)]
+    messages, usage = prompt_builder.build_budgeted_messages(build_messages, passages, context_tokens=600,
+                                                             completion_tokens=200)
+    assert usage["prompt_tokens"] <= 600 - 200
+    assert usage["passages_used"] < 50
+    assert build_messages("No relevant rules were retrieved.") == \
+        prompt_builder.build_budgeted_messages(build_messages, [], 600, 200)[0]
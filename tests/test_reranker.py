@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+import reranker
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the passage length; each predict call takes `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def predict(self, pairs):
+        self.batches.append(list(pairs))
+        time.sleep(self.delay)
+        return [float(len(passage)) for _, passage in pairs]
+
+
+def hits(*documents):
+    return [{"id": document, "document": document, "metadata": {}} for document in documents]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeCrossEncoder()
+    monkeypatch.setattr(reranker, "get_reranker", lambda: fake)
+    monkeypatch.setattr(reranker, "_stats",
+                        {"requests": 0, "scored": 0, "unscored": 0, "truncated": 0, "failures": 0})
+    return fake
+
+
+def ids(hit_lists):
+    return [[hit["id"] for hit in hit_list] for hit_list in hit_lists]
+
+
+def test_orders_by_score_and_keeps_top_k(model):
+    result = reranker.rerank_batch(["q1", "q2"], [hits("a", "ccc", "bb", "dddd"), hits("xx", "y")], n_results=2)
+    assert ids(result) == [["dddd", "ccc"], ["xx", "y"]]
+    assert result[0][0]["rerank_score"] == 4.0
+    assert reranker.stats()["truncated"] == 0
+
+
+def test_scores_rank_major_in_batches(model):
+    reranker.rerank_batch(["q1", "q2"], [hits("a1", "a2", "a3"), hits("b1", "b2")], n_results=3, batch_size=2)
+    assert [[passage for _, passage in batch] for batch in model.batches] == [["a1", "b1"], ["a2", "b2"], ["a3"]]
+
+
+def test_budget_exhausted_keeps_retrieval_order_for_unscored(model, capsys):
+    model.delay = 0.05
+    result = reranker.rerank_batch(["q"], [hits("a", "bbb", "cc", "dddd", "e")], n_results=5,
+                                   batch_size=2, budget_seconds=0.01)
+    # Only the first batch ran: "a" and "bbb" are scored and reordered, the rest follow in retrieval order
+    assert ids(result) == [["bbb", "a", "cc", "dddd", "e"]]
+    assert "rerank_score" not in result[0][2]
+    assert reranker.stats()["truncated"] == 1
+    assert reranker.stats()["unscored"] == 3
+    assert "Rerank budget" in capsys.readouterr().out
+
+
+def test_zero_budget_scores_nothing(model):
+    result = reranker.rerank_batch(["q"], [hits("a", "bbb")], n_results=2, budget_seconds=0)
+    assert ids(result) == [["a", "bbb"]]
+    assert model.batches == []
+
+
+def test_model_load_does_not_spend_the_budget(monkeypatch):
+    fake = FakeCrossEncoder()
+
+    def cold_load():
+        time.sleep(0.1)
+        return fake
+
+    monkeypatch.setattr(reranker, "get_reranker", cold_load)
+    result = reranker.rerank_batch(["q"], [hits("a", "bbb")], n_results=2, budget_seconds=0.05)
+    assert ids(result) == [["bbb", "a"]]
+
+
+def test_shared_hits_are_not_mutated(model):
+    shared = hits("a", "bb")
+    reranker.rerank_batch(["q1", "q2"], [shared, list(shared)], n_results=2)
+    assert all("rerank_score" not in hit for hit in shared)
+
+
+def test_model_load_failure_keeps_retrieval_order(model, monkeypatch, capsys):
+    def broken_load():
+        raise OSError("cross-encoder/ms-marco-MiniLM-L-6-v2 is not available offline")
+
+    monkeypatch.setattr(reranker, "get_reranker", broken_load)
+    result = reranker.rerank_batch(["q"], [hits("a", "bbb", "cc")], n_results=2)
+    assert ids(result) == [["a", "bbb"]]
+    assert reranker.stats()["failures"] == 1
+    assert "Reranking failed" in capsys.readouterr().out
+
+
+def test_predict_failure_keeps_retrieval_order(model):
+    def broken_predict(pairs):
+        raise RuntimeError("out of memory")
+
+    model.predict = broken_predict
+    result = reranker.rerank_batch(["q1", "q2"], [hits("a", "bbb"), hits("cc")], n_results=2)
+    assert ids(result) == [["a", "bbb"], ["cc"]]
+    assert all("rerank_score" not in hit for hit_list in result for hit in hit_list)
+    assert reranker.stats()["failures"] == 1
+    assert reranker.stats()["truncated"] == 0
@@ -0,0 +1,66 @@
+import types
+import functools
+
+import pytest
+
+import response_cache
+
+MESSAGES = [{"role": "user", "content": "Assess the application against the Factories Act."}]
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    """A fresh cache database per test and a clock that only moves when told to."""
+    clock = [1_000.0]
+    monkeypatch.setattr(response_cache, "_connect", functools.partial(response_cache._connect,
+                                                                      str(tmp_path / "responses.sqlite3")))
+    monkeypatch.setattr(response_cache, "_initialized", False)
+    monkeypatch.setattr(response_cache, "_stats", {"hits": 0, "misses": 0, "writes": 0, "evictions": 0})
+    monkeypatch.setattr(response_cache, "time", types.SimpleNamespace(time=lambda: clock[0]))
+    return clock
+
+
+def test_round_trip_and_stats():
+    key = response_cache.cache_key(MESSAGES, "mistral", 0.7)
+    assert response_cache.get(key) is None
+    response_cache.put(key, "Compliant with Section 7A.")
+    assert response_cache.get(key) == "Compliant with Section 7A."
+    assert response_cache.stats() == {"hits": 1, "misses": 1, "writes": 1, "evictions": 0, "hit_rate": 0.5}
+
+
+def test_key_covers_prompt_model_and_temperature():
+    key = response_cache.cache_key(MESSAGES, "mistral", 0.7)
+    assert key == response_cache.cache_key([dict(message) for message in MESSAGES], "mistral", 0.7)
+    assert key != response_cache.cache_key(MESSAGES, "llama", 0.7)
+    assert key != response_cache.cache_key(MESSAGES, "mistral", 0.2)
+    assert key != response_cache.cache_key(MESSAGES + [{"role": "user", "content": "More"}], "mistral", 0.7)
+
+
+def test_entries_expire_after_the_ttl(cache):
+    response_cache.put("report", "Compliant.", ttl=60)
+    cache[0] += 61
+    assert response_cache.get("report", ttl=60) is None
+
+
+def test_least_recently_used_entries_are_evicted_past_the_size_budget(cache):
+    response_cache.put("first", "x" * 40, max_bytes=100)
+    cache[0] += 1
+    response_cache.put("second", "y" * 40, max_bytes=100)
+    cache[0] += 1
+    assert response_cache.get("first") is not None  # "second" is now the least recently used
+    cache[0] += 1
+    response_cache.put("third", "z" * 40, max_bytes=100)
+
+    assert response_cache.get("second") is None
+    assert response_cache.get("first") and response_cache.get("third")
+    assert response_cache.stats()["evictions"] == 1
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, (True, True)),
+    ("no-cache", (False, True)),
+    ("No-Store", (False, False)),
+    ("max-age=0, no-cache", (False, True)),
+])
+def test_parse_cache_control(header, expected):
+    assert response_cache.parse_cache_control(header) == expected
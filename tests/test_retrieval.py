@@ -0,0 +1,112 @@
+import pytest
+
+import retrieval
+from keyword_index import KeywordIndex, tokenize
+
+CHUNKS = {
+    "factories-1": "Section 7A. General duties of the occupier: every occupier shall ensure the health "
+                   "and safety of workers.",
+    "water-1": "Rule 3. No person shall discharge trade effluent into a stream or well without consent of the Board.",
+    "air-1": "Section 21. Restrictions on the use of certain industrial plants emitting air pollutants.",
+}
+
+
+def build_index():
+    index = KeywordIndex()
+    index.add(list(CHUNKS), list(CHUNKS.values()), ["factories.pdf", "water.pdf", "air.pdf"])
+    return index
+
+
+def hits(*ids):
+    return [{"id": chunk_id, "document": CHUNKS[chunk_id], "metadata": {}} for chunk_id in ids]
+
+
+# ----------------------------
+# BM25
+# ----------------------------
+def test_tokenize_keeps_section_numbers_and_drops_stopwords():
+    assert tokenize("Section 7A of the Factories Act, 1948") == ["section", "7a", "factories", "act", "1948"]
+
+
+def test_bm25_ranks_matching_chunk_first():
+    results = build_index().search("discharge of trade effluent", n_results=3)
+    assert [chunk_id for chunk_id, _ in results] == ["water-1"]
+
+
+def test_bm25_remove_source_and_reload(tmp_path):
+    index = build_index()
+    index.remove_source("water.pdf")
+    path = str(tmp_path / "bm25_index.json")
+    index.save(path)
+    reloaded = KeywordIndex.load(path)
+    assert set(reloaded.docs) == {"factories-1", "air-1"}
+    assert reloaded.search("effluent") == []
+
+
+def test_missing_index_file_loads_empty(tmp_path):
+    assert KeywordIndex.load(str(tmp_path / "missing.json")).docs == {}
+
+
+# ----------------------------
+# Reciprocal rank fusion
+# ----------------------------
+def test_rrf_rewards_agreement_between_rankers():
+    fused = retrieval.reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "e"]], k=60)
+    assert fused[0] == "b"  # Second in both lists beats first in only one
+    assert set(fused) == {"a", "b", "c", "d", "e"}
+
+
+def test_rrf_single_ranking_keeps_order():
+    assert retrieval.reciprocal_rank_fusion([["x", "y", "z"]]) == ["x", "y", "z"]
+
+
+# ----------------------------
+# Modes without a BM25 index
+# ----------------------------
+@pytest.fixture
+def stores(monkeypatch):
+    index = KeywordIndex()
+    monkeypatch.setattr(retrieval, "get_keyword_index", lambda: index)
+    monkeypatch.setattr(retrieval, "_missing_index_logged", False)
+    monkeypatch.setattr(retrieval, "vector_search_batch",
+                        lambda query_texts, n_results: [hits("air-1", "factories-1", "water-1")[:n_results]
+                                                        for _ in query_texts])
+    monkeypatch.setattr(retrieval, "_fetch_chunks", lambda ids: hits(*[i for i in dict.fromkeys(ids) if i in CHUNKS]))
+    return index
+
+
+def test_keyword_mode_without_index_falls_back_to_vector(stores, capsys):
+    results = retrieval.search_batch(["air pollution"], mode="keyword", n_results=2, rerank=False)
+    assert [[hit["id"] for hit in result] for result in results] == [["air-1", "factories-1"]]
+    assert "No BM25 keyword index" in capsys.readouterr().out
+
+
+def test_hybrid_mode_without_index_uses_vector_order(stores, capsys):
+    results = retrieval.search_batch(["air pollution"], mode="hybrid", n_results=2, rerank=False)
+    assert [[hit["id"] for hit in result] for result in results] == [["air-1", "factories-1"]]
+    assert "No BM25 keyword index" in capsys.readouterr().out
+
+
+def test_missing_index_is_logged_once(stores, capsys):
+    for _ in range(3):
+        retrieval.search_batch(["air pollution"], mode="hybrid", n_results=2, rerank=False)
+    assert capsys.readouterr().out.count("No BM25 keyword index") == 1
+
+
+def test_keyword_mode_with_index(stores):
+    stores.add(list(CHUNKS), list(CHUNKS.values()), ["f", "w", "a"])
+    results = retrieval.search_batch(["trade effluent discharge"], mode="keyword", n_results=2, rerank=False)
+    assert [hit["id"] for hit in results[0]] == ["water-1"]
+
+
+def test_hybrid_mode_fuses_keyword_only_hits(stores):
+    stores.add(list(CHUNKS), list(CHUNKS.values()), ["f", "w", "a"])
+    results = retrieval.search_batch(["trade effluent discharge"], mode="hybrid", n_results=3, rerank=False)
+    ids = [hit["id"] for hit in results[0]]
+    assert ids[0] == "water-1"  # Last in the vector ranking, first in BM25
+    assert set(ids) == set(CHUNKS)
+
+
+def test_unknown_mode_raises(stores):
+    with pytest.raises(ValueError):
+        retrieval.search_batch(["q"], mode="semantic")
@@ -0,0 +1,111 @@
+import pytest
+
+from ui.document_analysis import rules
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Total Number of Employees: 150", 150),
+    ("Total employees (permanent): 1,250", 1250),
+    ("Number of workers 45", 45),
+    ("Employee Strength – 320", 320),
+    ("Head count = 2 thousand", 2000),
+])
+def test_employee_count_matches(text, expected):
+    assert rules.extract_employee_count(text) == {"employee_count": expected}
+
+
+@pytest.mark.parametrize("text", [
+    "Total employees in 2024: 150",
+    "Employee count for FY 2023: 85",
+    "Total employees (FY 2023): 150",
+])
+def test_employee_count_ignores_years_between_label_and_value(text):
+    assert rules.extract_employee_count(text) is None
+
+
+def test_employee_count_conflicting_matches_are_ambiguous():
+    assert rules.extract_employee_count("Total employees: 150\nNumber of workers: 120") is None
+
+
+def test_employee_count_agreeing_matches():
+    assert rules.extract_employee_count("Total employees: 150\nHead count: 150") == {"employee_count": 150}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Total Energy Consumption: 1,20,000 kWh (Monthly)", 120000),
+    ("Total power usage: 1.5 MWh", 1500),
+    ("Total electricity consumption - 3 lakh units", 300000),
+])
+def test_energy_total(text, expected):
+    assert rules.extract_power_consumption(text) == {"Total_consumption": expected}
+
+
+def test_energy_without_unit_is_not_answered():
+    assert rules.extract_power_consumption("Total Energy Consumption: 120000") is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Built-up Area: 12,000 sq ft", 12000),
+    ("Plot area: 1000 sq. m", 10763.9),
+    ("Total area 2 acres", 87120),
+])
+def test_area(text, expected):
+    assert rules.extract_area(text) == {"estimated_area": expected}
+
+
+def test_water_certificate():
+    text = ("Total Monthly Water Consumption: 6 KL\n"
+            "Primary Water Source: Borewell\n"
+            "Testing Authority: Kerala Water Authority\n"
+            "Average pH Level: 7.2\n"
+            "Manufacturing Processes: 60%\n"
+            "Cooling Systems: 30%\n"
+            "Sanitation: 10%\n")
+    result = rules.extract_water_certification(text)
+    assert result["Total_monthly_water_consumption"] == 6000
+    assert result["primary_water_source"] == "Borewell"
+    assert result["testing_authority"] == "Kerala Water Authority"
+    assert result["usage_breakdown"] == {"manufacturing_processes": 60, "cooling_systems": 30, "sanitation": 10}
+    assert result["water_quality"]["ph_level"] == 7.2
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("SCALE 1:100", 100.0),
+    ("Scale = 1/50", 50.0),
+    ("Drawing scale: 200", 200.0),
+    ("Upscaled 1:100", None),
+])
+def test_parse_scale(text, expected):
+    assert rules.parse_scale(text) == expected
+
+
+def test_merge_keeps_llm_fields_and_rule_total():
+    extracted = {"Total_consumption": 119000, "details_of_machine": [{"machine_id": "M1"}]}
+    assert rules.merge({"Total_consumption": 120000}, extracted) == {
+        "Total_consumption": 120000, "details_of_machine": [{"machine_id": "M1"}]}
+
+
+def test_merge_falls_back_to_rule_answer_when_llm_failed():
+    assert rules.merge({"Total_consumption": 120000}, {"error": "timeout"}) == {"Total_consumption": 120000}
+
+
+def test_merge_without_rule_answer():
+    assert rules.merge(None, {"error": "timeout"}) == {"error": "timeout"}
+
+
+def test_energy_rule_total_does_not_drop_machine_table(monkeypatch):
+    energy = pytest.importorskip("ui.document_analysis.energyConsumption")
+    calls = []
+
+    def fake_extract(text, model, instructions, system_prompt, max_tokens=512):
+        calls.append(text)
+        return {"Total_consumption": 119000.0, "details_of_machine": [{"machine_id": "M1", "power_kw": 15.0}]}
+
+    monkeypatch.setattr(energy, "extract", fake_extract)
+    text = "Total Energy Consumption: 1,20,000 kWh (Monthly)\nM1 Hydraulic press 15 kW"
+
+    assert energy.extract_power_consumption_from_text(text, total_only=True) == {"Total_consumption": 120000}
+    assert calls == []
+    assert energy.extract_power_consumption_from_text(text) == {
+        "Total_consumption": 120000, "details_of_machine": [{"machine_id": "M1", "power_kw": 15.0}]}
+    assert calls == [text]
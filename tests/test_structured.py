@@ -0,0 +1,132 @@
+from typing import Optional
+
+import httpx
+import pytest
+from pydantic import create_model
+
+from ui.document_analysis import structured
+from ui.document_analysis.structured import (
+    EmployeeCount, PowerConsumption, WaterCertification, parse_json_reply, validate,
+)
+
+
+# ----------------------------
+# parse_json_reply
+# ----------------------------
+def test_parse_plain_json():
+    assert parse_json_reply('{"employee_count": 150}') == {"employee_count": 150}
+
+
+def test_parse_fenced_reply_with_prose():
+    reply = 'Here is the data:\n```json\n{"employee_count": 150}\n```\nLet me know if you need more.'
+    assert parse_json_reply(reply) == {"employee_count": 150}
+
+
+def test_parse_trailing_commas_and_comments():
+    reply = '{\n  "Total_consumption": 120000, // kWh\n  "details_of_machine": [],\n}'
+    assert parse_json_reply(reply) == {"Total_consumption": 120000, "details_of_machine": []}
+
+
+def test_parse_python_literals_and_single_quotes():
+    assert parse_json_reply("{'employee_count': None, 'verified': True}") == {"employee_count": None,
+                                                                              "verified": True}
+
+
+def test_parse_truncated_reply():
+    reply = '{"details_of_machine": [{"machine_id": "M1", "machine_name": "Press'
+    assert parse_json_reply(reply) == {"details_of_machine": [{"machine_id": "M1", "machine_name": "Press"}]}
+
+
+def test_parse_rejects_non_object():
+    with pytest.raises(ValueError):
+        parse_json_reply("I could not find any employee count in this document.")
+
+
+# ----------------------------
+# validate
+# ----------------------------
+def test_validate_coerces_unit_strings_in_number_fields():
+    assert validate(PowerConsumption, {"Total_consumption": "1,20,000 kWh"})["Total_consumption"] == 120000.0
+
+
+def test_validate_numbers_in_text_fields_become_text():
+    result = validate(WaterCertification, {"primary_water_source": 42, "test_date": 20240115})
+    assert result["primary_water_source"] == "42"
+    assert result["test_date"] == "20240115"
+
+
+def test_validate_string_without_number_becomes_null():
+    assert validate(EmployeeCount, {"employee_count": "not stated"}) == {"employee_count": None}
+
+
+def test_validate_malformed_nested_object_keeps_other_fields():
+    result = validate(WaterCertification, {
+        "Total_monthly_water_consumption": "6,000 Liters",
+        "usage_breakdown": "80% manufacturing",
+        "water_quality": {"ph_level": 7.2, "turbidity": "Low"},
+        "testing_authority": "Kerala Water Authority",
+    })
+    assert result["usage_breakdown"] is None
+    assert result["Total_monthly_water_consumption"] == 6000.0
+    assert result["water_quality"] == {"ph_level": 7.2, "turbidity": "Low", "contaminants": None}
+    assert result["testing_authority"] == "Kerala Water Authority"
+
+
+def test_validate_drops_non_object_list_items():
+    result = validate(PowerConsumption, {"Total_consumption": 500,
+                                         "details_of_machine": ["Press", {"machine_id": "M1", "power_kw": "15 kW"}]})
+    assert [machine["machine_id"] for machine in result["details_of_machine"]] == ["M1"]
+    assert result["details_of_machine"][0]["power_kw"] == 15.0
+
+
+def test_validate_combined_model_keeps_well_formed_parts():
+    combined = create_model("DocumentExtraction", employees=(Optional[EmployeeCount], None),
+                            water=(Optional[WaterCertification], None))
+    result = validate(combined, {"employees": {"employee_count": 150}, "water": "see attached certificate"})
+    assert result == {"employees": {"employee_count": 150}, "water": None}
+
+
+# ----------------------------
+# response_format fallback
+# ----------------------------
+class FakeBackend:
+    """Stands in for llm_client.chat_completion_sync: rejects schema requests with the given 400 body."""
+
+    def __init__(self, rejection):
+        self.rejection = rejection
+        self.calls = []
+
+    def __call__(self, messages, temperature=0.7, max_tokens=-1, response_format=None):
+        self.calls.append(response_format is not None)
+        if response_format is not None:
+            request = httpx.Request("POST", "http://localhost:1234/v1/chat/completions")
+            raise httpx.HTTPStatusError("400", request=request,
+                                        response=httpx.Response(400, text=self.rejection, request=request))
+        return {"choices": [{"message": {"content": '{"employee_count": 150}'}}]}
+
+
+@pytest.fixture
+def schema_supported(monkeypatch):
+    monkeypatch.setattr(structured, "_schema_supported", True)
+
+
+def test_unsupported_response_format_switches_schema_off(monkeypatch, schema_supported):
+    backend = FakeBackend('{"error": "\'response_format\' of type json_schema is not supported"}')
+    monkeypatch.setattr(structured.llm_client, "chat_completion_sync", backend)
+    messages = [{"role": "user", "content": "Employees: 150"}]
+
+    assert structured.request_json(messages, EmployeeCount) == {"employee_count": 150}
+    assert structured.request_json(messages, EmployeeCount) == {"employee_count": 150}
+    assert backend.calls == [True, False, False]
+    assert structured._schema_supported is False
+
+
+def test_other_400_only_falls_back_for_that_call(monkeypatch, schema_supported):
+    backend = FakeBackend('{"error": "Context length of 4096 tokens exceeded (5120 requested)"}')
+    monkeypatch.setattr(structured.llm_client, "chat_completion_sync", backend)
+    messages = [{"role": "user", "content": "Employees: 150"}]
+
+    assert structured.request_json(messages, EmployeeCount) == {"employee_count": 150}
+    assert structured._schema_supported is True
+    structured.request_json(messages, EmployeeCount)
+    assert backend.calls == [True, False, True, False]
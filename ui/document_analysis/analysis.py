@@ -1,8 +1,6 @@
 import cv2
 import pytesseract
 import layoutparser as lp
-import requests
-import json
 import io
 import os
 import sys
@@ -11,8 +9,8 @@ from PIL import Image
 # Ensure the root directory (SoulSync) is in sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-# LM Studio API URL (Make sure LM Studio is running)
-LM_STUDIO_URL = "http://localhost:1234/v1/chat/completions"
+from extraction.cache import cached_extraction
+from ui.document_analysis.structured import FacilityDetails, extract
 
 simple_json_extract = """
 Extract structured data from the following document and return it in valid JSON format. The JSON should only include these specific fields:
@@ -29,7 +27,23 @@ TEXT:
 Return **only** the extracted information as a well-formatted JSON object with the above fields. If a field's information is not found in the text, use null as the value. Do not include any additional text or markdown code blocks in the response.
 """
 
+# Fields of the facility/application details (the reply is constrained to FacilityDetails)
+FACILITY_DETAILS_INSTRUCTIONS = """Extract structured data from the following document. The JSON should only include these specific fields:
 
+- name: Name of the facility/building
+- square_feet: Total square footage of the facility
+- number_of_employees: Number of employees working in the facility
+- power_consumption: Power consumption details
+- water_source: Source of water supply
+- waste_disposal: Waste management and disposal methods
+
+Return **only** the extracted information as a well-formatted JSON object with the above fields.
+If a field's information is not found in the text, use null as the value.
+Do not include any additional text or markdown code blocks in the response.
+"""
+
+
+@cached_extraction("image_text", version=1, settings={"threshold": "otsu", "tesseract_config": "--oem 3 --psm 6"})
 def extract_text_from_image(image_path):
     """Extracts text from an image using OpenCV, Tesseract OCR, and LayoutParser."""
     print(f"🔍 Processing image: {image_path}")
@@ -58,68 +72,13 @@ def analyze_text_with_lm_studio(text):
         dict: The extracted structured information in JSON format.
     """
     print("🔍 Sending text to LM Studio API...")
-
-    # Define system prompt
-    system_prompt = """Extract structured data from the following document and return it in valid JSON format. 
-The JSON should only include these specific fields:
-
-- name: Name of the facility/building
-- square_feet: Total square footage of the facility
-- number_of_employees: Number of employees working in the facility
-- power_consumption: Power consumption details
-- water_source: Source of water supply
-- waste_disposal: Waste management and disposal methods
-
-TEXT:
-{text}
-
-Return **only** the extracted information as a well-formatted JSON object with the above fields. 
-If a field's information is not found in the text, use null as the value. 
-Do not include any additional text or markdown code blocks in the response.
-
-"""
-
-    # Format the prompt with actual text
-    prompt = system_prompt.format(text=text)
-
-    # Construct payload for LM Studio API
-    payload = {
-        "model": "amethyst-13b-mistral",  # Ensure this model is available in LM Studio
-        "messages": [
-            {"role": "system", "content": "Extract structured data from this text and return valid JSON"},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.2,  # Lower temperature for better consistency
-        "max_tokens": 1024,  # Set max tokens limit
-        "stream": False
-    }
-
-    try:
-        # Send request to LM Studio
-        response = requests.post(LM_STUDIO_URL, json=payload, headers={"Content-Type": "application/json"})
-        response.raise_for_status()
-
-        # Parse response JSON
-        response_data = response.json()
-        structured_json = response_data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-
-        # Debugging logs
-        print(f"🌐 API Response Status: {response.status_code}")
-        print(f"🔍 Raw LM Studio Response:\n{structured_json}")
-
-        # Validate JSON response
-        if not structured_json:
-            print("⚠️ LM Studio returned an empty response!")
-            return {"error": "No valid JSON response from LM Studio"}
-
-        return json.loads(structured_json)  # Convert string to JSON object
-
-    except json.JSONDecodeError as e:
-        print(f"⚠️ JSONDecodeError: {e}")
-        return {"error": "Invalid JSON response from LM Studio"}
-    except requests.RequestException as e:
-        print(f"⚠️ RequestException: {e}")
-        return {"error": "Failed to connect to LM Studio"}
+    structured = extract(text, FacilityDetails, FACILITY_DETAILS_INSTRUCTIONS,
+                         "Extract structured data from this text and return valid JSON", max_tokens=1024)
+    if "error" in structured:
+        return structured
+    # Whole numbers read better in the UI and the report prompt as 50000 than as 50000.0
+    return {key: int(value) if isinstance(value, float) and value.is_integer() else value
+            for key, value in structured.items()}
 
 def analyze_invoice(image_path):
     """
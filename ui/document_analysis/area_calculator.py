@@ -2,9 +2,16 @@ import cv2
 import numpy as np
 import pytesseract
 import os
+import sys
 from pdf2image import convert_from_path
 from PIL import Image
 
+# Ensure the root directory is in sys.path for the shared extraction cache
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from extraction.cache import cached_extraction
+from ui.document_analysis.rules import parse_scale, pre_extract
+
 # ✅ Set Tesseract OCR Path for macOS (Update path if needed)
 pytesseract.pytesseract.tesseract_cmd = "/opt/homebrew/bin/tesseract"  # For Apple Silicon (M1/M2)
 # If using Intel Mac, change to: "/usr/local/bin/tesseract"
@@ -13,7 +20,8 @@ def load_image(input_path, dpi=300):
     """Load an image or convert PDF to an image."""
     if input_path.lower().endswith(".pdf"):
         print("📄 Converting PDF to image...")
-        images = convert_from_path(input_path, dpi=dpi)
+        # Rasterise only the first page instead of every page of the PDF
+        images = convert_from_path(input_path, dpi=dpi, first_page=1, last_page=1)
         return np.array(images[0])  # Convert first page to NumPy array
     else:
         print("🖼️ Loading image file...")
@@ -26,18 +34,13 @@ def preprocess_image(image):
     edged = cv2.Canny(blurred, 50, 150)  # Edge detection
     return edged
 
-def extract_scale_text(image):
-    """Extract scale from blueprint using OCR."""
+def extract_scale_text(image, text=None):
+    """Extract scale from blueprint using OCR (or already OCR'd text)."""
     print("🔍 Extracting scale information...")
-    text = pytesseract.image_to_string(image)
+    if text is None:
+        text = pytesseract.image_to_string(image)
 
-    scale_factor = 1.0  # Default scale
-    for line in text.split("\n"):
-        if "scale" in line.lower():
-            parts = line.split(":")
-            if len(parts) == 2 and parts[1].strip().replace(".", "").isdigit():
-                scale_factor = float(parts[1].strip())
-                break
+    scale_factor = parse_scale(text) or 1.0  # Default scale
 
     print(f"📏 Detected Scale: 1:{scale_factor}")
     return scale_factor
@@ -50,6 +53,7 @@ def calculate_area(image, scale=1.0):
     real_area = total_area * (scale ** 2)  # Adjust area based on scale
     return real_area
 
+@cached_extraction("blueprint_area", version=2, settings={"dpi": 300, "canny": [50, 150]})
 def cal_blueprint(input_path):
     """Main function to process blueprint and estimate area."""
     if not os.path.exists(input_path):
@@ -62,8 +66,14 @@ def cal_blueprint(input_path):
     # Convert to PIL Image for OCR
     pil_image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
 
+    # A blueprint that states its area ("Built-up Area: 12,000 sq ft") is answered by the rules
+    text = pytesseract.image_to_string(pil_image)
+    stated_area = pre_extract("area", text)
+    if stated_area is not None:
+        return stated_area
+
     # Extract scale from the blueprint
-    scale = extract_scale_text(pil_image)
+    scale = extract_scale_text(pil_image, text)
 
     # Process image for contour detection
     processed_image = preprocess_image(image)
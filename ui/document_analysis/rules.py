@@ -0,0 +1,222 @@
+import os
+import re
+import threading
+
+# Rule-based pre-extraction. Most proof documents state the figures the checks need verbatim
+# ("Total Number of Employees: 150", "Total Energy Consumption: 1,20,000 kWh (Monthly)",
+# "Built-up Area: 12,000 sq ft"), so compiled label patterns with unit normalisers answer them in
+# milliseconds. A field only counts as found when every labelled match in the document agrees;
+# no match or conflicting matches are "ambiguous" and the caller falls back to LM Studio.
+RULES_ENABLED = os.environ.get("LAWLENS_RULES", "1") != "0"
+
+# "150", "6000.5", "1,20,000" (Indian grouping) or "120,000", optionally followed by a word multiplier
+NUMBER = r"(?P<number>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?:\s*(?P<multiplier>lakhs?|lacs?|crores?|million|thousand)\b)?"
+
+# Between a label and its value: an optional parenthetical, then either only spaces or words ending
+# in a separator directly before the number ("Total employees (permanent): 150"). Words without a
+# separator are not skipped, so "Total employees in 2024: 150" does not read the year as the value.
+FILLER = r"[^\S\n]*(?:\([^)\n\d]*\))?(?:[^\n\d]{0,40}?[:\-–=])?[^\S\n]*"
+
+MULTIPLIERS = {"lakh": 1e5, "lac": 1e5, "crore": 1e7, "million": 1e6, "thousand": 1e3}
+
+# Unit (lower case, without dots or spaces, singular) -> factor into the unit each check
+# reports: kWh, litres, square feet
+ENERGY_UNITS = {"wh": 0.001, "kwh": 1.0, "unit": 1.0, "mwh": 1e3, "gwh": 1e6}
+WATER_UNITS = {"l": 1.0, "litre": 1.0, "liter": 1.0, "kl": 1e3, "kilolitre": 1e3, "kiloliter": 1e3,
+               "m3": 1e3, "m³": 1e3, "cubicmetre": 1e3, "cubicmeter": 1e3, "gallon": 3.78541}
+AREA_UNITS = {"sqft": 1.0, "sqfeet": 1.0, "squarefeet": 1.0, "squarefoot": 1.0, "ft2": 1.0, "ft²": 1.0,
+              "sqm": 10.7639, "sqmeter": 10.7639, "sqmetre": 10.7639, "squaremeter": 10.7639,
+              "squaremetre": 10.7639, "m2": 10.7639, "m²": 10.7639, "acre": 43560.0, "hectare": 107639.0}
+
+_ENERGY_UNIT = r"(?P<unit>[kmg]?wh|units)\b"
+_WATER_UNIT = r"(?P<unit>kilolit(?:re|er)s?|lit(?:re|er)s?|kl|l|m3|m³|cubic\s+met(?:re|er)s?|gallons?)(?![a-z])"
+_AREA_UNIT = (r"(?P<unit>sq\.?\s*(?:ft|feet)|square\s+f(?:ee|oo)t|ft2|ft²|sq\.?\s*m(?:et(?:re|er)s?)?|"
+              r"square\s+met(?:re|er)s?|m2|m²|acres?|hectares?)(?![a-z])")
+
+_flags = re.IGNORECASE
+EMPLOYEE_PATTERNS = [re.compile(label + FILLER + NUMBER, _flags) for label in (
+    r"total\s+(?:number\s+of\s+)?(?:employees|workers|staff|workforce)",
+    r"(?:number|no\.?)\s+of\s+(?:employees|workers|staff)",
+    r"employee\s+(?:count|strength)",
+    r"head\s*count",
+)]
+ENERGY_PATTERNS = [re.compile(label + FILLER + NUMBER + r"\s*" + _ENERGY_UNIT, _flags) for label in (
+    r"total\s+(?:monthly\s+|annual\s+)?(?:energy|power|electricity)\s+(?:consumption|usage)",
+)]
+WATER_PATTERNS = [re.compile(label + FILLER + NUMBER + r"\s*" + _WATER_UNIT, _flags) for label in (
+    r"total\s+(?:monthly\s+)?water\s+(?:consumption|usage)",
+)]
+AREA_PATTERNS = [re.compile(label + FILLER + NUMBER + r"\s*" + _AREA_UNIT, _flags) for label in (
+    r"(?:total|built[-\s]?up|plot|floor|carpet|covered)\s+area",
+)]
+SCALE_PATTERN = re.compile(r"\bscale\s*[:=\-]?\s*(?:1\s*[:/]\s*)?(\d+(?:\.\d+)?)", _flags)
+
+# Text fields of water certificates, read up to the end of the line
+_LINE_VALUE = r"[^\S\n]*[:\-–][^\S\n]*(?P<value>[^\n]+)"
+WATER_TEXT_PATTERNS = {
+    "primary_water_source": re.compile(r"primary\s+(?:water\s+)?source" + _LINE_VALUE, _flags),
+    "secondary_water_source": re.compile(r"secondary\s+(?:water\s+)?source" + _LINE_VALUE, _flags),
+    "testing_authority": re.compile(r"testing\s+authority" + _LINE_VALUE, _flags),
+    "test_date": re.compile(r"test(?:ing)?\s+date" + _LINE_VALUE, _flags),
+    "turbidity": re.compile(r"turbidity" + _LINE_VALUE, _flags),
+    "contaminants": re.compile(r"contaminants" + _LINE_VALUE, _flags),
+}
+WATER_NUMBER_PATTERNS = {
+    "average_ph_level": re.compile(r"average\s+ph(?:\s+level)?" + FILLER + NUMBER, _flags),
+    "ph_level": re.compile(r"(?<!average )ph\s+level" + FILLER + NUMBER, _flags),
+    "monthly_water_cost": re.compile(r"monthly\s+water\s+cost" + r"[^\n\d]{0,20}?" + NUMBER, _flags),
+    "manufacturing_processes": re.compile(r"manufacturing\s+processes" + FILLER + NUMBER + r"\s*%", _flags),
+    "cooling_systems": re.compile(r"cooling\s+systems?" + FILLER + NUMBER + r"\s*%", _flags),
+    "sanitation": re.compile(r"sanitation" + FILLER + NUMBER + r"\s*%", _flags),
+}
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+# ----------------------------
+# Normalisers
+# ----------------------------
+def parse_number(match):
+    """Numeric value of a NUMBER match, applying Indian/English grouping and word multipliers."""
+    value = float(match.group("number").replace(",", ""))
+    multiplier = (match.group("multiplier") or "").lower().rstrip("s")
+    return value * MULTIPLIERS.get(multiplier, 1.0)
+
+
+def _unit_factor(unit, units):
+    unit = re.sub(r"[.\s]+", "", unit.lower())
+    return units.get(unit, units.get(unit[:-1]) if unit.endswith("s") else None)
+
+
+def _agreed_value(patterns, text, units=None):
+    """
+    The single value every labelled match agrees on, or None when nothing matched or matches
+    disagree (e.g. a monthly and an annual total), which leaves the field to the LLM.
+    """
+    values = set()
+    for pattern in patterns:
+        for match in pattern.finditer(text):
+            value = parse_number(match)
+            if units is not None:
+                factor = _unit_factor(match.group("unit"), units)
+                if factor is None:
+                    continue
+                value *= factor
+            values.add(round(value, 3))
+    return values.pop() if len(values) == 1 else None
+
+
+def _first_value(pattern, text):
+    match = pattern.search(text)
+    if not match:
+        return None
+    return match.group("value").strip() if "value" in pattern.groupindex else parse_number(match)
+
+
+def _whole(value):
+    return int(value) if value is not None and float(value).is_integer() else value
+
+
+# ----------------------------
+# Field Extractors
+# ----------------------------
+def extract_employee_count(text):
+    count = _agreed_value(EMPLOYEE_PATTERNS, text)
+    return {"employee_count": int(count)} if count is not None and count.is_integer() else None
+
+
+def extract_power_consumption(text):
+    # Machine tables vary too much for patterns; the rules answer the total the checks compare
+    total = _agreed_value(ENERGY_PATTERNS, text, ENERGY_UNITS)
+    return {"Total_consumption": _whole(total)} if total is not None else None
+
+
+def extract_water_certification(text):
+    total = _agreed_value(WATER_PATTERNS, text, WATER_UNITS)
+    if total is None:
+        return None
+    result = {"Total_monthly_water_consumption": _whole(total)}
+    result.update({field: _first_value(pattern, text) for field, pattern in WATER_TEXT_PATTERNS.items()
+                   if field not in ("turbidity", "contaminants")})
+    numbers = {field: _whole(_first_value(pattern, text)) for field, pattern in WATER_NUMBER_PATTERNS.items()}
+    result["average_ph_level"] = numbers["average_ph_level"]
+    result["monthly_water_cost"] = numbers["monthly_water_cost"]
+    result["usage_breakdown"] = {field: numbers[field]
+                                 for field in ("manufacturing_processes", "cooling_systems", "sanitation")}
+    result["water_quality"] = {
+        "ph_level": numbers["ph_level"] if numbers["ph_level"] is not None else numbers["average_ph_level"],
+        "turbidity": _first_value(WATER_TEXT_PATTERNS["turbidity"], text),
+        "contaminants": _first_value(WATER_TEXT_PATTERNS["contaminants"], text),
+    }
+    return result
+
+
+def extract_area(text):
+    area = _agreed_value(AREA_PATTERNS, text, AREA_UNITS)
+    return {"estimated_area": round(area, 2)} if area is not None else None
+
+
+def parse_scale(text):
+    """Scale denominator from text such as "Scale 1:100", "SCALE = 1/50" or "Scale: 100"; None if absent."""
+    match = SCALE_PATTERN.search(text)
+    return float(match.group(1)) if match else None
+
+
+EXTRACTORS = {
+    "employees": extract_employee_count,
+    "energy": extract_power_consumption,
+    "water": extract_water_certification,
+    "area": extract_area,
+}
+
+# Targets the rules only partly answer: energy rules find the total but not the machine table, so
+# a full extraction still asks the LLM and merges the rule's total into its result
+PARTIAL_TARGETS = {"energy"}
+
+
+def pre_extract(target, text):
+    """
+    Answer a check from the document text with the rules alone.
+
+    Args:
+        target (str): "employees", "energy", "water" or "area".
+        text (str): The document text.
+
+    Returns:
+        dict: The result in the same shape as the LLM extraction (only the total for
+        PARTIAL_TARGETS), or None when the rules are not confident (or disabled) and the caller
+        should ask LM Studio.
+    """
+    if not RULES_ENABLED or not text:
+        return None
+    result = EXTRACTORS[target](text)
+    with _stats_lock:
+        counts = _stats.setdefault(target, {"hits": 0, "misses": 0})
+        counts["hits" if result is not None else "misses"] += 1
+    print(f"📐 Rules {'answered' if result is not None else 'deferred to the LLM for'} {target}: {result}")
+    return result
+
+
+def merge(ruled, extracted):
+    """
+    Combine a partial rule answer with the LLM extraction of the same document: the verbatim
+    figures found by the rules win, the LLM supplies every other field. When the LLM call failed,
+    the rule answer is returned on its own.
+    """
+    if ruled is None:
+        return extracted
+    if not extracted or "error" in extracted:
+        print(f"⚠️ LLM extraction failed ({(extracted or {}).get('error')}); keeping the rule answer only")
+        return dict(ruled)
+    return {**extracted, **ruled}
+
+
+def stats():
+    """Per-target rule hits, LLM fallbacks and hit rate since the process started."""
+    with _stats_lock:
+        counts = {target: dict(values) for target, values in _stats.items()}
+    for values in counts.values():
+        total = values["hits"] + values["misses"]
+        values["hit_rate"] = round(values["hits"] / total, 3) if total else 0.0
+    return counts
@@ -0,0 +1,388 @@
+import os
+import re
+import sys
+import json
+import httpx
+from typing import Dict, List, Optional, Type, Union, get_args, get_origin
+from pydantic import BaseModel, ValidationError, create_model
+
+# Ensure the root directory is in sys.path for the shared LLM client
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from RagBot import llm_client
+
+# Schema-constrained extraction. Each extraction target is a Pydantic model; its JSON schema is
+# sent as the OpenAI-compatible `response_format` so the backend (LM Studio, llama.cpp, Ollama)
+# constrains decoding to valid JSON of that shape. Replies that still arrive as near-JSON
+# (markdown fences, trailing commas, Python literals, "6,000 kWh" in a number field) are repaired
+# locally instead of asking the model again, and several targets found in one document can be
+# extracted with a single call.
+
+# "json_schema" sends the schema as response_format; "none" relies on the prompt and local repair
+# (for backends that reject response_format). A 400 reply to a schema request is retried once
+# without the schema; when its body says response_format/json_schema is unsupported, the process
+# also switches to "none", so an unsupported backend costs one extra request, not one per call.
+# Other 400s (context overflow, malformed prompt) only affect that call.
+STRUCTURED_OUTPUT = os.environ.get("LAWLENS_STRUCTURED_OUTPUT", "json_schema")
+_schema_supported = STRUCTURED_OUTPUT == "json_schema"
+_UNSUPPORTED_SCHEMA = re.compile(r"response_format|json_schema", re.IGNORECASE)
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_LINE_COMMENT = re.compile(r"(?<![:\"\\])//[^\n]*")
+_PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+_PYTHON_LITERAL = re.compile(r"\b(None|True|False)\b")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_NUMBER = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+
+class StructuredExtractionError(Exception):
+    """The backend could not be reached or its reply could not be turned into the schema."""
+
+
+def json_schema(model: Type[BaseModel]) -> dict:
+    return model.model_json_schema() if hasattr(model, "model_json_schema") else model.schema()
+
+
+def _validate(model: Type[BaseModel], data):
+    return model.model_validate(data) if hasattr(model, "model_validate") else model.parse_obj(data)
+
+
+def _dump(instance: BaseModel) -> dict:
+    return instance.model_dump() if hasattr(instance, "model_dump") else instance.dict()
+
+
+# ----------------------------
+# Near-JSON Repair
+# ----------------------------
+def _outermost_object(text):
+    """The text from the first "{" to its matching "}" (or the end, if the reply was cut off)."""
+    start = text.find("{")
+    if start < 0:
+        return text
+    depth, in_string, escaped = 0, False, False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return text[start:]
+
+
+def _close_truncated(text):
+    """Close the strings, arrays and objects left open by a reply that hit max_tokens."""
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = _TRAILING_COMMA.sub(r"\1", text.rstrip().rstrip(",") + "".join(reversed(stack)))
+    return text
+
+
+def parse_json_reply(reply):
+    """
+    Parse a model reply that should be a JSON object, repairing common near-JSON locally.
+
+    Args:
+        reply (str): The message content returned by the model.
+
+    Returns:
+        dict: The parsed object.
+
+    Raises:
+        ValueError: If the reply cannot be repaired into a JSON object.
+    """
+    text = reply.strip()
+    fenced = _FENCE.search(text)
+    candidates = [text]
+    if fenced:
+        candidates.append(fenced.group(1).strip())
+    for candidate in candidates:
+        attempt = _outermost_object(candidate.translate(_SMART_QUOTES))
+        for repair in (
+            lambda value: value,
+            lambda value: _TRAILING_COMMA.sub(r"\1", _LINE_COMMENT.sub("", value)),
+            lambda value: _PYTHON_LITERAL.sub(lambda match: _PYTHON_LITERALS[match.group(1)], value),
+            lambda value: value.replace("'", '"') if '"' not in value else value,
+            _close_truncated,
+        ):
+            attempt = repair(attempt)
+            try:
+                parsed = json.loads(attempt)
+            except ValueError:
+                continue
+            if isinstance(parsed, dict):
+                return parsed
+    raise ValueError(f"Reply is not a JSON object: {reply[:200]!r}")
+
+
+def _coerce_number(value):
+    """ "1,20,000 Liters" -> 120000.0; None when the value holds no number."""
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        if match:
+            return float(match.group(0).replace(",", ""))
+    return None
+
+
+def _at(data, loc):
+    """The container and key of the value a validation error points at (union branch names in loc are skipped)."""
+    container, key, node = None, None, data
+    for part in loc:
+        if (isinstance(node, dict) and part in node) or (isinstance(node, list) and isinstance(part, int)
+                                                         and part < len(node)):
+            container, key, node = node, part, node[part]
+    if container is None:
+        raise KeyError(loc)
+    return container, key
+
+
+def _field_types(model: Type[BaseModel]) -> dict:
+    if hasattr(model, "model_fields"):
+        return {name: field.annotation for name, field in model.model_fields.items()}
+    return {name: field.outer_type_ for name, field in model.__fields__.items()}
+
+
+def _nested_schema(annotation):
+    """(model, is_list) for a field typed as a schema, an optional schema or a list of schemas; None otherwise."""
+    origin, args = get_origin(annotation), get_args(annotation)
+    if origin is Union:
+        members = [arg for arg in args if arg is not type(None)]
+        return _nested_schema(members[0]) if len(members) == 1 else None
+    if origin is list:
+        nested = _nested_schema(args[0]) if args else None
+        return (nested[0], True) if nested and not nested[1] else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None
+
+
+def _drop_malformed_objects(model: Type[BaseModel], data):
+    """
+    Null nested schema fields the model filled with something other than an object (e.g.
+    usage_breakdown: "80% manufacturing") and drop non-object list items, recursively.
+    """
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+    for name, annotation in _field_types(model).items():
+        nested = _nested_schema(annotation)
+        if nested is None or data.get(name) is None:
+            continue
+        schema, is_list = nested
+        value = data[name]
+        if is_list:
+            data[name] = ([_drop_malformed_objects(schema, item) for item in value if isinstance(item, dict)]
+                          if isinstance(value, list) else [])
+        else:
+            data[name] = _drop_malformed_objects(schema, value) if isinstance(value, dict) else None
+    return data
+
+
+def validate(model: Type[BaseModel], data: dict) -> dict:
+    """
+    Validate parsed data against a schema. Values the model put in the wrong type are coerced
+    rather than failing the extraction: a unit string in a number field becomes its number (or
+    null), a number in a text field becomes text, and a malformed sub-object becomes null
+    instead of discarding every other field.
+    """
+    data = _drop_malformed_objects(model, data)
+    try:
+        return _dump(_validate(model, data))
+    except ValidationError as e:
+        errors = e.errors()
+    repaired = json.loads(json.dumps(data))
+    for error in errors:
+        try:
+            container, key = _at(repaired, error["loc"])
+        except KeyError:
+            continue
+        value = container[key]
+        if "str" in error["type"]:
+            container[key] = None if isinstance(value, (dict, list)) else str(value)
+        elif "list" in error["type"]:
+            container[key] = []
+        else:
+            container[key] = _coerce_number(value)
+    try:
+        return _dump(_validate(model, repaired))
+    except ValidationError as e:
+        raise StructuredExtractionError(f"Reply does not match {model.__name__}: {e}")
+
+
+# ----------------------------
+# Backend Call
+# ----------------------------
+def response_format(model: Type[BaseModel]) -> dict:
+    return {"type": "json_schema", "json_schema": {"name": model.__name__, "schema": json_schema(model)}}
+
+
+def request_json(messages, model: Type[BaseModel], max_tokens=512, temperature=0.2):
+    """
+    Ask the LLM backend (through the shared llm_client) for a reply matching the schema and
+    return the validated dict.
+
+    Raises:
+        StructuredExtractionError: On connection errors, empty replies or unrepairable output.
+    """
+    global _schema_supported
+    try:
+        response_data = None
+        if _schema_supported:
+            try:
+                response_data = llm_client.chat_completion_sync(
+                    messages, temperature=temperature, max_tokens=max_tokens, response_format=response_format(model))
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 400:
+                    raise
+                if _UNSUPPORTED_SCHEMA.search(e.response.text):
+                    print(f"⚠️ Backend rejected response_format, using prompt-only JSON: {e.response.text[:200]}")
+                    _schema_supported = False
+                else:
+                    print(f"⚠️ Schema request rejected, retrying this call prompt-only: {e.response.text[:200]}")
+        if response_data is None:
+            response_data = llm_client.chat_completion_sync(messages, temperature=temperature, max_tokens=max_tokens)
+    except (httpx.HTTPError, ValueError) as e:
+        raise StructuredExtractionError(f"Failed to connect to LM Studio: {e}")
+
+    reply = (response_data.get("choices") or [{}])[0].get("message", {}).get("content", "").strip()
+    print("LM Studio raw response:", reply)
+    if not reply:
+        raise StructuredExtractionError("No valid JSON response from LM Studio")
+    try:
+        data = parse_json_reply(reply)
+    except ValueError as e:
+        raise StructuredExtractionError(f"Invalid JSON response from LM Studio: {e}")
+    return validate(model, data)
+
+
+def extract(text, model: Type[BaseModel], instructions, system_prompt, max_tokens=512):
+    """
+    Extract one schema from document text.
+
+    Args:
+        text (str): The document text.
+        model (type): Pydantic model describing the fields to extract.
+        instructions (str): What to look for; the document text is appended after it.
+        system_prompt (str): The system message.
+        max_tokens (int): Cap on the reply length.
+
+    Returns:
+        dict: The extracted fields, or {"error": ...} like the other document analysis helpers.
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"{instructions}\n\nTEXT:\n{text}"},
+    ]
+    try:
+        return request_json(messages, model, max_tokens=max_tokens)
+    except StructuredExtractionError as e:
+        print(f"⚠️ {e}")
+        return {"error": str(e)}
+
+
+def extract_many(text, targets: Dict[str, tuple], max_tokens=1024):
+    """
+    Extract several schemas from one document with a single call.
+
+    Args:
+        text (str): The document text.
+        targets (dict): Name -> (Pydantic model, instructions) for each part to extract.
+        max_tokens (int): Cap on the combined reply length.
+
+    Returns:
+        dict: Name -> extracted fields; every name maps to {"error": ...} if the call failed.
+    """
+    combined = create_model("DocumentExtraction", **{name: (Optional[model], None)
+                                                     for name, (model, _) in targets.items()})
+    sections = "\n\n".join(f'Under "{name}":\n{instructions}' for name, (_, instructions) in targets.items())
+    messages = [
+        {"role": "system", "content": "Extract structured data from this document and return valid JSON."},
+        {"role": "user", "content": f"The document covers several topics. Return one JSON object with the keys "
+                                    f"{', '.join(targets)}.\n\n{sections}\n\nTEXT:\n{text}"},
+    ]
+    try:
+        result = request_json(messages, combined, max_tokens=max_tokens)
+    except StructuredExtractionError as e:
+        print(f"⚠️ {e}")
+        return {name: {"error": str(e)} for name in targets}
+    return {name: result.get(name) or {"error": f"No {name} details found in the document"} for name in targets}
+
+
+# ----------------------------
+# Shared Schemas
+# ----------------------------
+class FacilityDetails(BaseModel):
+    name: Optional[str] = None
+    square_feet: Optional[float] = None
+    number_of_employees: Optional[int] = None
+    power_consumption: Union[str, float, dict, None] = None
+    water_source: Optional[str] = None
+    waste_disposal: Union[str, float, dict, None] = None
+
+
+class EmployeeCount(BaseModel):
+    employee_count: Optional[int] = None
+
+
+class Machine(BaseModel):
+    machine_id: Optional[str] = None
+    machine_name: Optional[str] = None
+    power_kw: Optional[float] = None
+    pollution_rate: Optional[str] = None
+    manufacturer: Optional[str] = None
+    purchase_date: Optional[str] = None
+
+
+class PowerConsumption(BaseModel):
+    Total_consumption: Optional[float] = None
+    details_of_machine: List[Machine] = []
+
+
+class UsageBreakdown(BaseModel):
+    manufacturing_processes: Optional[float] = None
+    cooling_systems: Optional[float] = None
+    sanitation: Optional[float] = None
+
+
+class WaterQuality(BaseModel):
+    ph_level: Optional[float] = None
+    turbidity: Optional[str] = None
+    contaminants: Optional[str] = None
+
+
+class WaterCertification(BaseModel):
+    Total_monthly_water_consumption: Optional[float] = None
+    primary_water_source: Optional[str] = None
+    secondary_water_source: Optional[str] = None
+    average_ph_level: Optional[float] = None
+    monthly_water_cost: Optional[float] = None
+    usage_breakdown: Optional[UsageBreakdown] = None
+    water_quality: Optional[WaterQuality] = None
+    testing_authority: Optional[str] = None
+    test_date: Optional[str] = None
@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure the root directory is in sys.path if needed
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from ui.document_analysis.area_calculator import cal_blueprint
+from extraction.pdf import extract_text_from_pdf
+from extraction.cache import file_digest
+from ui.document_analysis import rules
+from ui.document_analysis.structured import EmployeeCount, PowerConsumption, WaterCertification, extract_many
+from ui.document_analysis.employeeCount import extract_employee_count_from_pdf, EMPLOYEE_COUNT_INSTRUCTIONS
+from ui.document_analysis.energyConsumption import extract_power_consumption_from_pdf, POWER_CONSUMPTION_INSTRUCTIONS
+from ui.document_analysis.waterConsumption import extract_water_certification_from_pdf, WATER_CERTIFICATION_INSTRUCTIONS
+
+# Proof document checks, keyed by the name used in verify_documents' `documents` argument
+CHECKS = {
+    "area": cal_blueprint,
+    "employees": extract_employee_count_from_pdf,
+    "energy": extract_power_consumption_from_pdf,
+    "water": extract_water_certification_from_pdf,
+}
+
+# Text checks that can share one LLM call when a single document covers several of them
+TEXT_CHECKS = {
+    "employees": (EmployeeCount, EMPLOYEE_COUNT_INSTRUCTIONS),
+    "energy": (PowerConsumption, POWER_CONSUMPTION_INSTRUCTIONS),
+    "water": (WaterCertification, WATER_CERTIFICATION_INSTRUCTIONS),
+}
+
+# Largest difference between a claimed and a verified value that still counts as a match
+MATCH_TOLERANCE = 5
+
+
+def _to_number(value):
+    """Parse numbers such as 6000, "6,000" or "120,000 kWh"; None when there is no number."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        digits = value.replace(",", "").split()
+        try:
+            return float(digits[0]) if digits else None
+        except ValueError:
+            return None
+    return None
+
+
+def _claimed_and_verified(name, claimed, result):
+    """Pick the application's claimed value and the proof document's value for a check."""
+    if name == "area":
+        return claimed.get("square_feet"), result.get("estimated_area")
+    if name == "employees":
+        return claimed.get("number_of_employees"), result.get("employee_count")
+    if name == "energy":
+        power = claimed.get("power_consumption") or {}
+        return (power.get("total") if isinstance(power, dict) else power), result.get("Total_consumption")
+    return None, None  # Water certificates are reported, not compared
+
+
+def _run_check(name, path):
+    start = time.perf_counter()
+    try:
+        result = CHECKS[name](path)
+        if not result:
+            result = {"error": "Check returned no result"}
+    except Exception as e:
+        result = {"error": str(e)}
+    return {name: result}, time.perf_counter() - start
+
+
+def _run_combined_checks(names, path):
+    """
+    Extract the document's text once, answer what the rules can and fill the remaining text
+    checks (and the parts of partial rule answers the rules cannot read) with a single LLM call.
+    """
+    start = time.perf_counter()
+    try:
+        text = extract_text_from_pdf(path)
+        if text:
+            ruled = {name: rules.pre_extract(name, text) for name in names}
+            remaining = [name for name in names if ruled[name] is None or name in rules.PARTIAL_TARGETS]
+            results = dict(ruled)
+            if remaining:
+                extracted = extract_many(text, {name: TEXT_CHECKS[name] for name in remaining})
+                results.update({name: rules.merge(ruled[name], extracted[name]) for name in remaining})
+        else:
+            results = {name: {"error": "No text could be extracted from the PDF"} for name in names}
+    except Exception as e:
+        results = {name: {"error": str(e)} for name in names}
+    return results, time.perf_counter() - start
+
+
+def _group_checks(documents):
+    """
+    (check names, path) tasks: text checks given the same document (by content, so the same PDF
+    uploaded twice counts) are merged into one task.
+    """
+    by_document = {}
+    for name, path in documents.items():
+        key = file_digest(path) if name in TEXT_CHECKS and path.lower().endswith(".pdf") else (name, path)
+        by_document.setdefault(key, []).append((name, path))
+    return [([name for name, _ in checks], checks[0][1]) for checks in by_document.values()]
+
+
+def verify_documents(documents, claimed=None, max_workers=None):
+    """
+    Run the proof document checks concurrently and consolidate their results.
+
+    Each check is a blocking OCR + LM Studio round trip. OCR runs in Tesseract subprocesses
+    (or extraction.pdf.ocr_pages' process pool) and the LLM call is network I/O, so one thread
+    per check lets them overlap; wall time approaches the slowest check instead of the sum.
+    Text checks given the same file are read once and answered by one combined LLM call
+    (they then report the same seconds). Figures stated verbatim are answered by the rule
+    engine in milliseconds; "rules" reports its hit rate.
+
+    Args:
+        documents (dict): Check name ("area", "employees", "energy", "water") -> file path.
+        claimed (dict): Structured application details to compare the verified values against.
+        max_workers (int): Threads to use; defaults to one per distinct document.
+
+    Returns:
+        dict: {"checks": {name: {"status", "result", "claimed", "verified", "seconds"}},
+               "wall_seconds": float, "sum_seconds": float, "rules": {target: {"hits", "misses", "hit_rate"}}}
+    """
+    claimed = claimed or {}
+    unknown = set(documents) - set(CHECKS)
+    if unknown:
+        raise ValueError(f"Unknown verification checks {sorted(unknown)}, expected some of {sorted(CHECKS)}")
+
+    tasks = _group_checks(documents)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or max(1, len(tasks))) as executor:
+        futures = [executor.submit(_run_check, names[0], path) if len(names) == 1
+                   else executor.submit(_run_combined_checks, names, path)
+                   for names, path in tasks]
+        task_outcomes = [future.result() for future in futures]
+    wall_seconds = time.perf_counter() - start
+    outcomes = {name: (result, seconds) for results, seconds in task_outcomes for name, result in results.items()}
+
+    checks = {}
+    for name, (result, seconds) in outcomes.items():
+        claimed_value, verified_value = _claimed_and_verified(name, claimed, result)
+        claimed_number, verified_number = _to_number(claimed_value), _to_number(verified_value)
+        if "error" in result:
+            status = "error"
+        elif claimed_number is None or verified_number is None:
+            status = "extracted"
+        elif abs(verified_number - claimed_number) < MATCH_TOLERANCE:
+            status = "verified"
+        else:
+            status = "mismatch"
+        checks[name] = {
+            "status": status,
+            "result": result,
+            "claimed": claimed_value,
+            "verified": verified_value,
+            "seconds": round(seconds, 3),
+        }
+        print(f"⏱️ {name} check: {status} in {seconds:.2f}s")
+
+    sum_seconds = sum(seconds for _, seconds in task_outcomes)
+    print(f"✅ Verification finished in {wall_seconds:.2f}s (checks took {sum_seconds:.2f}s combined)")
+    return {"checks": checks, "wall_seconds": round(wall_seconds, 3), "sum_seconds": round(sum_seconds, 3),
+            "rules": rules.stats()}
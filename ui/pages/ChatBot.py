@@ -83,21 +83,52 @@ if "chat_history" not in st.session_state:
         {"role": "system", "content": "You are an AI assistant helping with industrial compliance questions."}
     ]
 
-# Function to call the chat API endpoint.
-def send_message_to_api(messages):
-    api_url = "http://localhost:8000/chat"  # Replace with your actual API endpoint.
-    payload = {"messages": messages}
+# The server keeps the conversation (recent messages plus a summary of older ones); the history
+# above is only used to display it, and each turn sends just the new message.
+API_URL = "http://localhost:8000"  # Replace with your actual API endpoint.
+if "chat_session_id" not in st.session_state:
+    st.session_state.chat_session_id = None
+
+# Function to start a server-side chat session and return its ID.
+def create_chat_session():
+    response = requests.post(f"{API_URL}/chat/sessions",
+                             json={"system_prompt": st.session_state.chat_history[0]["content"]})
+    response.raise_for_status()
+    return response.json()["session_id"]
+
+# Function to stream the bot's reply from the chat API endpoint (Server-Sent Events).
+def stream_message_from_api(message):
     headers = {"Content-Type": "application/json"}
     try:
-        response = requests.post(api_url, json=payload, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            # Expecting the response to include a key "message" with the bot's reply.
-            return data.get("message", "No reply received.")
-        else:
-            return f"API Error: {response.status_code} - {response.text}"
+        if st.session_state.chat_session_id is None:
+            st.session_state.chat_session_id = create_chat_session()
+        api_url = f"{API_URL}/chat/sessions/{st.session_state.chat_session_id}/messages/stream"
+        response = requests.post(api_url, json={"message": message}, headers=headers, stream=True)
+        if response.status_code == 404:
+            # The session expired on the server; start a new one (older context is lost)
+            response.close()
+            st.session_state.chat_session_id = create_chat_session()
+            api_url = f"{API_URL}/chat/sessions/{st.session_state.chat_session_id}/messages/stream"
+            response = requests.post(api_url, json={"message": message}, headers=headers, stream=True)
+        with response:
+            if response.status_code != 200:
+                yield f"API Error: {response.status_code} - {response.text}"
+                return
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    event = None  # Blank line ends an event
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    data = json.loads(data)
+                    # Each event carries a "delta" with the next piece of the reply, or an error "detail".
+                    yield f"API Error: {data.get('detail')}" if event == "error" else data.get("delta", "")
     except Exception as e:
-        return f"Error calling API: {e}"
+        yield f"Error calling API: {e}"
 
 # Display the chat history (skipping the initial system message).
 for msg in st.session_state.chat_history[1:]:
@@ -113,11 +144,24 @@ with st.form(key="chat_form", clear_on_submit=True):
 
 if submit_button and user_input:
     st.session_state.chat_history.append({"role": "user", "content": user_input})
-    bot_reply = send_message_to_api(st.session_state.chat_history)
+    st.markdown(f"<div class='user-message'>{user_input}</div>", unsafe_allow_html=True)
+
+    # Render the reply token by token as it streams in.
+    reply_placeholder = st.empty()
+    bot_reply = ""
+    for delta in stream_message_from_api(user_input):
+        bot_reply += delta
+        reply_placeholder.markdown(f"<div class='bot-message'>{bot_reply}</div>", unsafe_allow_html=True)
     st.session_state.chat_history.append({"role": "assistant", "content": bot_reply})
     st.rerun()
 
 if st.button("Clear Chat"):
+    if st.session_state.chat_session_id is not None:
+        try:
+            requests.delete(f"{API_URL}/chat/sessions/{st.session_state.chat_session_id}")
+        except requests.RequestException:
+            pass  # Unused sessions expire on the server anyway
+        st.session_state.chat_session_id = None
     st.session_state.chat_history = [
         {"role": "system", "content": "You are an AI assistant helping with industrial compliance questions."}
     ]
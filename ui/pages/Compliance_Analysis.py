@@ -12,9 +12,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"
 
 # Import the necessary functions
 from ui.document_analysis.analysis import extract_text_from_image, analyze_text_with_lm_studio
+from extraction.pdf import extract_text_from_pdf
 from ui.document_analysis.area_calculator import cal_blueprint
 from ui.document_analysis.employeeCount import extract_employee_count_from_pdf
 from ui.document_analysis.energyConsumption import extract_power_consumption_from_pdf
+from ui.document_analysis.verification import verify_documents
 
 
 # Set page config
@@ -66,11 +68,64 @@ if "debug_logs" not in st.session_state:
     st.session_state.debug_logs = {}
 if "compliance_report" not in st.session_state:
     st.session_state.compliance_report = None
+if "job_id" not in st.session_state:
+    st.session_state.job_id = ""
 
 def log_debug(message):
     st.session_state.debug_logs.setdefault("logs", []).append(message)
     st.write(f"<div class='debug'>DEBUG: {message}</div>", unsafe_allow_html=True)
 
+def save_upload_to_temp(uploaded, suffix):
+    """Write an uploaded file to a temporary path; callers delete it with remove_temp_file once processed."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        temp_file.write(uploaded.getbuffer())
+        return temp_file.name
+
+def remove_temp_file(path):
+    # Extraction results are cached by content hash, so the temporary copy is not needed after processing
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def stream_report_from_api(payload):
+    """Yield the compliance report piece by piece from the streaming report endpoint (Server-Sent Events)."""
+    api_url = "http://localhost:8000/generate_report/stream"
+    with requests.post(api_url, json=payload, stream=True) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"API Error: {response.status_code} - {response.text}")
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                event = None  # Blank line ends an event
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                data = json.loads(data)
+                if event == "error":
+                    raise RuntimeError(data.get("detail"))
+                yield data.get("delta", "")
+
+
+def submit_job_to_api(application, proofs):
+    """Queue a background compliance analysis job and return its ID."""
+    api_url = "http://localhost:8000/jobs"
+    files = {"application": (application.name, application.getvalue())}
+    files.update({name: (upload.name, upload.getvalue()) for name, upload in proofs.items() if upload})
+    response = requests.post(api_url, files=files)
+    if response.status_code != 202:
+        raise RuntimeError(f"API Error: {response.status_code} - {response.text}")
+    return response.json()["job_id"]
+
+def fetch_job_from_api(job_id):
+    """Return the job's status, per-stage progress and finished stage outputs."""
+    response = requests.get(f"http://localhost:8000/jobs/{job_id}")
+    if response.status_code != 200:
+        raise RuntimeError(f"API Error: {response.status_code} - {response.text}")
+    return response.json()
 
 
 # Display header and progress bar
@@ -95,9 +150,7 @@ if st.session_state.step == 1:
         st.success("File uploaded successfully! Proceeding to analysis...")
 
         # Save uploaded file to a temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as temp_file:
-            temp_file.write(uploaded_file.getbuffer())
-            temp_file_path = temp_file.name
+        temp_file_path = save_upload_to_temp(uploaded_file, os.path.splitext(uploaded_file.name)[1])
         log_debug(f"Saved file to temporary location: {temp_file_path}")
 
         # Determine if it's a PDF or an image
@@ -109,8 +162,7 @@ if st.session_state.step == 1:
             try:
                 if file_extension == "pdf":
                     log_debug("Calling extract_text_from_pdf")
-                    # Note: Ensure you have a corresponding PDF extraction function in your analysis module
-                    response = extract_text_from_image(temp_file_path)
+                    response = extract_text_from_pdf(temp_file_path)
                 else:
                     log_debug("Calling extract_text_from_image")
                     response = extract_text_from_image(temp_file_path)
@@ -124,6 +176,48 @@ if st.session_state.step == 1:
                 st.error(f"Error during analysis: {e}")
                 log_debug("Error during text extraction: " + str(e))
                 st.session_state.uploaded_file = None  # Reset upload
+            finally:
+                remove_temp_file(temp_file_path)
+
+# Background processing: the server runs every step in a job worker, so a browser refresh loses nothing
+if st.session_state.step == 1:
+    with st.expander("⏳ Process in the background instead"):
+        st.write("Upload the application and any proof documents; the server analyses them in a background job. "
+                 "Keep the job ID to check on it later, even after closing this page.")
+        job_application = st.file_uploader("Application document", type=["pdf", "png", "jpg", "jpeg"], key="job_application")
+        job_proofs = {
+            "area": st.file_uploader("Blueprint (area)", type=["pdf", "png", "jpg", "jpeg"], key="job_area"),
+            "employees": st.file_uploader("Payroll report (employee count)", type=["pdf"], key="job_employees"),
+            "energy": st.file_uploader("Energy consumption report", type=["pdf"], key="job_energy"),
+            "water": st.file_uploader("Water certification", type=["pdf"], key="job_water"),
+        }
+        if job_application and st.button("Submit background job"):
+            try:
+                st.session_state.job_id = submit_job_to_api(job_application, job_proofs)
+                log_debug(f"Submitted background job: {st.session_state.job_id}")
+            except Exception as e:
+                st.error(f"Error submitting job: {e}")
+
+        job_id = st.text_input("Job ID", value=st.session_state.job_id)
+        if job_id and st.button("Check job status"):
+            st.session_state.job_id = job_id
+            try:
+                job = fetch_job_from_api(job_id)
+                st.write(f"**Status:** {job['status']}")
+                for stage, progress in job["progress"].items():
+                    seconds = f" ({progress['seconds']}s)" if progress["seconds"] is not None else ""
+                    st.write(f"- {stage}: {progress['status']}{seconds}")
+                if job["status"] == "failed":
+                    st.error(f"❌ Job failed: {job['error']}")
+                if "structure" in job["result"]:
+                    st.json(job["result"]["structure"])
+                if job["result"].get("verify"):
+                    st.json(job["result"]["verify"])
+                if "generate" in job["result"]:
+                    st.markdown("#### Generated Compliance Report:")
+                    st.markdown(job["result"]["generate"]["compliance_report"])
+            except Exception as e:
+                st.error(f"Error fetching job: {e}")
 
 # Step 2: Document Analysis
 if st.session_state.step == 2:
@@ -176,6 +270,54 @@ if st.session_state.step == 3:
     st.markdown("**📜 Extracted Compliance Details:**")
     st.json(st.session_state.analysis_result)
 
+    # Optionally verify every proof document in one go; the checks run concurrently
+    with st.expander("📦 Upload all proof documents at once"):
+        proof_uploads = {
+            "area": st.file_uploader("Blueprint (area)", type=["pdf", "png", "jpg", "jpeg"], key="proof_area"),
+            "employees": st.file_uploader("Payroll report (employee count)", type=["pdf"], key="proof_employees"),
+            "energy": st.file_uploader("Energy consumption report", type=["pdf"], key="proof_energy"),
+            "water": st.file_uploader("Water certification", type=["pdf"], key="proof_water"),
+        }
+        selected_uploads = {name: upload for name, upload in proof_uploads.items() if upload}
+        if selected_uploads and st.button("Verify all uploaded documents"):
+            proof_paths = {
+                name: save_upload_to_temp(upload, os.path.splitext(upload.name)[1])
+                for name, upload in selected_uploads.items()
+            }
+            log_debug(f"Running concurrent verification for: {list(proof_paths)}")
+            with st.spinner("🔍 Verifying all documents in parallel... Please wait."):
+                try:
+                    verification = verify_documents(proof_paths, claimed=st.session_state.analysis_result)
+                finally:
+                    for path in proof_paths.values():
+                        remove_temp_file(path)
+            log_debug(f"Concurrent verification result: {verification}")
+            st.session_state.verification_result = verification
+
+        # Rendered from session state so the "Next" button survives Streamlit's rerun
+        verification = st.session_state.verification_result
+        if isinstance(verification, dict) and "checks" in verification:
+            for name, check in verification["checks"].items():
+                if check["status"] == "verified":
+                    st.success(f"✅ {name}: verified {check['verified']} in {check['seconds']}s (Matches extracted data)")
+                elif check["status"] == "mismatch":
+                    st.error(f"❌ {name}: verified {check['verified']} does not match extracted {check['claimed']} ({check['seconds']}s)")
+                elif check["status"] == "error":
+                    st.error(f"⚠️ {name}: {check['result']['error']} ({check['seconds']}s)")
+                else:
+                    st.info(f"ℹ️ {name}: extracted in {check['seconds']}s")
+            st.write(f"**Total time: {verification['wall_seconds']}s** (checks took {verification['sum_seconds']}s combined)")
+            rule_stats = verification.get("rules") or {}
+            rule_hits = sum(values["hits"] for values in rule_stats.values())
+            rule_total = rule_hits + sum(values["misses"] for values in rule_stats.values())
+            if rule_total:
+                st.caption(f"📐 Rule-based extraction read the stated figures of {rule_hits} of {rule_total} checks "
+                           f"({rule_hits / rule_total:.0%} hit rate since the app started)")
+            st.json(verification)
+
+            if st.button("Next: Generate Compliance Report"):
+                st.session_state.step = 7
+
     # Ask user to upload proof for the extracted key
     st.markdown(f"### 📤 Upload Proof for Verifying `{key_to_verify}`")
     uploaded_proof = st.file_uploader(f"Upload a document to verify `{key_to_verify}`", type=["pdf", "png", "jpg", "jpeg"])
@@ -183,9 +325,7 @@ if st.session_state.step == 3:
     if uploaded_proof:
         log_debug("Proof file uploaded: " + uploaded_proof.name)
         st.success(f"Proof uploaded successfully for `{key_to_verify}`!")
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_proof.name)[1]) as proof_file:
-            proof_file.write(uploaded_proof.getbuffer())
-            proof_file_path = proof_file.name
+        proof_file_path = save_upload_to_temp(uploaded_proof, os.path.splitext(uploaded_proof.name)[1])
         log_debug(f"Saved proof to temporary location: {proof_file_path}")
 
         st.session_state.proof_uploaded = proof_file_path
@@ -193,7 +333,10 @@ if st.session_state.step == 3:
         # If key is "square_feet", process blueprint verification
         if key_to_verify.lower() == "square_feet":
             with st.spinner(f"🔍 Verifying `{key_to_verify}` with AI... Please wait."):
-                verification_result = cal_blueprint(proof_file_path)
+                try:
+                    verification_result = cal_blueprint(proof_file_path)
+                finally:
+                    remove_temp_file(proof_file_path)
                 log_debug(f"Blueprint verification result: {verification_result}")
 
                 if verification_result:
@@ -221,12 +364,13 @@ if st.session_state.step == 4:
     if uploaded_employee_doc:
         log_debug("Employee count verification document uploaded: " + uploaded_employee_doc.name)
         st.success("Document uploaded successfully! Proceeding with employee count verification...")
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(uploaded_employee_doc.getbuffer())
-            pdf_path = temp_pdf.name
+        pdf_path = save_upload_to_temp(uploaded_employee_doc, ".pdf")
         log_debug(f"Saved employee count verification document to temporary location: {pdf_path}")
 
-        extraction_result = extract_employee_count_from_pdf(pdf_path)
+        try:
+            extraction_result = extract_employee_count_from_pdf(pdf_path)
+        finally:
+            remove_temp_file(pdf_path)
         log_debug(f"Extraction result from PDF: {extraction_result}")
 
         if "error" in extraction_result:
@@ -276,12 +420,13 @@ if st.session_state.step == 5:
     if uploaded_energy_doc:
         log_debug("Energy consumption verification document uploaded: " + uploaded_energy_doc.name)
         st.success("Document uploaded successfully! Proceeding with energy consumption verification...")
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(uploaded_energy_doc.getbuffer())
-            pdf_path = temp_pdf.name
+        pdf_path = save_upload_to_temp(uploaded_energy_doc, ".pdf")
         log_debug(f"Saved energy consumption verification document to temporary location: {pdf_path}")
 
-        extraction_result = extract_power_consumption_from_pdf(pdf_path)
+        try:
+            extraction_result = extract_power_consumption_from_pdf(pdf_path, total_only=True)
+        finally:
+            remove_temp_file(pdf_path)
         log_debug(f"Extraction result from PDF: {extraction_result}")
 
         if "error" in extraction_result:
@@ -347,36 +492,34 @@ if st.session_state.step == 7:
     st.write("Generating a full compliance report using our API endpoint...")
 
     if st.session_state.analysis_result:
-        with st.spinner("Generating compliance report via API..."):
-            try:
-                api_url = "http://localhost:8000/generate_report"
-                # Ensure all required fields are present and of the correct type
-                analysis_result = st.session_state.analysis_result
-                payload = {
-                    "industry_name": analysis_result.get("name", ""),
-                    "square_feet": str(analysis_result.get("square_feet", "")),
-                    "number_of_employees": analysis_result.get("number_of_employees", 0),
-                    "power_consumption": analysis_result.get("power_consumption", {}),
-                    "water_source": str(analysis_result.get("water_source", "")),
-                    "waste_disposal": analysis_result.get("waste_disposal", {}),
-                    "drainage": analysis_result.get("drainage", ""),
-                    "air_pollution": analysis_result.get("air_pollution", ""),
-                    "waste_management": analysis_result.get("waste_management", ""),
-                    "nearby_homes": analysis_result.get("nearby_homes", ""),
-                    "water_level_depth": analysis_result.get("water_level_depth", "")
-                }
-                response = requests.post(api_url, json=payload)
-                if response.status_code == 200:
-                    data = response.json()
-                    final_report = data.get("compliance_report", "No report returned")
-                    st.session_state.compliance_report = final_report
-                    st.success("Compliance report generated successfully!")
-                    st.markdown("#### Generated Compliance Report:")
-                    st.write(final_report)
-                else:
-                    st.error(f"API Error: {response.status_code} - {response.text}")
-            except Exception as e:
-                st.error(f"Error calling API: {e}")
+        try:
+            # Ensure all required fields are present and of the correct type
+            analysis_result = st.session_state.analysis_result
+            payload = {
+                "industry_name": analysis_result.get("name", ""),
+                "square_feet": str(analysis_result.get("square_feet", "")),
+                "number_of_employees": analysis_result.get("number_of_employees", 0),
+                "power_consumption": analysis_result.get("power_consumption", {}),
+                "water_source": str(analysis_result.get("water_source", "")),
+                "waste_disposal": analysis_result.get("waste_disposal", {}),
+                "drainage": analysis_result.get("drainage", ""),
+                "air_pollution": analysis_result.get("air_pollution", ""),
+                "waste_management": analysis_result.get("waste_management", ""),
+                "nearby_homes": analysis_result.get("nearby_homes", ""),
+                "water_level_depth": analysis_result.get("water_level_depth", "")
+            }
+            st.markdown("#### Generated Compliance Report:")
+            # Render the report token by token as it streams in.
+            report_placeholder = st.empty()
+            final_report = ""
+            with st.spinner("Generating compliance report via API..."):
+                for delta in stream_report_from_api(payload):
+                    final_report += delta
+                    report_placeholder.markdown(final_report)
+            st.session_state.compliance_report = final_report or "No report returned"
+            st.success("Compliance report generated successfully!")
+        except Exception as e:
+            st.error(f"Error calling API: {e}")
     else:
         st.error("No analysis result available. Please complete the previous steps before generating the report.")
 